@@ -6,7 +6,7 @@ from .bake_common import *
 from .subtree import *
 from .node_connections import *
 from .node_arrangements import *
-from . import lib, Layer, Mask, ImageAtlas, Modifier, MaskModifier
+from . import lib, Layer, Mask, ImageAtlas, Modifier, MaskModifier, image_buffer, bake_fingerprint, bake_cache, parallel_bake
 
 def transfer_uv(objs, mat, entity, uv_map):
 
@@ -132,24 +132,13 @@ def transfer_uv(objs, mat, entity, uv_map):
     bpy.ops.object.bake()
 
     # Copy results to original image
-    target_pxs = list(image.pixels)
-    temp_pxs = list(temp_image.pixels)
-
     if segment:
-        start_x = width * segment.tile_x
-        start_y = height * segment.tile_y
+        start_x, start_y = get_segment_start(segment)
     else:
         start_x = 0
         start_y = 0
 
-    for y in range(height):
-        temp_offset_y = width * 4 * y
-        offset_y = image.size[0] * 4 * (y + start_y)
-        for x in range(width):
-            temp_offset_x = 4 * x
-            offset_x = 4 * (x + start_x)
-            for i in range(3):
-                target_pxs[offset_y + offset_x + i] = temp_pxs[temp_offset_y + temp_offset_x + i]
+    image_buffer.blit_rgb(temp_image, image, start_x, start_y)
 
     # Bake alpha if using alpha
     #srgb2lin = None
@@ -167,18 +156,7 @@ def transfer_uv(objs, mat, entity, uv_map):
         # Bake again!
         bpy.ops.object.bake()
 
-        temp_pxs = list(temp_image.pixels)
-
-        for y in range(height):
-            temp_offset_y = width * 4 * y
-            offset_y = image.size[0] * 4 * (y + start_y)
-            for x in range(width):
-                temp_offset_x = 4 * x
-                offset_x = 4 * (x + start_x)
-                target_pxs[offset_y + offset_x + 3] = temp_pxs[temp_offset_y + temp_offset_x]
-
-    # Copy back edited pixels to original image
-    image.pixels = target_pxs
+        image_buffer.inject_alpha(temp_image, image, start_x, start_y)
 
     # Remove temp nodes
     simple_remove_node(mat.node_tree, tex)
@@ -468,6 +446,12 @@ class YResizeImage(bpy.types.Operator):
             description='Bake Samples, more means less jagged on generated image', 
             default=1, min=1)
 
+    method : EnumProperty(
+            name = 'Resize Method',
+            description = 'Resize method',
+            items = resize_method_items,
+            default='LANCZOS')
+
     @classmethod
     def poll(cls, context):
         #return hasattr(context, 'image') and hasattr(context, 'layer')
@@ -494,13 +478,17 @@ class YResizeImage(bpy.types.Operator):
 
         col.label(text='Width:')
         col.label(text='Height:')
-        col.label(text='Samples:')
+        col.label(text='Method:')
+        if self.method == 'CYCLES':
+            col.label(text='Samples:')
 
         col = row.column(align=True)
 
         col.prop(self, 'width', text='')
         col.prop(self, 'height', text='')
-        col.prop(self, 'samples', text='')
+        col.prop(self, 'method', text='')
+        if self.method == 'CYCLES':
+            col.prop(self, 'samples', text='')
 
     def execute(self, context):
 
@@ -547,7 +535,7 @@ class YResizeImage(bpy.types.Operator):
         space = None
         ori_space_image = None
 
-        if not image.yia.is_image_atlas and is_greater_than_281():
+        if not image.yia.is_image_atlas and is_greater_than_281() and self.method == 'CYCLES':
 
             # Search for context
             for area in context.screen.areas:
@@ -569,7 +557,7 @@ class YResizeImage(bpy.types.Operator):
 
         else:
             #scaled_img, new_segment = resize_image(image, self.width, self.height, 'Linear', self.samples, 0, segment)
-            scaled_img, new_segment = resize_image(image, self.width, self.height, image.colorspace_settings.name, self.samples, 0, segment, force_use_cpu=True, yp=yp)
+            scaled_img, new_segment = resize_image(image, self.width, self.height, image.colorspace_settings.name, self.samples, 0, segment, force_use_cpu=True, yp=yp, method=self.method)
 
             if new_segment:
                 entity.segment_name = new_segment.name
@@ -768,8 +756,8 @@ class YBakeChannels(bpy.types.Operator):
     bl_label = "Bake channels to Image"
     bl_options = {'REGISTER', 'UNDO'}
 
-    width : IntProperty(name='Width', default = 1234, min=1, max=4096)
-    height : IntProperty(name='Height', default = 1234, min=1, max=4096)
+    width : IntProperty(name='Width', default = 1234, min=1, max=16384)
+    height : IntProperty(name='Height', default = 1234, min=1, max=16384)
 
     uv_map : StringProperty(default='')
     uv_map_coll : CollectionProperty(type=bpy.types.PropertyGroup)
@@ -785,9 +773,15 @@ class YBakeChannels(bpy.types.Operator):
     #hdr : BoolProperty(name='32 bit Float', default=False)
 
     fxaa : BoolProperty(name='Use FXAA', 
-            description = "Use FXAA to baked images (doesn't work with float/non clamped images)",
+            description = "Use FXAA to baked images",
             default=True)
 
+    fxaa_method : EnumProperty(
+            name = 'FXAA Method',
+            description = 'FXAA Method',
+            items = fxaa_method_items,
+            default='NUMPY')
+
     aa_level : IntProperty(
         name='Anti Aliasing Level',
         description='Super Sample Anti Aliasing Level (1=off)',
@@ -803,6 +797,39 @@ class YBakeChannels(bpy.types.Operator):
             description='Force use CPU for baking (usually faster than using GPU)',
             default=True)
 
+    use_packed_bake : BoolProperty(
+            name='Pack Grayscale Bakes',
+            description='Bake up to three grayscale outputs (alpha, value channels, height) in a single bake pass',
+            default=True)
+
+    use_tiled_bake : BoolProperty(
+            name='Use Tiled Bake',
+            description='Bake big images tile by tile to use less memory',
+            default=True)
+
+    tile_size : IntProperty(
+            name='Tile Size',
+            description='Images bigger than this size will be baked tile by tile',
+            default=4096, min=256, max=8192)
+
+    only_stale : BoolProperty(
+            name='Bake Only Changed Channels',
+            description='Only bake channels that changed since the last bake, unchanged channels will reuse their baked images',
+            default=False)
+
+    use_parallel_bake : BoolProperty(
+            name='Use Parallel Bake',
+            description='Bake channels on multiple background Blender processes',
+            default=False)
+
+    parallel_workers : IntProperty(
+            name='Parallel Workers',
+            description='Number of background Blender processes used for parallel bake',
+            default=4, min=2, max=64)
+
+    # Limit bake to these channels, all channels will be baked if it's empty
+    only_channels : CollectionProperty(type=bpy.types.PropertyGroup, options={'SKIP_SAVE'})
+
     @classmethod
     def poll(cls, context):
         return get_active_ypaint_node() and context.object.type == 'MESH'
@@ -869,6 +896,10 @@ class YBakeChannels(bpy.types.Operator):
         col.label(text='')
         col.label(text='')
         col.label(text='')
+        col.label(text='')
+        col.label(text='')
+        col.label(text='')
+        col.label(text='')
 
         col = row.column(align=True)
 
@@ -884,11 +915,88 @@ class YBakeChannels(bpy.types.Operator):
 
         col.prop_search(self, "uv_map", self, "uv_map_coll", text='', icon='GROUP_UVS')
         col.separator()
-        col.prop(self, 'fxaa', text='Use FXAA')
+        row = col.row(align=True)
+        row.prop(self, 'fxaa', text='Use FXAA')
+        rrow = row.row(align=True)
+        rrow.active = self.fxaa
+        rrow.prop(self, 'fxaa_method', text='')
         col.prop(self, 'force_use_cpu')
         col.prop(self, 'force_bake_all_polygons')
+        col.prop(self, 'use_packed_bake')
+        row = col.row(align=True)
+        row.prop(self, 'use_tiled_bake', text='Tiled Bake')
+        rrow = row.row(align=True)
+        rrow.active = self.use_tiled_bake
+        rrow.prop(self, 'tile_size', text='')
+        row = col.row(align=True)
+        row.prop(self, 'use_parallel_bake', text='Parallel Bake')
+        rrow = row.row(align=True)
+        rrow.active = self.use_parallel_bake
+        rrow.prop(self, 'parallel_workers', text='Workers')
+        col.prop(self, 'only_stale')
+
+    def get_bake_settings(self):
+        return {
+                'width' : self.width,
+                'height' : self.height,
+                'samples' : self.samples,
+                'margin' : self.margin,
+                'uv_map' : self.uv_map,
+                'aa_level' : self.aa_level,
+                'fxaa' : self.fxaa,
+                'fxaa_method' : self.fxaa_method,
+                'force_bake_all_polygons' : self.force_bake_all_polygons,
+                'use_packed_bake' : self.use_packed_bake,
+                }
+
+    def is_baked_image_reusable(self, tree, ch):
+        baked = tree.nodes.get(ch.baked)
+        if not baked or not baked.image: return False
+        return baked.image.size[0] == self.width and baked.image.size[1] == self.height
+
+    def use_bake_results(self, context, tree, height_ch, tangent_sign_calculation):
+        yp = tree.yp
+
+        # Use bake results
+        yp.halt_update = True
+        yp.use_baked = True
+        yp.halt_update = False
+
+        # Check subdiv Setup
+        if height_ch:
+            check_subdiv_setup(height_ch)
+
+        # Update global uv
+        check_uv_nodes(yp)
+
+        # Recover hack
+        #if is_greater_than_280():
+        if BL28_HACK and height_ch and tangent_sign_calculation:
+            # Refresh tangent sign hacks
+            update_enable_tangent_sign_hacks(yp, context)
+
+            # Revert back cycles hack
+            if not is_greater_than_280():
+                for uv in yp.uvs:
+                    tangent_process = tree.nodes.get(uv.tangent_process)
+                    if tangent_process:
+                        tangent_process.inputs['Blender 2.8 Cycles Hack'].default_value = 1.0
+
+        # Rearrange
+        rearrange_yp_nodes(tree)
+        reconnect_yp_nodes(tree)
+
+        # Refresh active channel index
+        yp.active_channel_index = yp.active_channel_index
+
+        # Update baked outside nodes
+        update_enable_baked_outside(yp, context)
 
     def execute(self, context):
+        # Scene should be recovered even if the bake is failed
+        return run_guarded_bake(self.bake, context)
+
+    def bake(self, context):
 
         T = time.time()
 
@@ -960,6 +1068,52 @@ class YBakeChannels(bpy.types.Operator):
                             objs.append(ob)
                             meshes.append(ob.data)
 
+        # Channel fingerprints need to be calculated before bake setup changes the meshes
+        fingerprints = {}
+        reused_chs = []
+        settings = self.get_bake_settings()
+        only_names = [c.name for c in self.only_channels]
+        mesh_digest = bake_fingerprint.get_mesh_digest(objs)
+        segment_digests = bake_fingerprint.get_segment_digests(yp)
+        for ch in yp.channels:
+            fingerprints[ch.name] = bake_fingerprint.get_channel_fingerprint(node, ch, objs, settings, mesh_digest, segment_digests)
+            if (self.only_stale and fingerprints[ch.name] != '' and ch.baked_fingerprint == fingerprints[ch.name] 
+                    and self.is_baked_image_reusable(tree, ch)):
+                reused_chs.append(ch)
+
+        # Channels that need to be baked
+        bake_chs = [ch for ch in yp.channels if ch not in reused_chs and (not only_names or ch.name in only_names)]
+
+        for ch in yp.channels:
+            ch.no_layer_using = not is_any_layer_using_channel(ch, node)
+
+        # Parallel bake is using blend file copy, so it doesn't need any bake setup here
+        if self.use_parallel_bake:
+            parallel_names = [ch.name for ch in bake_chs if not ch.no_layer_using]
+
+        if self.use_parallel_bake and len(parallel_names) > 1:
+            recover_bake_settings(book, yp)
+
+            settings['uv_map'] = self.uv_map
+            settings['force_use_cpu'] = self.force_use_cpu
+            settings['tile_size'] = self.tile_size
+            settings['use_tiled_bake'] = self.use_tiled_bake
+            failed_names = parallel_bake.bake_channels_parallel(node, obj, parallel_names, settings, self.parallel_workers)
+
+            for ch in bake_chs:
+                if ch.name in failed_names: continue
+                ch.baked_fingerprint = fingerprints[ch.name] if not ch.no_layer_using else ''
+
+            yp.baked_uv_name = self.uv_map
+            self.use_bake_results(context, tree, height_ch, tangent_sign_calculation)
+
+            if failed_names:
+                self.report({'WARNING'}, 'Failed to bake channel(s): ' + ', '.join(failed_names))
+
+            print('INFO:', tree.name, 'channels is baked in parallel at', '{:0.2f}'.format(time.time() - T), 'seconds!')
+
+            return {'FINISHED'}
+
         # Multi materials setup
         ori_mat_ids = {}
         ori_loop_locs = {}
@@ -1001,56 +1155,82 @@ class YBakeChannels(bpy.types.Operator):
         # Prepare bake settings
         prepare_bake_settings(book, objs, yp, self.samples, margin, self.uv_map, disable_problematic_modifiers=True, force_use_cpu=self.force_use_cpu)
 
-        # Bake channels
-        for ch in yp.channels:
-            ch.no_layer_using = not is_any_layer_using_channel(ch, node)
-            if not ch.no_layer_using:
-                #if ch.type != 'NORMAL': continue
-                use_hdr = not ch.use_clamp
-                bake_channel(self.uv_map, mat, node, ch, width, height, use_hdr=use_hdr)
-                #return {'FINISHED'}
+        # Big images are baked tile by tile
+        use_tiled_bake = self.use_tiled_bake and (width > self.tile_size or height > self.tile_size)
+
+        # Bake nodes, material wiring and fake lighting temporary bakes are shared by all channels
+        if use_tiled_bake:
+            session = BakeSession(mat, node, self.uv_map, min(width, self.tile_size), min(height, self.tile_size))
+        else: session = BakeSession(mat, node, self.uv_map, width, height)
+
+        with session:
+            # Bake grayscale outputs of all channels together, channels with cached result don't need it
+            packed = {}
+            if self.use_packed_bake and not use_tiled_bake:
+                packed_chs = [ch for ch in bake_chs if not ch.no_layer_using 
+                        and not bake_cache.has_cached_image(fingerprints[ch.name], 'MAIN')]
+                packed = bake_packed_scalar_outputs(mat, node, packed_chs, width, height, session)
+
+            # Bake channels
+            for ch in bake_chs:
+                if not ch.no_layer_using:
+                    #if ch.type != 'NORMAL': continue
+                    use_hdr = not ch.use_clamp
+                    if use_tiled_bake:
+                        bake_channel_tiled(self.uv_map, mat, node, ch, objs, width, height, self.tile_size, margin, 
+                                use_hdr=use_hdr, cache_key=fingerprints[ch.name], session=session)
+                    else:
+                        bake_channel(self.uv_map, mat, node, ch, width, height, use_hdr=use_hdr, packed=packed, 
+                                cache_key=fingerprints[ch.name], session=session)
+                    #return {'FINISHED'}
+
+        packed = None
 
-        # AA process
+        # AA process, box filter is enough since size is multiplied by integer
         if self.aa_level > 1:
-            for ch in yp.channels:
+            for ch in bake_chs:
 
                 baked = tree.nodes.get(ch.baked)
                 if baked and baked.image:
                     resize_image(baked.image, self.width, self.height, 
-                            baked.image.colorspace_settings.name, alpha_aware=ch.enable_alpha, force_use_cpu=self.force_use_cpu)
+                            baked.image.colorspace_settings.name, alpha_aware=ch.enable_alpha, force_use_cpu=self.force_use_cpu, method='BOX')
 
                 if ch.type == 'NORMAL':
 
                     baked_disp = tree.nodes.get(ch.baked_disp)
                     if baked_disp and baked_disp.image:
                         resize_image(baked_disp.image, self.width, self.height, 
-                                baked.image.colorspace_settings.name, alpha_aware=ch.enable_alpha, force_use_cpu=self.force_use_cpu)
+                                baked.image.colorspace_settings.name, alpha_aware=ch.enable_alpha, force_use_cpu=self.force_use_cpu, method='BOX')
 
                     baked_normal_overlay = tree.nodes.get(ch.baked_normal_overlay)
                     if baked_normal_overlay and baked_normal_overlay.image:
                         resize_image(baked_normal_overlay.image, self.width, self.height, 
-                                baked.image.colorspace_settings.name, alpha_aware=ch.enable_alpha, force_use_cpu=self.force_use_cpu)
+                                baked.image.colorspace_settings.name, alpha_aware=ch.enable_alpha, force_use_cpu=self.force_use_cpu, method='BOX')
 
         # FXAA
         if self.fxaa:
-            for ch in yp.channels:
-                # FXAA doesn't work with hdr image
-                if not ch.use_clamp: continue
+            for ch in bake_chs:
+                # Cycles FXAA doesn't work with hdr image
+                if not ch.use_clamp and self.fxaa_method == 'CYCLES': continue
 
                 baked = tree.nodes.get(ch.baked)
                 if baked and baked.image:
-                    fxaa_image(baked.image, ch.enable_alpha, self.force_use_cpu)
+                    fxaa_image(baked.image, ch.enable_alpha, self.force_use_cpu, self.fxaa_method)
                     #return {'FINISHED'}
 
                 if ch.type == 'NORMAL':
 
                     baked_disp = tree.nodes.get(ch.baked_disp)
                     if baked_disp and baked_disp.image:
-                        fxaa_image(baked_disp.image, ch.enable_alpha, self.force_use_cpu)
+                        fxaa_image(baked_disp.image, ch.enable_alpha, self.force_use_cpu, self.fxaa_method)
 
                     baked_normal_overlay = tree.nodes.get(ch.baked_normal_overlay)
                     if baked_normal_overlay and baked_normal_overlay.image:
-                        fxaa_image(baked_normal_overlay.image, ch.enable_alpha, self.force_use_cpu)
+                        fxaa_image(baked_normal_overlay.image, ch.enable_alpha, self.force_use_cpu, self.fxaa_method)
+
+        # Remember fingerprints so next bake can reuse unchanged channels
+        for ch in bake_chs:
+            ch.baked_fingerprint = fingerprints[ch.name] if not ch.no_layer_using else ''
 
         # Set baked uv
         yp.baked_uv_name = self.uv_map
@@ -1078,40 +1258,12 @@ class YBakeChannels(bpy.types.Operator):
                             #print(ori_loop_locs[ob.name][i][j])
                             uvl.data[li].uv = ori_loop_locs[ob.name][i][j]
 
-        # Use bake results
-        yp.halt_update = True
-        yp.use_baked = True
-        yp.halt_update = False
+        self.use_bake_results(context, tree, height_ch, tangent_sign_calculation)
 
-        # Check subdiv Setup
-        if height_ch:
-            check_subdiv_setup(height_ch)
-
-        # Update global uv
-        check_uv_nodes(yp)
-
-        # Recover hack
-        #if is_greater_than_280():
-        if BL28_HACK and height_ch and tangent_sign_calculation:
-            # Refresh tangent sign hacks
-            update_enable_tangent_sign_hacks(yp, context)
-
-            # Revert back cycles hack
-            if not is_greater_than_280():
-                for uv in yp.uvs:
-                    tangent_process = tree.nodes.get(uv.tangent_process)
-                    if tangent_process:
-                        tangent_process.inputs['Blender 2.8 Cycles Hack'].default_value = 1.0
-
-        # Rearrange
-        rearrange_yp_nodes(tree)
-        reconnect_yp_nodes(tree)
-
-        # Refresh active channel index
-        yp.active_channel_index = yp.active_channel_index
-
-        # Update baked outside nodes
-        update_enable_baked_outside(yp, context)
+        if reused_chs:
+            names = ', '.join([ch.name for ch in reused_chs])
+            self.report({'INFO'}, 'Reused unchanged channel(s): ' + names)
+            print('INFO: Reused unchanged channel(s) of', tree.name + ':', names)
 
         print('INFO:', tree.name, 'channels is baked at', '{:0.2f}'.format(time.time() - T), 'seconds!')
 
@@ -1726,26 +1878,13 @@ class YMergeMask(bpy.types.Operator):
         bpy.ops.object.bake()
 
         # Copy results to original image
-        target_pxs = list(source.image.pixels)
-        temp_pxs = list(img.pixels)
-
         if segment:
-            start_x = width * segment.tile_x
-            start_y = height * segment.tile_y
+            start_x, start_y = get_segment_start(segment)
         else:
             start_x = 0
             start_y = 0
 
-        for y in range(height):
-            temp_offset_y = width * 4 * y
-            offset_y = source.image.size[0] * 4 * (y + start_y)
-            for x in range(width):
-                temp_offset_x = 4 * x
-                offset_x = 4 * (x + start_x)
-                for i in range(3):
-                    target_pxs[offset_y + offset_x + i] = temp_pxs[temp_offset_y + temp_offset_x + i]
-
-        source.image.pixels = target_pxs
+        image_buffer.blit_rgb(img, source.image, start_x, start_y)
 
         # Remove temp image
         bpy.data.images.remove(img)
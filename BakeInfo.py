@@ -55,9 +55,15 @@ class YBakeInfoProps(bpy.types.PropertyGroup):
             default=False)
 
     fxaa : BoolProperty(name='Use FXAA', 
-            description = "Use FXAA to baked image (doesn't work with float images)",
+            description = "Use FXAA to baked image",
             default=False)
 
+    fxaa_method : EnumProperty(
+            name = 'FXAA Method',
+            description = 'FXAA Method',
+            items = fxaa_method_items,
+            default='NUMPY')
+
     ssaa : BoolProperty(name='Use SSAA', 
             description = "Use Supersample AA to baked image",
             default=False)
@@ -6,7 +6,7 @@ from .bake_common import *
 from .subtree import *
 from .node_connections import *
 from .node_arrangements import *
-from . import lib, Layer, Mask, ImageAtlas, Modifier, MaskModifier, BakeInfo
+from . import lib, Layer, Mask, ImageAtlas, Modifier, MaskModifier, BakeInfo, image_buffer, bake_cache, bake_fingerprint, uv_raster
 
 TEMP_VCOL = '__temp__vcol__'
 
@@ -203,9 +203,15 @@ class YBakeToLayer(bpy.types.Operator):
             )
 
     fxaa : BoolProperty(name='Use FXAA', 
-            description = "Use FXAA to baked image (doesn't work with float images)",
+            description = "Use FXAA to baked image",
             default=True)
 
+    fxaa_method : EnumProperty(
+            name = 'FXAA Method',
+            description = 'FXAA Method',
+            items = fxaa_method_items,
+            default='NUMPY')
+
     ssaa : BoolProperty(name='Use SSAA', 
             description = "Use Supersample AA to baked image",
             default=False)
@@ -277,6 +283,11 @@ class YBakeToLayer(bpy.types.Operator):
             description='Force use CPU for baking (usually faster than using GPU)',
             default=False)
 
+    use_fast_vertex_bake : BoolProperty(
+            name='Fast Vertex Bake',
+            description='Rasterize vertex data directly to the image without using Cycles (only used if the mesh has no modifier that changes its shape)',
+            default=True)
+
     #source_object : PointerProperty(
     #        type=bpy.types.Object,
     #        #poll=scene_mychosenobject_poll
@@ -551,6 +562,7 @@ class YBakeToLayer(bpy.types.Operator):
 
         show_subsurf_influence = not self.type.startswith('MULTIRES_') and self.type not in {'SELECTED_VERTICES'}
         show_use_baked_disp = height_root_ch and not self.type.startswith('MULTIRES_') and self.type not in {'SELECTED_VERTICES'}
+        show_fast_vertex_bake = self.type in uv_raster.vertex_bake_types
 
         col = row.column(align=False)
 
@@ -597,6 +609,9 @@ class YBakeToLayer(bpy.types.Operator):
         col.label(text='')
         col.label(text='')
 
+        if show_fast_vertex_bake:
+            col.label(text='')
+
         #if not self.type.startswith('MULTIRES_'):
         if show_subsurf_influence:
             col.label(text='')
@@ -654,10 +669,18 @@ class YBakeToLayer(bpy.types.Operator):
         col.separator()
         if self.type.startswith('OTHER_OBJECT_'):
             col.prop(self, 'ssaa')
-        else: col.prop(self, 'fxaa')
+        else:
+            rrow = col.row(align=True)
+            rrow.prop(self, 'fxaa')
+            rrrow = rrow.row(align=True)
+            rrrow.active = self.fxaa
+            rrrow.prop(self, 'fxaa_method', text='')
 
         col.prop(self, 'force_use_cpu')
 
+        if show_fast_vertex_bake:
+            col.prop(self, 'use_fast_vertex_bake')
+
         col.separator()
 
         #if not self.type.startswith('MULTIRES_') or self.type not in {'SELECTED_VERTICES'}:
@@ -681,6 +704,10 @@ class YBakeToLayer(bpy.types.Operator):
         col.separator()
 
     def execute(self, context):
+        # Scene should be recovered even if the bake is failed
+        return run_guarded_bake(self.bake, context)
+
+    def bake(self, context):
         T = time.time()
         mat = get_active_material()
         node = get_active_ypaint_node()
@@ -788,12 +815,27 @@ class YBakeToLayer(bpy.types.Operator):
                 else: self.report({'ERROR'}, "Source objects must be selected and it must has different material!")
                 return {'CANCELLED'}
 
+        # Vertex data can be rasterized directly if the render mesh is the same as the original mesh
+        use_fast_vertex_bake = (self.use_fast_vertex_bake and self.type in uv_raster.vertex_bake_types and 
+                not self.use_baked_disp and all([uv_raster.is_rasterizable(o) for o in objs]))
+
+        # Bake cache key, selected vertices depends on edit mode selection so it's not cached
+        cache_key = ''
+        if bake_cache.is_bake_cache_enabled() and self.type != 'SELECTED_VERTICES':
+            extra = ''
+            height_root_ch = get_root_height_channel(yp)
+            if height_root_ch and self.use_baked_disp and not self.type.startswith('MULTIRES_'):
+                extra = bake_fingerprint.get_channel_fingerprint(node, height_root_ch, objs)
+            if use_fast_vertex_bake:
+                extra += 'FAST_VERTEX_BAKE'
+            cache_key = bake_cache.get_bake_to_layer_key(self, objs, other_objs, extra)
+
         # Remember things
         book = remember_before_bake(yp)
 
-        # FXAA doesn't work with hdr image
+        # Cycles FXAA doesn't work with hdr image
         # FXAA also does not works well with baked image with alpha, so other object bake will use SSAA instead
-        use_fxaa = not self.hdr and self.fxaa and not self.type.startswith('OTHER_OBJECT_')
+        use_fxaa = (not self.hdr or self.fxaa_method == 'NUMPY') and self.fxaa and not self.type.startswith('OTHER_OBJECT_')
 
         # For now SSAA only works with other object baking
         use_ssaa = self.ssaa and self.type.startswith('OTHER_OBJECT_')
@@ -914,16 +956,19 @@ class YBakeToLayer(bpy.types.Operator):
                 obj_vertex_indices[obj.name] = v_indices
 
             bpy.ops.object.mode_set(mode = 'OBJECT')
-            for obj in objs:
-                try:
-                    vcol = new_vertex_color(obj, TEMP_VCOL)
-                    set_obj_vertex_colors(obj, vcol.name, (0.0, 0.0, 0.0, 1.0))
-                    set_active_vertex_color(obj, vcol)
-                except: pass
-            bpy.ops.object.mode_set(mode = 'EDIT')
-            bpy.ops.mesh.y_vcol_fill(color_option ='WHITE')
-            #return {'FINISHED'}
-            bpy.ops.object.mode_set(mode = 'OBJECT')
+
+            # Rasterizer reads the selection directly, so temporary vertex color is not needed
+            if not use_fast_vertex_bake:
+                for obj in objs:
+                    try:
+                        vcol = new_vertex_color(obj, TEMP_VCOL)
+                        set_obj_vertex_colors(obj, vcol.name, (0.0, 0.0, 0.0, 1.0))
+                        set_active_vertex_color(obj, vcol)
+                    except: pass
+                bpy.ops.object.mode_set(mode = 'EDIT')
+                bpy.ops.mesh.y_vcol_fill(color_option ='WHITE')
+                #return {'FINISHED'}
+                bpy.ops.object.mode_set(mode = 'OBJECT')
 
         #return {'FINISHED'}
 
@@ -935,7 +980,7 @@ class YBakeToLayer(bpy.types.Operator):
             bake_type = 'DISPLACEMENT'
         elif self.type == 'OTHER_OBJECT_NORMAL':
             bake_type = 'NORMAL'
-        else: 
+        else:
             bake_type = 'EMIT'
 
         # If use only local, hide other objects
@@ -1078,7 +1123,8 @@ class YBakeToLayer(bpy.types.Operator):
                         m.render_levels = m.total_levels
                         break
 
-            if len(obj.data.materials) > 1:
+            # Rasterizer filters polygons by material by itself
+            if len(obj.data.materials) > 1 and not use_fast_vertex_bake:
                 active_mat_id = [i for i, m in enumerate(obj.data.materials) if m == mat][0]
 
                 uv_layers = get_uv_layers(obj)
@@ -1138,7 +1184,7 @@ class YBakeToLayer(bpy.types.Operator):
             else:
 
                 if context.scene.world:
-                    context.scene.world.light_settings.distance = self.ao_distance
+                    book.set(context.scene.world.light_settings, 'distance', self.ao_distance)
 
                 mat.node_tree.links.new(src.outputs[0], output.inputs[0])
 
@@ -1244,64 +1290,53 @@ class YBakeToLayer(bpy.types.Operator):
         #return {'FINISHED'}
 
         # Bake!
-        if self.type.startswith('MULTIRES_'):
+        if bake_cache.load_cached_image(image, cache_key, 'MAIN'):
+            pass
+        elif use_fast_vertex_bake:
+            if self.type == 'SELECTED_VERTICES':
+                uv_raster.bake_selected_vertices(image, objs, obj_vertex_indices, fill_mode == 'FACE', self.uv_map, 
+                        self.margin, mat=mat, force_bake_all_polygons=self.force_bake_all_polygons)
+            else: 
+                uv_raster.bake_pointiness(image, objs, self.uv_map, self.margin, 
+                        mat=mat, force_bake_all_polygons=self.force_bake_all_polygons)
+            bake_cache.store_cached_image(image, cache_key, 'MAIN')
+        elif self.type.startswith('MULTIRES_'):
             bpy.ops.object.bake_image()
+            bake_cache.store_cached_image(image, cache_key, 'MAIN')
         else:
             if bake_type != 'EMIT':
-                bpy.ops.object.bake(type=bake_type)
-            else: bpy.ops.object.bake()
+                bake_cached(image, cache_key, 'MAIN', type=bake_type)
+            else: bake_cached(image, cache_key, 'MAIN')
 
-        if use_fxaa: fxaa_image(image, False, self.force_use_cpu)
+        if use_fxaa: fxaa_image(image, False, self.force_use_cpu, self.fxaa_method)
 
         # Bake alpha if baking other objects normal
         #if self.type.startswith('OTHER_OBJECT_'):
-        if self.type == 'OTHER_OBJECT_NORMAL':
+        if self.type == 'OTHER_OBJECT_NORMAL' and bake_cache.load_cached_image(image, cache_key, 'ALPHA'):
+            pass
+        elif self.type == 'OTHER_OBJECT_NORMAL':
             temp_img = bpy.data.images.new(name='__TEMP_IMAGE__',
                     width=width, height=height, alpha=True, float_buffer=self.hdr)
             tex.image = temp_img
 
             # Need to use clear so there's alpha on the baked image
-            scene.render.bake.use_clear = True
+            book.set(scene.render.bake, 'use_clear', True)
 
             # Bake emit can will create alpha image
             bpy.ops.object.bake(type='EMIT')
 
             #return {'FINISHED'}
 
-            # Copy alpha to RGB channel, so it can be fxaa-ed
-            temp_pxs = list(temp_img.pixels)
-            for y in range(height):
-                offset_y = width * 4 * y
-                for x in range(width):
-                    offset_x = 4 * x
-                    for i in range(3):
-                        temp_pxs[offset_y + offset_x + i] = temp_pxs[offset_y + offset_x + 3]
-                    temp_pxs[offset_y + offset_x + 3] = 1.0
-            temp_img.pixels = temp_pxs
-
             # Copy alpha to actual image
-            target_pxs = list(image.pixels)
-            temp_pxs = list(temp_img.pixels)
-
-            start_x = 0
-            start_y = 0
-            for y in range(height):
-                temp_offset_y = width * 4 * y
-                offset_y = width * 4 * (y + start_y)
-                for x in range(width):
-                    temp_offset_x = 4 * x
-                    offset_x = 4 * (x + start_x)
-                    target_pxs[offset_y + offset_x + 3] = temp_pxs[temp_offset_y + temp_offset_x]
-                    #target_pxs[offset_y + offset_x + 3] = temp_pxs[temp_offset_y + temp_offset_x + 3]
-
-            image.pixels = target_pxs
+            image_buffer.inject_alpha(temp_img, image, channel=3)
+            bake_cache.store_cached_image(image, cache_key, 'ALPHA')
 
             # Remove temp image
             bpy.data.images.remove(temp_img)
 
         # Back to original size if using SSA
         if use_ssaa:
-            image, temp_segment = resize_image(image, self.width, self.height, image.colorspace_settings.name, alpha_aware=True, force_use_cpu=self.force_use_cpu)
+            image, temp_segment = resize_image(image, self.width, self.height, image.colorspace_settings.name, alpha_aware=True, force_use_cpu=self.force_use_cpu, method='BOX')
 
         #return {'FINISHED'}
 
@@ -1333,21 +1368,7 @@ class YBakeToLayer(bpy.types.Operator):
             #    img.colorspace_settings.name = 'Linear'
 
             # Set baked image to segment
-            target_pxs = list(ia_image.pixels)
-            source_pxs = list(image.pixels)
-
-            start_x = self.width * segment.tile_x
-            start_y = self.height * segment.tile_y
-            for y in range(self.height):
-                source_offset_y = self.width * 4 * y
-                offset_y = ia_image.size[0] * 4 * (y + start_y)
-                for x in range(self.width):
-                    source_offset_x = 4 * x
-                    offset_x = 4 * (x + start_x)
-                    for i in range(4):
-                        target_pxs[offset_y + offset_x + i] = source_pxs[source_offset_y + source_offset_x + i]
-
-            ia_image.pixels = target_pxs
+            image_buffer.blit_image(image, ia_image, *get_segment_start(segment))
             temp_img = image
             image = ia_image
 
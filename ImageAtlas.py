@@ -1,48 +1,249 @@
-import bpy, time, random, numpy, re
+import bpy, time, random, numpy, re, bisect
 from bpy.props import *
+from bpy.app.handlers import persistent
 from .common import *
 from .subtree import *
-from . import BakeInfo
-
-def is_tile_available(x, y, width, height, atlas):
-
-    start_x = width * x
-    end_x = start_x + width - 1
-
-    start_y = height * y
-    end_y = start_y + height - 1
-
-    for segment in atlas.segments:
-
-        segment_start_x = segment.width * segment.tile_x
-        segment_end_x = segment_start_x + segment.width - 1
-
-        segment_start_y = segment.height * segment.tile_y
-        segment_end_y = segment_start_y + segment.height - 1
-
-        if (
-            ((start_x >= segment_start_x and start_x <= segment_end_x) or 
-            (end_x <= segment_end_x and end_x >= segment_start_x)) 
-            and
-            ((start_y >= segment_start_y and start_y <= segment_end_y) or 
-            (end_y <= segment_end_y and end_y >= segment_start_y)) 
-            ):
-            return False
-
-    return True
+from . import BakeInfo, image_buffer
+
+# Image atlas segments are allocated using guillotine rectangle packing
+# Free spaces are stored as list of non overlapping rectangles (x, y, width, height)
+
+def subtract_rect(rects, used):
+    ux, uy, uw, uh = used
+    result = []
+
+    for rect in rects:
+        x, y, w, h = rect
+
+        # Not overlapping
+        if ux >= x + w or ux + uw <= x or uy >= y + h or uy + uh <= y:
+            result.append(rect)
+            continue
+
+        # Left and right strips use full height of the rectangle
+        if ux > x:
+            result.append((x, y, ux - x, h))
+        if ux + uw < x + w:
+            result.append((ux + uw, y, x + w - ux - uw, h))
+
+        # Bottom and top strips only use the overlapping columns
+        mid_x = max(x, ux)
+        mid_w = min(x + w, ux + uw) - mid_x
+        if uy > y:
+            result.append((mid_x, y, mid_w, uy - y))
+        if uy + uh < y + h:
+            result.append((mid_x, uy + uh, mid_w, y + h - uy - uh))
+
+    return result
+
+def merge_free_rects(rects):
+    rects = list(rects)
+
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            x, y, w, h = rects[i]
+            for j in range(i + 1, len(rects)):
+                ox, oy, ow, oh = rects[j]
+
+                # Vertically adjacent with same columns
+                if x == ox and w == ow and (y + h == oy or oy + oh == y):
+                    rects[i] = (x, min(y, oy), w, h + oh)
+                    merged = True
+
+                # Horizontally adjacent with same rows
+                elif y == oy and h == oh and (x + w == ox or ox + ow == x):
+                    rects[i] = (min(x, ox), y, w + ow, h)
+                    merged = True
+
+                if merged:
+                    del rects[j]
+                    break
+            if merged: break
+
+    return rects
+
+def split_free_rect(rect, width, height):
+    x, y, w, h = rect
+    leftover_w = w - width
+    leftover_h = h - height
+
+    # Split along the shorter leftover axis so the bigger leftover stays as big as possible
+    if leftover_w < leftover_h:
+        right = (x + width, y, leftover_w, height)
+        top = (x, y + height, w, leftover_h)
+    else:
+        right = (x + width, y, leftover_w, h)
+        top = (x, y + height, width, leftover_h)
+
+    return [r for r in (right, top) if r[2] > 0 and r[3] > 0]
+
+def get_rect_edges(rect):
+    x, y, w, h = rect
+    return [('BOTTOM', x, w, y), ('TOP', x, w, y + h), ('LEFT', y, h, x), ('RIGHT', y, h, x + w)]
+
+class FreeRectIndex():
+    ''' Free rectangles sorted by area for best area fit, and mapped by their edges for merging
+        If collection is set, changes are mirrored to it using the same order as the rects list
+    '''
+    def __init__(self, rects, collection=None):
+        self.collection = collection
+        self.revision = 0
+
+        # Same order as the collection
+        self.rects = []
+
+        # {rect : index of rects}
+        self.positions = {}
+
+        # Sorted list of (area, rect)
+        self.by_area = []
+
+        # {edge : rect}, free rects never overlap, so every edge belongs to a single rect
+        self.edges = {}
+
+        for rect in rects:
+            self.index_rect(rect)
+
+    def index_rect(self, rect):
+        self.positions[rect] = len(self.rects)
+        self.rects.append(rect)
+        bisect.insort(self.by_area, (rect[2] * rect[3], rect))
+        for edge in get_rect_edges(rect):
+            self.edges[edge] = rect
+
+    def add(self, rect):
+        self.index_rect(rect)
+
+        if self.collection != None:
+            r = self.collection.add()
+            r.x, r.y, r.width, r.height = rect
+
+    def remove(self, rect):
+        idx = self.positions.pop(rect)
+        del self.by_area[bisect.bisect_left(self.by_area, (rect[2] * rect[3], rect))]
+        for edge in get_rect_edges(rect):
+            del self.edges[edge]
+
+        # Move the last rect into the removed slot so no other item need to be shifted
+        last = self.rects.pop()
+        if idx < len(self.rects):
+            self.rects[idx] = last
+            self.positions[last] = idx
+
+        if self.collection != None:
+            last_idx = len(self.collection) - 1
+            if idx < last_idx:
+                r = self.collection[idx]
+                r.x, r.y, r.width, r.height = last
+            self.collection.remove(last_idx)
+
+    def find(self, width, height):
+        ''' Returns the smallest free rect that can contain the size, rects that are too small are skipped '''
+        for i in range(bisect.bisect_left(self.by_area, (width * height,)), len(self.by_area)):
+            rect = self.by_area[i][1]
+            if rect[2] >= width and rect[3] >= height:
+                return rect
+        return None
+
+    def allocate(self, width, height):
+        ''' Returns position of the allocated rectangle or None if there's no space left '''
+        rect = self.find(width, height)
+        if not rect: return None
+
+        self.remove(rect)
+        for r in split_free_rect(rect, width, height):
+            self.add(r)
+
+        return rect[0], rect[1]
+
+    def free(self, rect):
+        ''' Give back used rectangle, merged with its free neighbors that share a full edge '''
+        while True:
+            x, y, w, h = rect
+            neighbor = None
+            for edge in [('TOP', x, w, y), ('BOTTOM', x, w, y + h), ('RIGHT', y, h, x), ('LEFT', y, h, x + w)]:
+                neighbor = self.edges.get(edge)
+                if neighbor: break
+            if not neighbor: break
+
+            self.remove(neighbor)
+            nx, ny, nw, nh = neighbor
+            if nx == x and nw == w:
+                rect = (x, min(y, ny), w, h + nh)
+            else: rect = (min(x, nx), y, w + nw, h)
+
+        self.add(rect)
+
+def build_free_rects(atlas_width, atlas_height, used_rects):
+    rects = [(0, 0, atlas_width, atlas_height)]
+    for used in used_rects:
+        rects = subtract_rect(rects, used)
+    return merge_free_rects(rects)
+
+# Free rect index of every atlas image, {image name : FreeRectIndex}
+_free_rect_indices = {}
+
+def get_free_rect_index(atlas):
+    ''' Get free rect index of the atlas for lookups, it never writes to the atlas so it can be used while drawing
+        The index is only read from the collection if it's changed outside of it
+    '''
+    img = atlas.id_data
+
+    # Atlas from older version has no stored free rects, use temporary index built from existing segments
+    if not atlas.use_free_rects:
+        return FreeRectIndex(build_free_rects(img.size[0], img.size[1], [get_segment_rect(s) for s in atlas.segments]))
+
+    # Undo can bring back older free rects
+    index = _free_rect_indices.get(img.name)
+    if not index or index.revision != atlas.free_rects_revision or len(index.rects) != len(atlas.free_rects):
+        index = FreeRectIndex([(r.x, r.y, r.width, r.height) for r in atlas.free_rects])
+        index.revision = atlas.free_rects_revision
+        _free_rect_indices[img.name] = index
+
+    return index
+
+def get_writable_free_rect_index(atlas):
+    ''' Get free rect index that mirrors its changes to the atlas, only use this outside of drawing '''
+    img = atlas.id_data
+
+    # Store free rects of atlas from older version
+    if not atlas.use_free_rects:
+        rects = get_free_rect_index(atlas).rects
+        atlas.free_rects.clear()
+        index = FreeRectIndex([], atlas.free_rects)
+        for rect in rects:
+            index.add(rect)
+        atlas.use_free_rects = True
+        bump_free_rects_revision(atlas, index)
+        _free_rect_indices[img.name] = index
+        return index
+
+    index = get_free_rect_index(atlas)
+    index.collection = atlas.free_rects
+
+    return index
+
+def bump_free_rects_revision(atlas, index):
+    index.revision = atlas.free_rects_revision = atlas.free_rects_revision + 1
+
+def free_segment_rect(atlas, segment):
+    index = get_writable_free_rect_index(atlas)
+    index.free(get_segment_rect(segment))
+    bump_free_rects_revision(atlas, index)
+
+@persistent
+def clear_free_rect_indices(scene):
+    # Images with same name can be different atlases after loading other file
+    _free_rect_indices.clear()
 
 def get_available_tile(width, height, atlas):
-    atlas_img = atlas.id_data
-
-    num_x = int(atlas_img.size[0] / width)
-    num_y = int(atlas_img.size[1] / height)
-
-    for y in range(num_y):
-        for x in range(num_x):
-            if is_tile_available(x, y, width, height, atlas):
-                return [x, y]
+    ''' Returns pixel position of available space inside the atlas '''
+    rect = get_free_rect_index(atlas).find(width, height)
+    if not rect: return []
 
-    return []
+    return [rect[0], rect[1]]
 
 def create_image_atlas(color='BLACK', size=8192, hdr=False, name=''):
 
@@ -78,55 +279,46 @@ def create_image_atlas_segment(atlas, width, height):
 
     segment = None
 
-    tile = get_available_tile(width, height, atlas)
-    if tile:
+    index = get_writable_free_rect_index(atlas)
+    pos = index.allocate(width, height)
+    if pos:
         segment = atlas.segments.add()
         segment.name = name
         segment.width = width
         segment.height = height
-        segment.tile_x = tile[0]
-        segment.tile_y = tile[1]
+        segment.start_x = pos[0]
+        segment.start_y = pos[1]
 
-    return segment
+        bump_free_rects_revision(atlas, index)
 
-def clear_segment(segment):
-    img = segment.id_data
-    atlas = img.yia
+    return segment
 
+def get_atlas_base_color(atlas):
     if atlas.color == 'BLACK':
-        col = (0.0, 0.0, 0.0, 1.0)
+        return (0.0, 0.0, 0.0, 1.0)
     elif atlas.color == 'WHITE':
-        col = (1.0, 1.0, 1.0, 1.0)
-    else:
-        col = (0.0, 0.0, 0.0, 0.0)
+        return (1.0, 1.0, 1.0, 1.0)
+    return (0.0, 0.0, 0.0, 0.0)
 
-    pxs = list(img.pixels)
+def clear_segment(segment):
+    img = segment.id_data
+    atlas = img.yia
 
     # Recolor segment
-    start_x = segment.width * segment.tile_x
-    end_x = start_x + segment.width
-
-    start_y = segment.height * segment.tile_y
-    end_y = start_y + segment.height
-
-    for y in range(start_y, end_y):
-        offset_y = img.size[0] * 4 * y
-        for x in range(start_x, end_x):
-            for i in range(4):
-                pxs[offset_y + (x*4) + i] = col[i]
-
-    img.pixels = pxs
+    image_buffer.fill_rect(img, *get_segment_rect(segment), get_atlas_base_color(atlas))
 
 def clear_unused_segments(atlas):
 
-    # Recolor unused segments
-    for segment in atlas.segments:
-        if segment.unused:
-            clear_segment(segment)
+    img = atlas.id_data
 
-    # Remove unused segments
+    # Recolor unused segments using single pixel read and write
+    rects = [get_segment_rect(s) for s in atlas.segments if s.unused]
+    image_buffer.fill_rects(img, rects, get_atlas_base_color(atlas))
+
+    # Remove unused segments and give back their spaces
     for i, segment in reversed(list(enumerate(atlas.segments))):
         if segment.unused:
+            free_segment_rect(atlas, segment)
             atlas.segments.remove(i)
 
 def is_there_any_unused_segments(atlas, width, height):
@@ -150,30 +342,10 @@ def copy_segment_pixels(img_from, segment_from, img_to, segment_to):
     if segment_from.width != segment_to.width or segment_from.height != segment_to.height:
         return
 
-    from_pxs = list(img_from.pixels)
-    if img_from == img_to:
-        to_pxs = from_pxs
-    else: to_pxs = list(img_to.pixels)
-
-    width = segment_from.width
-    height = segment_from.height
-
-    from_start_x = width * segment_from.tile_x
-    from_start_y = height * segment_from.tile_y
+    from_x, from_y, width, height = get_segment_rect(segment_from)
+    to_x, to_y, width, height = get_segment_rect(segment_to)
 
-    to_start_x = width * segment_to.tile_x
-    to_start_y = height * segment_to.tile_y
-
-    for y in range(height):
-        from_offset_y = img_from.size[0] * 4 * (y + from_start_y)
-        to_offset_y = img_to.size[0] * 4 * (y + to_start_y)
-        for x in range(width):
-            from_offset_x = 4 * (x + from_start_x)
-            to_offset_x = 4 * (x + to_start_x)
-            for i in range(4):
-                to_pxs[to_offset_y + to_offset_x + i] = from_pxs[from_offset_y + from_offset_x + i]
-
-    img_to.pixels = to_pxs
+    image_buffer.copy_rect(img_from, from_x, from_y, img_to, to_x, to_y, width, height)
 
 def get_set_image_atlas_segment(width, height, color='BLACK', hdr=False, img_from=None, segment_from=None, yp=None):
 
@@ -214,7 +386,7 @@ def get_set_image_atlas_segment(width, height, color='BLACK', hdr=False, img_fro
         #if segment: return segment
 
     if img_from and segment_from:
-        copy_segment_pixels(img_from, segment_from, img, segment)
+        copy_segment_pixels(img_from, segment_from, segment.id_data, segment)
 
     return segment
 
@@ -297,8 +469,9 @@ def set_segment_mapping(entity, segment, image):
     scale_x = segment.width/image.size[0]
     scale_y = segment.height/image.size[1]
 
-    offset_x = scale_x * segment.tile_x
-    offset_y = scale_y * segment.tile_y
+    start_x, start_y = get_segment_start(segment)
+    offset_x = start_x / image.size[0]
+    offset_y = start_y / image.size[1]
 
     if mapping:
         if is_greater_than_281():
@@ -387,31 +560,101 @@ class YNewImageAtlasSegmentTest(bpy.types.Operator):
         if segment and True:
             col = [random.random(), random.random(), random.random(), 1.0]
 
-            start_x = self.width * segment.tile_x
-            end_x = start_x + self.width
+            image_buffer.fill_rect(atlas_img, *get_segment_rect(segment), col)
 
-            start_y = self.height * segment.tile_y
-            end_y = start_y + self.height
+        # Update image editor
+        update_image_editor_image(context, atlas_img)
 
-            pxs = list(atlas_img.pixels)
-            #pxs = numpy.array(atlas_img.pixels) #, dtype='float16')
+        print('INFO: Segment is created at', '{:0.2f}'.format((time.time() - T) * 1000), 'ms!')
 
-            for y in range(start_y, end_y):
+        return {'FINISHED'}
 
-                offset_y = atlas_img.size[0] * 4 * y
-                #atlas_img.pixels[offset_y + start_x * 4 : offset_y + end_x * 4] = col * self.width
+def pack_segments_legacy(sizes, atlas_size):
+    ''' Simulate old grid based allocation, returns number of atlases used '''
+    atlases = []
+    for width, height in sizes:
+        placed = False
+        for used in atlases:
+            for ty in range(atlas_size // height):
+                for tx in range(atlas_size // width):
+                    x = tx * width
+                    y = ty * height
+                    if not any(x < ux + uw and ux < x + width and y < uy + uh and uy < y + height 
+                            for ux, uy, uw, uh in used):
+                        used.append((x, y, width, height))
+                        placed = True
+                        break
+                if placed: break
+            if placed: break
+
+        if not placed:
+            atlases.append([(0, 0, width, height)])
+
+    return len(atlases)
+
+def pack_segments(sizes, atlas_size):
+    ''' Simulate guillotine allocation, returns number of atlases used '''
+    atlases = []
+    for width, height in sizes:
+        pos = None
+        for index in atlases:
+            pos = index.allocate(width, height)
+            if pos: break
+
+        if not pos:
+            index = FreeRectIndex([(0, 0, atlas_size, atlas_size)])
+            index.allocate(width, height)
+            atlases.append(index)
+
+    return len(atlases)
+
+class YImageAtlasPackingBenchmark(bpy.types.Operator):
+    bl_idname = "node.y_image_atlas_packing_benchmark"
+    bl_label = "Image Atlas Packing Benchmark"
+    bl_description = "Allocate lots of mixed size segments and report time and fill ratio (no image is created)"
+    bl_options = {'REGISTER'}
+
+    num_segments : IntProperty(name='Number of Segments', default=2000, min=1)
+    atlas_size : IntProperty(name='Atlas Size', default=8192, min=1024, max=16384)
+    compare_legacy : BoolProperty(name='Compare with Grid Allocation (Slow)', default=False)
 
-                for x in range(start_x, end_x):
-                    for i in range(3):
-                        pxs[offset_y + (x*4) + i] = col[i]
-                        pxs[offset_y + (x*4) + 3] = 1.0
+    @classmethod
+    def poll(cls, context):
+        return True
 
-            atlas_img.pixels = pxs
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self, width=320)
 
-        # Update image editor
-        update_image_editor_image(context, atlas_img)
+    def draw(self, context):
+        col = self.layout.column()
+        col.prop(self, "num_segments")
+        col.prop(self, "atlas_size")
+        col.prop(self, "compare_legacy")
 
-        print('INFO: Segment is created at', '{:0.2f}'.format((time.time() - T) * 1000), 'ms!')
+    def execute(self, context):
+
+        rng = random.Random(0)
+        choices = [(512, 512), (1024, 1024), (2048, 2048), (1024, 512), (512, 1024)]
+        sizes = [rng.choice(choices) for i in range(self.num_segments)]
+        area = sum(w * h for w, h in sizes)
+        atlas_area = self.atlas_size * self.atlas_size
+
+        results = []
+        funcs = [('Guillotine', pack_segments)]
+        if self.compare_legacy:
+            funcs.append(('Grid', pack_segments_legacy))
+
+        for label, func in funcs:
+            T = time.time()
+            num_atlases = func(sizes, self.atlas_size)
+            ms = (time.time() - T) * 1000
+            fill = area / (num_atlases * atlas_area)
+
+            result = label + ': ' + str(num_atlases) + ' atlases, fill ratio ' + '{:0.2f}'.format(fill * 100) + '%, ' + '{:0.2f}'.format(ms) + ' ms'
+            print('INFO: Image atlas packing benchmark,', result)
+            results.append(result)
+
+        self.report({'INFO'}, ' | '.join(results))
 
         return {'FINISHED'}
 
@@ -527,6 +770,10 @@ class YImageAtlasSegments(bpy.types.PropertyGroup):
     tile_x : IntProperty(default=0)
     tile_y : IntProperty(default=0)
 
+    # Pixel position of the segment, -1 means it's from older version and using tile position
+    start_x : IntProperty(default=-1)
+    start_y : IntProperty(default=-1)
+
     width : IntProperty(default=1024)
     height : IntProperty(default=1024)
 
@@ -534,6 +781,12 @@ class YImageAtlasSegments(bpy.types.PropertyGroup):
 
     bake_info : PointerProperty(type=BakeInfo.YBakeInfoProps)
 
+class YImageAtlasFreeRect(bpy.types.PropertyGroup):
+    x : IntProperty(default=0)
+    y : IntProperty(default=0)
+    width : IntProperty(default=0)
+    height : IntProperty(default=0)
+
 class YImageAtlas(bpy.types.PropertyGroup):
     name : StringProperty(
             name='Name',
@@ -553,24 +806,39 @@ class YImageAtlas(bpy.types.PropertyGroup):
 
     segments : CollectionProperty(type=YImageAtlasSegments)
 
+    # Free space index for segment allocation
+    free_rects : CollectionProperty(type=YImageAtlasFreeRect)
+    use_free_rects : BoolProperty(default=False)
+
+    # Increased every time free rects are changed, so cached index can detect undo
+    free_rects_revision : IntProperty(default=0)
+
 def register():
     #bpy.utils.register_class(YUVTransformTest)
     bpy.utils.register_class(YNewImageAtlasSegmentTest)
+    bpy.utils.register_class(YImageAtlasPackingBenchmark)
     bpy.utils.register_class(YRefreshTransformedLayerUV)
     bpy.utils.register_class(YBackToOriginalUV)
     #bpy.utils.register_class(YImageSegmentOtherObject)
     #bpy.utils.register_class(YImageSegmentBakeInfoProps)
     bpy.utils.register_class(YImageAtlasSegments)
+    bpy.utils.register_class(YImageAtlasFreeRect)
     bpy.utils.register_class(YImageAtlas)
 
     bpy.types.Image.yia = PointerProperty(type=YImageAtlas)
 
+    bpy.app.handlers.load_post.append(clear_free_rect_indices)
+
 def unregister():
     #bpy.utils.unregister_class(YUVTransformTest)
     bpy.utils.unregister_class(YNewImageAtlasSegmentTest)
+    bpy.utils.unregister_class(YImageAtlasPackingBenchmark)
     bpy.utils.unregister_class(YRefreshTransformedLayerUV)
     bpy.utils.unregister_class(YBackToOriginalUV)
     #bpy.utils.unregister_class(YImageSegmentOtherObject)
     #bpy.utils.unregister_class(YImageSegmentBakeInfoProps)
     bpy.utils.unregister_class(YImageAtlasSegments)
+    bpy.utils.unregister_class(YImageAtlasFreeRect)
     bpy.utils.unregister_class(YImageAtlas)
+
+    bpy.app.handlers.load_post.remove(clear_free_rect_indices)
@@ -7,6 +7,7 @@ from .common import *
 #from .bake_common import *
 from .node_arrangements import *
 from .node_connections import *
+from .node_updates import *
 from .subtree import *
 
 DEFAULT_NEW_IMG_SUFFIX = ' Layer'
@@ -95,10 +96,10 @@ def channel_items(self, context):
 def layer_input_items(self, context):
     yp = self.id_data.yp
 
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    if not m: return []
-    layer = yp.layers[int(m.group(1))]
-    #root_ch = yp.channels[int(m.group(2))]
+    addr = get_entity_address(self)
+    if not addr or not addr.kind.startswith('LAYER_CHANNEL'): return []
+    layer = yp.layers[addr.layer_idx]
+    #root_ch = yp.channels[addr.ch_idx]
 
     items = []
 
@@ -193,6 +194,7 @@ def add_new_layer(group_tree, layer_name, layer_type, channel_idx,
 
     # Add layer to group
     layer = yp.layers.add()
+    bump_layer_generation(yp)
     layer.type = layer_type
     layer.name = layer_name
     layer.uv_name = uv_name
@@ -214,11 +216,11 @@ def add_new_layer(group_tree, layer_name, layer_type, channel_idx,
     parent_dict = set_parent_dict_val(yp, parent_dict, layer.name, parent_idx)
 
     yp.layers.move(last_index, index)
+    bump_layer_generation(yp)
     layer = yp.layers[index] # Repoint to new index
 
     # Remap parents
-    for lay in yp.layers:
-        lay.parent_idx = get_layer_index_by_name(yp, parent_dict[lay.name])
+    remap_layer_parents(yp, parent_dict)
 
     # New layer tree
     tree = bpy.data.node_groups.new(LAYERGROUP_PREFIX + layer_name, 'ShaderNodeTree')
@@ -476,10 +478,10 @@ class YNewVcolToOverrideChannel(bpy.types.Operator):
         self.ch = context.parent
 
         yp = self.ch.id_data.yp
-        m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.ch.path_from_id())
-        if not m: return []
-        layer = yp.layers[int(m.group(1))]
-        root_ch = yp.channels[int(m.group(2))]
+        addr = get_entity_address(self.ch)
+        if not addr or not addr.kind.startswith('LAYER_CHANNEL'): return []
+        layer = yp.layers[addr.layer_idx]
+        root_ch = yp.channels[addr.ch_idx]
         self.tree = get_tree(layer)
 
         self.name = layer.name + ' ' + root_ch.name +  ' Override'
@@ -1190,10 +1192,10 @@ class YOpenImageToOverrideChannel(bpy.types.Operator, ImportHelper):
                 bpy.data.images.remove(img)
 
         yp = ch.id_data.yp
-        m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', ch.path_from_id())
-        if not m: return []
-        layer = yp.layers[int(m.group(1))]
-        root_ch = yp.channels[int(m.group(2))]
+        addr = get_entity_address(ch)
+        if not addr or not addr.kind.startswith('LAYER_CHANNEL'): return []
+        layer = yp.layers[addr.layer_idx]
+        root_ch = yp.channels[addr.ch_idx]
         tree = get_tree(layer)
 
         # Make sure channel is on
@@ -1340,10 +1342,10 @@ class YOpenImageToOverride1Channel(bpy.types.Operator, ImportHelper):
                 bpy.data.images.remove(img)
 
         yp = ch.id_data.yp
-        m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', ch.path_from_id())
-        if not m: return []
-        layer = yp.layers[int(m.group(1))]
-        root_ch = yp.channels[int(m.group(2))]
+        addr = get_entity_address(ch)
+        if not addr or not addr.kind.startswith('LAYER_CHANNEL'): return []
+        layer = yp.layers[addr.layer_idx]
+        root_ch = yp.channels[addr.ch_idx]
         tree = get_tree(layer)
 
         # Make sure channel is on
@@ -1756,7 +1758,7 @@ class YOpenMultipleImagesToSingleLayer(bpy.types.Operator, ImportHelper):
             #if image.colorspace_settings.name != 'Linear':
             #    image.colorspace_settings.name = 'Linear'
 
-            m = re.match(r'^yp\.channels\[(\d+)\].*', root_ch.path_from_id())
+            m = re.match(r'^yp\.channels\[(\d+)\].*', get_entity_path(root_ch))
             ch_idx = int(m.group(1))
 
             # Use image directly to layer for the first index
@@ -2041,10 +2043,10 @@ class YOpenAvailableDataToOverride1Channel(bpy.types.Operator):
 
         ch = self.ch
         yp = ch.id_data.yp
-        m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', ch.path_from_id())
-        if not m: return []
-        layer = yp.layers[int(m.group(1))]
-        root_ch = yp.channels[int(m.group(2))]
+        addr = get_entity_address(ch)
+        if not addr or not addr.kind.startswith('LAYER_CHANNEL'): return []
+        layer = yp.layers[addr.layer_idx]
+        root_ch = yp.channels[addr.ch_idx]
         tree = get_tree(layer)
 
         # Make sure channel is on
@@ -2172,10 +2174,10 @@ class YOpenAvailableDataToOverrideChannel(bpy.types.Operator):
 
         ch = self.ch
         yp = ch.id_data.yp
-        m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', ch.path_from_id())
-        if not m: return []
-        layer = yp.layers[int(m.group(1))]
-        root_ch = yp.channels[int(m.group(2))]
+        addr = get_entity_address(ch)
+        if not addr or not addr.kind.startswith('LAYER_CHANNEL'): return []
+        layer = yp.layers[addr.layer_idx]
+        root_ch = yp.channels[addr.ch_idx]
         tree = get_tree(layer)
 
         # Make sure channel is on
@@ -2555,6 +2557,7 @@ class YMoveInOutLayerGroup(bpy.types.Operator):
 
             last_member_idx = get_last_child_idx(layer)
             yp.layers.move(neighbor_idx, last_member_idx)
+            bump_layer_generation(yp)
 
             yp.active_layer_index = neighbor_idx
 
@@ -2579,11 +2582,11 @@ class YMoveInOutLayerGroup(bpy.types.Operator):
                 parent_dict = set_parent_dict_val(yp, parent_dict, layer.name, neighbor_idx)
 
                 yp.layers.move(neighbor_idx, layer_idx)
+                bump_layer_generation(yp)
                 yp.active_layer_index = layer_idx+1
 
         # Remap parents
-        for lay in yp.layers:
-            lay.parent_idx = get_layer_index_by_name(yp, parent_dict[lay.name])
+        remap_layer_parents(yp, parent_dict)
 
         layer = yp.layers[yp.active_layer_index]
         #has_parent = layer.parent_idx != -1
@@ -2662,6 +2665,7 @@ class YMoveLayer(bpy.types.Operator):
 
                 # Swap layer
                 yp.layers.move(neighbor_idx, last_member_idx)
+                bump_layer_generation(yp)
                 yp.active_layer_index = neighbor_idx
 
                 #affected_start = neighbor_idx
@@ -2673,6 +2677,7 @@ class YMoveLayer(bpy.types.Operator):
 
                 # Swap layer
                 yp.layers.move(neighbor_idx, layer_idx)
+                bump_layer_generation(yp)
                 yp.active_layer_index = layer_idx+1
 
                 #affected_start = neighbor_idx
@@ -2687,6 +2692,7 @@ class YMoveLayer(bpy.types.Operator):
                 # Swap all related layers
                 for i in range(last_member_idx+1 - layer_idx):
                     yp.layers.move(layer_idx+i, neighbor_idx+i)
+                    bump_layer_generation(yp)
 
                 yp.active_layer_index = neighbor_idx
 
@@ -2700,6 +2706,7 @@ class YMoveLayer(bpy.types.Operator):
                 # Swap all related layers
                 for i in range(num_members):
                     yp.layers.move(neighbor_idx+i, layer_idx+i)
+                    bump_layer_generation(yp)
 
                 yp.active_layer_index = layer_idx+num_members
 
@@ -2711,6 +2718,7 @@ class YMoveLayer(bpy.types.Operator):
 
                 # Swap layer
                 yp.layers.move(layer_idx, neighbor_idx)
+                bump_layer_generation(yp)
                 yp.active_layer_index = neighbor_idx
 
                 start_remap = neighbor_idx + 2
@@ -2724,6 +2732,7 @@ class YMoveLayer(bpy.types.Operator):
 
                 # Swap layer
                 yp.layers.move(layer_idx, last_neighbor_member_idx)
+                bump_layer_generation(yp)
                 yp.active_layer_index = last_neighbor_member_idx
 
                 start_remap = layer_idx + 1
@@ -2735,11 +2744,11 @@ class YMoveLayer(bpy.types.Operator):
 
             # Swap layer
             yp.layers.move(layer_idx, neighbor_idx)
+            bump_layer_generation(yp)
             yp.active_layer_index = neighbor_idx
 
         # Remap parents
-        for lay in yp.layers:
-            lay.parent_idx = get_layer_index_by_name(yp, parent_dict[lay.name])
+        remap_layer_parents(yp, parent_dict)
 
         # Height calculation can be changed after moving layer
         height_root_ch = get_root_height_channel(yp)
@@ -2870,6 +2879,7 @@ def remove_layer(yp, index):
 
     # Delete the layer
     yp.layers.remove(index)
+    bump_layer_generation(yp)
 
 def draw_remove_group(self, context):
     col = self.layout.column()
@@ -2971,8 +2981,7 @@ class YRemoveLayer(bpy.types.Operator):
             yp.active_layer_index = yp.active_layer_index
 
         # Remap parents
-        for lay in yp.layers:
-            lay.parent_idx = get_layer_index_by_name(yp, parent_dict[lay.name])
+        remap_layer_parents(yp, parent_dict)
 
         # Check uv maps
         check_uv_nodes(yp)
@@ -3131,8 +3140,7 @@ def replace_layer_type(layer, new_type, item_name='', remove_data=False):
     yp.halt_reconnect = False
 
     # Remap parents
-    for lay in yp.layers:
-        lay.parent_idx = get_layer_index_by_name(yp, parent_dict[lay.name])
+    remap_layer_parents(yp, parent_dict)
 
     # Check uv maps
     check_uv_nodes(yp)
@@ -3156,8 +3164,8 @@ def replace_mask_type(mask, new_type, item_name='', remove_data=False):
 
     yp = mask.id_data.yp
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', mask.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(mask)
+    layer = yp.layers[addr.layer_idx]
 
     # Remove segment if original mask using image atlas
     if mask.type == 'IMAGE' and mask.segment_name != '':
@@ -3684,6 +3692,7 @@ class YDuplicateLayer(bpy.types.Operator):
 
             # Create new layer
             new_layer = yp.layers.add()
+            bump_layer_generation(yp)
             new_layer.name = get_unique_name(lname, yp.layers)
 
             copy_id_props(l, new_layer, ['name'])
@@ -3703,12 +3712,10 @@ class YDuplicateLayer(bpy.types.Operator):
         for i, idx in enumerate(created_ids):
             relevant_id = relevant_ids[i]
             yp.layers.move(idx, relevant_id)
+            bump_layer_generation(yp)
 
         # Remap parent index
-        for lay in yp.layers:
-            if lay.name in parent_dict:
-                lay.parent_idx = get_layer_index_by_name(yp, parent_dict[lay.name])
-            #print(lay.name, yp.layers[lay.parent_idx].name)
+        remap_layer_parents(yp, parent_dict)
 
         # Revert back halt update
         yp.halt_update = False
@@ -3854,6 +3861,7 @@ class YPasteLayer(bpy.types.Operator):
 
             # Create new layer
             new_layer = yp.layers.add()
+            bump_layer_generation(yp)
             new_layer.name = get_unique_name(ls.name, yp.layers)
 
             copy_id_props(ls, new_layer, ['name'])
@@ -3872,6 +3880,7 @@ class YPasteLayer(bpy.types.Operator):
             nl = yp.layers.get(lname)
             idx = get_layer_index_by_name(yp, lname)
             yp.layers.move(idx, cur_idx+i)
+            bump_layer_generation(yp)
 
         for i, lname in enumerate(pasted_layer_names):
             nl = yp.layers.get(lname)
@@ -3893,9 +3902,7 @@ class YPasteLayer(bpy.types.Operator):
             reconnect_layer_nodes(nl)
 
         # Remap parents for non pasted layers
-        for lay in yp.layers:
-            if lay.name in pasted_layer_names: continue
-            lay.parent_idx = get_layer_index_by_name(yp, parent_dict[lay.name])
+        remap_layer_parents(yp, parent_dict, pasted_layer_names)
 
         # Check uv maps
         check_uv_nodes(yp)
@@ -3919,9 +3926,9 @@ def update_layer_channel_override_value(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    ch_index = int(m.group(2))
-    layer = yp.layers[int(m.group(1))]
+    addr = get_entity_address(self)
+    ch_index = addr.ch_idx
+    layer = yp.layers[addr.layer_idx]
     root_ch = yp.channels[ch_index]
     ch = self
 
@@ -3931,9 +3938,9 @@ def update_layer_channel_override_1_value(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    ch_index = int(m.group(2))
-    layer = yp.layers[int(m.group(1))]
+    addr = get_entity_address(self)
+    ch_index = addr.ch_idx
+    layer = yp.layers[addr.layer_idx]
     root_ch = yp.channels[ch_index]
     ch = self
 
@@ -3943,9 +3950,9 @@ def update_layer_channel_override_1(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    ch_index = int(m.group(2))
-    layer = yp.layers[int(m.group(1))]
+    addr = get_entity_address(self)
+    ch_index = addr.ch_idx
+    layer = yp.layers[addr.layer_idx]
     root_ch = yp.channels[ch_index]
     ch = self
 
@@ -3957,17 +3964,18 @@ def update_layer_channel_override_1(self, context):
         ch.active_edit_1 = False
         ch.halt_update = False
 
-    check_all_layer_channel_io_and_nodes(layer) #, has_parent=has_parent)
-    rearrange_layer_nodes(layer)
-    reconnect_layer_nodes(layer)
+    if not defer_layer_check(layer, check_all_layer_channel_io_and_nodes):
+        check_all_layer_channel_io_and_nodes(layer) #, has_parent=has_parent)
+    mark_layer_dirty(layer)
+    flush_dirty_nodes(layer.id_data)
 
 def update_layer_channel_override(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    ch_index = int(m.group(2))
-    layer = yp.layers[int(m.group(1))]
+    addr = get_entity_address(self)
+    ch_index = addr.ch_idx
+    layer = yp.layers[addr.layer_idx]
     root_ch = yp.channels[ch_index]
     ch = self
 
@@ -3979,9 +3987,10 @@ def update_layer_channel_override(self, context):
         ch.active_edit = False
         ch.halt_update = False
 
-    check_all_layer_channel_io_and_nodes(layer) #, has_parent=has_parent)
-    rearrange_layer_nodes(layer)
-    reconnect_layer_nodes(layer)
+    if not defer_layer_check(layer, check_all_layer_channel_io_and_nodes):
+        check_all_layer_channel_io_and_nodes(layer) #, has_parent=has_parent)
+    mark_layer_dirty(layer)
+    flush_dirty_nodes(layer.id_data)
 
     # Reselect layer so vcol or image will be updated
     yp.active_layer_index = yp.active_layer_index
@@ -3992,19 +4001,21 @@ def update_channel_enable(self, context):
     if yp.halt_update: return
     wm = context.window_manager
 
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    ch_index = int(m.group(2))
-    layer = yp.layers[int(m.group(1))]
+    addr = get_entity_address(self)
+    ch_index = addr.ch_idx
+    layer = yp.layers[addr.layer_idx]
     root_ch = yp.channels[ch_index]
     ch = self
 
     tree = get_tree(layer)
 
     # Check uv maps
-    check_uv_nodes(yp)
+    if not defer_yp_check(self.id_data, check_uv_nodes):
+        check_uv_nodes(yp)
 
     #if yp.disable_quick_toggle:
-    check_all_layer_channel_io_and_nodes(layer, tree, ch)
+    if not defer_layer_check(layer, check_all_layer_channel_io_and_nodes):
+        check_all_layer_channel_io_and_nodes(layer, tree, ch)
 
     if yp.halt_reconnect: return
 
@@ -4013,11 +4024,10 @@ def update_channel_enable(self, context):
         yp.layer_preview_mode = yp.layer_preview_mode
     else:
 
-        rearrange_layer_nodes(layer)
-        reconnect_layer_nodes(layer)
-
-        rearrange_yp_nodes(self.id_data)
-        reconnect_yp_nodes(self.id_data)
+        # Main tree layout doesn't depend on channel enable, only the chain of the channel need to be reconnected
+        mark_layer_dirty(layer)
+        mark_yp_dirty(self.id_data, ch_index, rearrange=False)
+        flush_dirty_nodes(self.id_data)
 
     # Disable active edit on overrides
     if not ch.enable:
@@ -4065,16 +4075,16 @@ def update_channel_enable(self, context):
 def update_normal_map_type(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
-    root_ch = yp.channels[int(m.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    root_ch = yp.channels[addr.ch_idx]
     tree = get_tree(layer)
 
     check_channel_normal_map_nodes(tree, layer, root_ch, self)
 
     #if not yp.halt_reconnect:
-    rearrange_layer_nodes(layer)
-    reconnect_layer_nodes(layer)
+    mark_layer_dirty(layer)
+    flush_dirty_nodes(layer.id_data)
 
 def update_blend_type(self, context):
     T = time.time()
@@ -4082,19 +4092,19 @@ def update_blend_type(self, context):
     wm = context.window_manager
     yp = self.id_data.yp
     if yp.halt_update: return
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
-    ch_index = int(m.group(2))
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    ch_index = addr.ch_idx
     root_ch = yp.channels[ch_index]
 
     if check_blend_type_nodes(root_ch, layer, self): # and not yp.halt_reconnect:
 
         # Reconnect all layer channels if normal channel is updated
         if root_ch.type == 'NORMAL':
-            reconnect_layer_nodes(layer) 
-        else: reconnect_layer_nodes(layer, ch_index)
+            mark_layer_dirty(layer)
+        else: mark_layer_dirty(layer, ch_index)
 
-        rearrange_layer_nodes(layer)
+        flush_dirty_nodes(layer.id_data)
 
     print('INFO: Layer', layer.name, ' blend type is changed at', '{:0.2f}'.format((time.time() - T) * 1000), 'ms!')
     wm.yptimer.time = str(time.time())
@@ -4102,8 +4112,8 @@ def update_blend_type(self, context):
 def update_flip_backface_normal(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
 
     normal_flip = tree.nodes.get(self.normal_flip)
@@ -4112,9 +4122,9 @@ def update_flip_backface_normal(self, context):
 def update_write_height(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
-    ch_index = int(m.group(2))
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    ch_index = addr.ch_idx
     root_ch = yp.channels[ch_index]
     ch = self
     tree = get_tree(layer)
@@ -4125,15 +4135,15 @@ def update_write_height(self, context):
     #root_ch.displacement_height_ratio = max_height
     update_displacement_height_ratio(root_ch)
 
-    rearrange_layer_nodes(layer)
-    reconnect_layer_nodes(layer, ch_index)
+    mark_layer_dirty(layer, ch_index)
+    flush_dirty_nodes(layer.id_data)
 
 def update_normal_strength(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
-    ch_index = int(m.group(2))
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    ch_index = addr.ch_idx
     root_ch = yp.channels[ch_index]
     ch = self
     tree = get_tree(layer)
@@ -4146,9 +4156,9 @@ def update_bump_distance(self, context):
     group_tree = self.id_data
     yp = group_tree.yp
     if yp.halt_update: return
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
-    root_ch = yp.channels[int(m.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    root_ch = yp.channels[addr.ch_idx]
     tree = get_tree(layer)
 
     if self.normal_map_type == 'NORMAL_MAP' and self.enable_transition_bump: return
@@ -4231,7 +4241,8 @@ def update_uv_name(self, context):
 
     # Update global uv
     #yp_dirty = check_uv_nodes(yp)
-    check_uv_nodes(yp)
+    if not defer_yp_check(group_tree, check_uv_nodes):
+        check_uv_nodes(yp)
     #layer_dirty = False
 
     # Update uv neighbor
@@ -4261,13 +4272,12 @@ def update_uv_name(self, context):
         #yp_dirty = True
 
     #if yp_dirty or layer_dirty: #and not yp.halt_reconnect:
-    rearrange_layer_nodes(layer)
-    reconnect_layer_nodes(layer)
+    mark_layer_dirty(layer)
 
     # Update layer tree inputs
     #if yp_dirty:
-    rearrange_yp_nodes(group_tree)
-    reconnect_yp_nodes(group_tree)
+    mark_yp_dirty(group_tree)
+    flush_dirty_nodes(group_tree)
 
 def update_texcoord_type(self, context):
     yp = self.id_data.yp
@@ -4277,7 +4287,8 @@ def update_texcoord_type(self, context):
     if yp.halt_update: return
 
     # Update global uv
-    check_uv_nodes(yp)
+    if not defer_yp_check(self.id_data, check_uv_nodes):
+        check_uv_nodes(yp)
 
     # Update uv neighbor
     smooth_bump_ch = get_smooth_bump_channel(layer)
@@ -4297,13 +4308,12 @@ def update_texcoord_type(self, context):
     check_layer_tree_ios(layer, tree)
 
     #if not yp.halt_reconnect:
-    rearrange_layer_nodes(layer)
-    reconnect_layer_nodes(layer)
+    mark_layer_dirty(layer)
 
     # Update layer tree inputs
     #if yp_dirty:
-    rearrange_yp_nodes(self.id_data)
-    reconnect_yp_nodes(self.id_data)
+    mark_yp_dirty(self.id_data)
+    flush_dirty_nodes(self.id_data)
 
 def update_hemi_space(self, context):
     if self.type != 'HEMI': return
@@ -4343,19 +4353,18 @@ def update_hemi_use_prev_normal(self, context):
     check_layer_tree_ios(layer, tree)
     check_layer_bump_process(layer, tree)
 
-    rearrange_layer_nodes(layer)
-    reconnect_layer_nodes(layer)
-
-    reconnect_yp_nodes(layer.id_data)
+    mark_layer_dirty(layer)
+    mark_yp_dirty(layer.id_data, rearrange=False)
+    flush_dirty_nodes(layer.id_data)
 
 def update_channel_intensity_value(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
-    ch_index = int(m.group(2))
+    ch_index = addr.ch_idx
     ch = self
     root_ch = yp.channels[ch_index]
 
@@ -4430,9 +4439,16 @@ def group_trash_update(yp):
 
                 tree.nodes.remove(node)
 
+def update_layer_parent_idx(self, context):
+    bump_layer_generation(self.id_data.yp)
+
 def update_layer_enable(self, context):
     T = time.time()
     yp = self.id_data.yp
+
+    # Hidden parent flags are stored on layer hierarchy
+    bump_layer_generation(yp)
+
     if yp.halt_update: return
     layer = self
     tree = get_tree(layer)
@@ -4449,9 +4465,9 @@ def update_layer_enable(self, context):
         # Refresh preview mode, rearrange and reconnect already done in this event
         yp.layer_preview_mode = yp.layer_preview_mode
     else:
-        #if yp.disable_quick_toggle:
-        rearrange_yp_nodes(layer.id_data)
-        reconnect_yp_nodes(layer.id_data)
+        # Layer nodes are still on the same location, so only reconnect is needed
+        mark_yp_dirty(layer.id_data, rearrange=False)
+        flush_dirty_nodes(layer.id_data)
 
     context.window_manager.yptimer.time = str(time.time())
 
@@ -4459,6 +4475,7 @@ def update_layer_enable(self, context):
 
 def update_layer_name(self, context):
     yp = self.id_data.yp
+    bump_layer_generation(yp)
     if yp.halt_update: return
     if self.type == 'IMAGE' and self.segment_name != '': return
 
@@ -4472,9 +4489,9 @@ def update_layer_channel_override_vcol_name(self, context):
     obj = context.object
     mat = obj.active_material
 
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
-    root_ch = yp.channels[int(m.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    root_ch = yp.channels[addr.ch_idx]
     tree = get_tree(layer)
 
     source = tree.nodes.get(self.source)
@@ -4484,9 +4501,9 @@ def update_layer_channel_use_clamp(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
-    root_ch = yp.channels[int(m.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    root_ch = yp.channels[addr.ch_idx]
     tree = get_tree(layer)
 
     if root_ch.type == 'NORMAL': return
@@ -4509,15 +4526,15 @@ def update_divide_rgb_by_alpha(self, context):
 
     check_layer_divider_alpha(self)
 
-    rearrange_layer_nodes(self)
-    reconnect_layer_nodes(self)
+    mark_layer_dirty(self)
+    flush_dirty_nodes(self.id_data)
 
 def update_image_flip_y(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    m1 = re.match(r'yp\.layers\[(\d+)\]$', self.path_from_id())
-    m2 = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', self.path_from_id())
+    m1 = re.match(r'yp\.layers\[(\d+)\]$', get_entity_path(self))
+    m2 = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', get_entity_path(self))
 
     if m1:
         #layer = yp.layers[int(m1.group(1))]
@@ -4537,17 +4554,17 @@ def update_image_flip_y(self, context):
     else:
         remove_node(tree, self, 'flip_y')
 
-    rearrange_layer_nodes(layer)
-    reconnect_layer_nodes(layer)
+    mark_layer_dirty(layer)
+    flush_dirty_nodes(layer.id_data)
 
 def update_channel_active_edit(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer_idx = int(m.group(1))
-    layer = yp.layers[int(m.group(1))]
-    root_ch = yp.channels[int(m.group(2))]
+    addr = get_entity_address(self)
+    layer_idx = addr.layer_idx
+    layer = yp.layers[addr.layer_idx]
+    root_ch = yp.channels[addr.ch_idx]
     ch = self
     tree = get_tree(layer)
 
@@ -5079,7 +5096,7 @@ class YLayer(bpy.types.PropertyGroup):
     uv_name : StringProperty(default='', update=update_uv_name)
 
     # Parent index
-    parent_idx : IntProperty(default=-1)
+    parent_idx : IntProperty(default=-1, update=update_layer_parent_idx)
 
     # Transform
     translation : FloatVectorProperty(
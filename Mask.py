@@ -6,6 +6,7 @@ from . import lib, Modifier, transition, ImageAtlas, MaskModifier
 from .common import *
 from .node_connections import *
 from .node_arrangements import *
+from .node_updates import *
 from .subtree import *
 
 #def check_object_index_props(entity, source=None):
@@ -843,8 +844,8 @@ class YMoveLayerMask(bpy.types.Operator):
         num_masks = len(layer.masks)
         if num_masks < 2: return {'CANCELLED'}
 
-        m = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', mask.path_from_id())
-        index = int(m.group(2))
+        addr = get_entity_address(mask)
+        index = addr.mask_idx
 
         # Get new index
         if self.direction == 'UP' and index > 0:
@@ -940,10 +941,10 @@ def update_mask_active_edit(self, context):
 
     yp = self.id_data.yp
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', self.path_from_id())
-    layer_idx = int(match.group(1))
-    layer = yp.layers[int(match.group(1))]
-    mask_idx = int(match.group(2))
+    addr = get_entity_address(self)
+    layer_idx = addr.layer_idx
+    layer = yp.layers[addr.layer_idx]
+    mask_idx = addr.mask_idx
 
     # Disable other active edits
     if self.active_edit: 
@@ -967,9 +968,9 @@ def update_mask_channel_intensity_value(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    mask = layer.masks[int(match.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    mask = layer.masks[addr.mask_idx]
     tree = get_tree(layer)
 
     mute = not self.enable or not mask.enable or not layer.enable_masks
@@ -988,9 +989,9 @@ def update_mask_intensity_value(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    mask = layer.masks[int(match.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    mask = layer.masks[addr.mask_idx]
     tree = get_tree(layer)
 
     mute = not mask.enable or not layer.enable_masks
@@ -1005,9 +1006,9 @@ def update_layer_mask_channel_enable(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    mask = layer.masks[int(match.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    mask = layer.masks[addr.mask_idx]
     tree = get_tree(layer)
 
     check_mask_mix_nodes(layer, tree, mask, self)
@@ -1041,8 +1042,8 @@ def update_layer_mask_enable(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
 
     check_mask_mix_nodes(layer, tree, self)
@@ -1070,25 +1071,26 @@ def update_mask_texcoord_type(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    mask_idx = int(match.group(2))
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    mask_idx = addr.mask_idx
     tree = get_tree(layer)
 
     # Update global uv
-    check_uv_nodes(yp)
+    if not defer_yp_check(self.id_data, check_uv_nodes):
+        check_uv_nodes(yp)
 
     # Update layer tree inputs
     yp_dirty = True if check_layer_tree_ios(layer, tree) else False
 
     set_mask_uv_neighbor(tree, layer, self, mask_idx)
 
-    rearrange_layer_nodes(layer)
-    reconnect_layer_nodes(layer)
+    mark_layer_dirty(layer)
 
     if yp_dirty:
-        rearrange_yp_nodes(self.id_data)
-        reconnect_yp_nodes(self.id_data)
+        mark_yp_dirty(self.id_data)
+
+    flush_dirty_nodes(self.id_data)
 
 def update_mask_uv_name(self, context):
     obj = context.object
@@ -1096,9 +1098,9 @@ def update_mask_uv_name(self, context):
     ypui = context.window_manager.ypui
     if yp.halt_update: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    mask_idx = int(match.group(2))
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    mask_idx = addr.mask_idx
     active_layer = yp.layers[yp.active_layer_index]
     tree = get_tree(layer)
     mask = self
@@ -1127,7 +1129,8 @@ def update_mask_uv_name(self, context):
             uv_layers.active = uv_layers.get(mask.uv_name)
 
     # Update global uv
-    dirty = check_uv_nodes(yp)
+    if not defer_yp_check(self.id_data, check_uv_nodes):
+        check_uv_nodes(yp)
 
     # Update layer tree inputs
     yp_dirty = True if check_layer_tree_ios(layer, tree) else False
@@ -1138,12 +1141,12 @@ def update_mask_uv_name(self, context):
 
     set_mask_uv_neighbor(tree, layer, self, mask_idx)
 
-    rearrange_layer_nodes(layer)
-    reconnect_layer_nodes(layer)
+    mark_layer_dirty(layer)
 
     if yp_dirty:
-        rearrange_yp_nodes(self.id_data)
-        reconnect_yp_nodes(self.id_data)
+        mark_yp_dirty(self.id_data)
+
+    flush_dirty_nodes(self.id_data)
 
 def update_mask_hemi_space(self, context):
     if self.type != 'HEMI': return
@@ -1156,8 +1159,8 @@ def update_mask_hemi_use_prev_normal(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
 
     check_layer_tree_ios(layer, tree)
@@ -1171,8 +1174,8 @@ def update_mask_hemi_use_prev_normal(self, context):
 def update_mask_hemi_camera_ray_mask(self, context):
     yp = self.id_data.yp
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
 
     tree = get_mask_tree(self)
     source = get_mask_source(self)
@@ -1196,8 +1199,8 @@ def update_mask_name(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     src = get_mask_source(self)
 
     if self.type == 'IMAGE' and self.segment_name != '': return
@@ -1207,8 +1210,8 @@ def update_mask_blend_type(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
     mask = self
 
@@ -18,9 +18,9 @@ can_be_expanded = {
 def update_mask_modifier_enable(self, context):
 
     yp = self.id_data.yp
-    match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]\.modifiers\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    mask = layer.masks[int(match.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    mask = layer.masks[addr.mask_idx]
     mod = self
 
     tree = get_mask_tree(mask)
@@ -136,8 +136,8 @@ class YNewMaskModifier(bpy.types.Operator):
 
     def execute(self, context):
 
-        match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', context.mask.path_from_id())
-        mask_idx = int(match.group(2))
+        addr = get_entity_address(context.mask)
+        mask_idx = addr.mask_idx
 
         add_new_mask_modifier(context.mask, self.type)
 
@@ -46,9 +46,9 @@ can_be_expanded = {
 def get_modifier_channel_type(mod, return_non_color=False):
 
     yp = mod.id_data.yp
-    match1 = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers\[(\d+)\]', mod.path_from_id())
-    match2 = re.match(r'yp\.channels\[(\d+)\]\.modifiers\[(\d+)\]', mod.path_from_id())
-    match3 = re.match(r'yp\.layers\[(\d+)\]\.modifiers\[(\d+)\]', mod.path_from_id())
+    match1 = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers\[(\d+)\]', get_entity_path(mod))
+    match2 = re.match(r'yp\.channels\[(\d+)\]\.modifiers\[(\d+)\]', get_entity_path(mod))
+    match3 = re.match(r'yp\.layers\[(\d+)\]\.modifiers\[(\d+)\]', get_entity_path(mod))
     if match1: 
         root_ch = yp.channels[int(match1.group(2))]
 
@@ -415,9 +415,9 @@ def add_new_modifier(parent, modifier_type):
 
     yp = parent.id_data.yp
 
-    match1 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', parent.path_from_id())
-    match2 = re.match(r'^yp\.layers\[(\d+)\]$', parent.path_from_id())
-    match3 = re.match(r'^yp\.channels\[(\d+)\]$', parent.path_from_id())
+    match1 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', get_entity_path(parent))
+    match2 = re.match(r'^yp\.layers\[(\d+)\]$', get_entity_path(parent))
+    match3 = re.match(r'^yp\.channels\[(\d+)\]$', get_entity_path(parent))
 
     if match1: 
         root_ch = yp.channels[int(match1.group(2))]
@@ -516,9 +516,9 @@ class YNewYPaintModifier(bpy.types.Operator):
         group_tree = node.node_tree
         yp = group_tree.yp
 
-        m1 = re.match(r'^yp\.layers\[(\d+)\]$', context.parent.path_from_id())
-        m2 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', context.parent.path_from_id())
-        m3 = re.match(r'^yp\.channels\[(\d+)\]$', context.parent.path_from_id())
+        m1 = re.match(r'^yp\.layers\[(\d+)\]$', get_entity_path(context.parent))
+        m2 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', get_entity_path(context.parent))
+        m3 = re.match(r'^yp\.channels\[(\d+)\]$', get_entity_path(context.parent))
 
         if m1: layer = yp.layers[int(m1.group(1))]
         elif m2: layer = yp.layers[int(m2.group(1))]
@@ -802,9 +802,9 @@ def update_modifier_enable(self, context):
 
     check_modifier_nodes(self, tree)
 
-    match1 = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers\[(\d+)\]', self.path_from_id())
-    match2 = re.match(r'yp\.layers\[(\d+)\]\.modifiers\[(\d+)\]', self.path_from_id())
-    match3 = re.match(r'yp\.channels\[(\d+)\]\.modifiers\[(\d+)\]', self.path_from_id())
+    match1 = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers\[(\d+)\]', get_entity_path(self))
+    match2 = re.match(r'yp\.layers\[(\d+)\]\.modifiers\[(\d+)\]', get_entity_path(self))
+    match3 = re.match(r'yp\.channels\[(\d+)\]\.modifiers\[(\d+)\]', get_entity_path(self))
 
     if match1 or match2:
         if match1: layer = yp.layers[int(match1.group(1))]
@@ -918,9 +918,9 @@ def update_modifier_shortcut(self, context):
 
     if mod.shortcut:
 
-        match1 = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers\[(\d+)\]', mod.path_from_id())
-        match2 = re.match(r'yp\.layers\[(\d+)\]\.modifiers\[(\d+)\]', mod.path_from_id())
-        match3 = re.match(r'yp\.channels\[(\d+)\]\.modifiers\[(\d+)\]', mod.path_from_id())
+        match1 = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers\[(\d+)\]', get_entity_path(mod))
+        match2 = re.match(r'yp\.layers\[(\d+)\]\.modifiers\[(\d+)\]', get_entity_path(mod))
+        match3 = re.match(r'yp\.channels\[(\d+)\]\.modifiers\[(\d+)\]', get_entity_path(mod))
 
         if match1 or match2:
 
@@ -1189,8 +1189,8 @@ def enable_modifiers_tree(parent, rearrange = False):
     group_tree = parent.id_data
     yp = group_tree.yp
 
-    match1 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', parent.path_from_id())
-    match2 = re.match(r'^yp\.layers\[(\d+)\]$', parent.path_from_id())
+    match1 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', get_entity_path(parent))
+    match2 = re.match(r'^yp\.layers\[(\d+)\]$', get_entity_path(parent))
     if match1:
         layer = yp.layers[int(match1.group(1))]
         root_ch = yp.channels[int(match1.group(2))]
@@ -1262,8 +1262,8 @@ def disable_modifiers_tree(parent, rearrange=False):
     group_tree = parent.id_data
     yp = group_tree.yp
 
-    match1 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', parent.path_from_id())
-    match2 = re.match(r'^yp\.layers\[(\d+)\]$', parent.path_from_id())
+    match1 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', get_entity_path(parent))
+    match2 = re.match(r'^yp\.layers\[(\d+)\]$', get_entity_path(parent))
     if match1: 
         layer = yp.layers[int(match1.group(1))]
         root_ch = yp.channels[int(match1.group(2))]
@@ -82,12 +82,12 @@ class YNewNormalmapModifier(bpy.types.Operator):
     def execute(self, context):
 
         yp = context.parent.id_data.yp
-        match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', context.parent.path_from_id())
-        if not match: 
+        addr = get_entity_address(context.parent)
+        if not addr or not addr.kind.startswith('LAYER_CHANNEL'): 
             self.report({'ERROR'}, "Wrong context!")
             return {'CANCELLED'}
-        layer = yp.layers[int(match.group(1))]
-        ch_idx = int(match.group(2))
+        layer = yp.layers[addr.layer_idx]
+        ch_idx = addr.ch_idx
         ch = layer.channels[ch_idx]
         root_ch = yp.channels[ch_idx]
 
@@ -127,11 +127,11 @@ class YMoveNormalMapModifier(bpy.types.Operator):
 
         parent = context.parent
 
-        match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', parent.path_from_id())
-        if not match: 
+        addr = get_entity_address(parent)
+        if not addr or not addr.kind.startswith('LAYER_CHANNEL'): 
             self.report({'ERROR'}, "Wrong context!")
             return {'CANCELLED'}
-        layer = yp.layers[int(match.group(1))]
+        layer = yp.layers[addr.layer_idx]
 
         num_mods = len(parent.modifiers_1)
         if num_mods < 2: return {'CANCELLED'}
@@ -181,11 +181,11 @@ class YRemoveNormalMapModifier(bpy.types.Operator):
         parent = context.parent
         mod = context.modifier
 
-        match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', parent.path_from_id())
-        if not match: 
+        addr = get_entity_address(parent)
+        if not addr or not addr.kind.startswith('LAYER_CHANNEL'): 
             self.report({'ERROR'}, "Wrong context!")
             return {'CANCELLED'}
-        layer = yp.layers[int(match.group(1))]
+        layer = yp.layers[addr.layer_idx]
         tree = get_tree(layer)
 
         index = -1
@@ -215,8 +215,8 @@ def update_invert_channel(self, context):
     yp = self.id_data.yp
     if yp.halt_update or not self.enable: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers_1\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
 
     invert = tree.nodes.get(self.invert)
@@ -230,8 +230,8 @@ def update_math_val_input(self, context):
     yp = self.id_data.yp
     if yp.halt_update or not self.enable: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers_1\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
 
     if self.type == 'MATH':
@@ -245,8 +245,8 @@ def update_math_method(self, context):
     yp = self.id_data.yp
     if yp.halt_update or not self.enable: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers_1\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
 
     if self.type == 'MATH':
@@ -260,8 +260,8 @@ def update_use_clamp(self, context):
     yp = self.id_data.yp
     if yp.halt_update or not self.enable: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers_1\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
 
     math = tree.nodes.get(self.math)
@@ -274,8 +274,8 @@ def update_affect_alpha(self, context):
     yp = self.id_data.yp
     if yp.halt_update or not self.enable: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers_1\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
 
     if self.type == 'MATH':
@@ -291,8 +291,8 @@ def update_normalmap_modifier_enable(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
 
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]\.modifiers_1\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
 
     check_normalmap_modifier_nodes(self, tree)
@@ -5,7 +5,7 @@ from .common import *
 from .subtree import *
 from .node_arrangements import *
 from .node_connections import *
-from . import lib, Modifier, Layer, Mask, transition, Bake, ImageAtlas
+from . import lib, Modifier, Layer, Mask, transition, Bake, ImageAtlas, node_updates
 
 YP_GROUP_SUFFIX = ' ' + get_addon_title()
 YP_GROUP_PREFIX = get_addon_title() + ' '
@@ -2112,6 +2112,81 @@ class YCleanYPCaches(bpy.types.Operator):
 
         return {'FINISHED'}
 
+def get_all_yp_entities(yp):
+    ''' List of every channel, layer, mask and modifier of yp '''
+    entities = []
+    for ch in yp.channels:
+        entities.append(ch)
+        entities.extend(ch.modifiers)
+
+    for layer in yp.layers:
+        entities.append(layer)
+        entities.extend(layer.modifiers)
+        for ch in layer.channels:
+            entities.append(ch)
+            entities.extend(ch.modifiers)
+            entities.extend(ch.modifiers_1)
+        for mask in layer.masks:
+            entities.append(mask)
+            entities.extend(mask.channels)
+            entities.extend(mask.modifiers)
+
+    return entities
+
+class YEntityAddressBenchmark(bpy.types.Operator):
+    bl_idname = "node.y_entity_address_benchmark"
+    bl_label = "Entity Address Benchmark"
+    bl_description = "Compare time of path_from_id() + regex with cached entity address on every channel, layer, mask and modifier"
+    bl_options = {'REGISTER'}
+
+    num_iterations : IntProperty(name='Number of Iterations', default=100, min=1)
+
+    @classmethod
+    def poll(cls, context):
+        return get_active_ypaint_node()
+
+    def execute(self, context):
+        node = get_active_ypaint_node()
+        yp = node.node_tree.yp
+
+        entities = get_all_yp_entities(yp)
+        if not entities:
+            self.report({'ERROR'}, 'No layer or channel to benchmark!')
+            return {'CANCELLED'}
+
+        num_calls = len(entities) * self.num_iterations
+
+        # What update callbacks did before
+        pattern = re.compile(r'^yp\.(layers|channels)\[(\d+)\](?:\.(channels|masks|modifiers)\[(\d+)\])?(?:\.(channels|modifiers|modifiers_1)\[(\d+)\])?')
+        T = time.time()
+        for i in range(self.num_iterations):
+            for entity in entities:
+                pattern.match(entity.path_from_id())
+        regex_time = time.time() - T
+
+        # First lookup after generation change rebuilds the address table
+        bump_layer_generation(yp)
+        T = time.time()
+        get_entity_address(entities[0])
+        build_time = time.time() - T
+
+        T = time.time()
+        for i in range(self.num_iterations):
+            for entity in entities:
+                get_entity_address(entity)
+        address_time = time.time() - T
+
+        regex_us = regex_time * 1000000 / num_calls
+        address_us = address_time * 1000000 / num_calls
+
+        result = (str(len(entities)) + ' entities, path_from_id + regex: ' + '{:0.2f}'.format(regex_us) + ' us, ' +
+                'entity address: ' + '{:0.2f}'.format(address_us) + ' us per call, ' + 
+                'address table built at ' + '{:0.2f}'.format(build_time * 1000) + ' ms')
+        print('INFO: Entity address benchmark,', result)
+        self.report({'INFO'}, result)
+
+        return {'FINISHED'}
+
 def update_channel_name(self, context):
     T = time.time()
 
@@ -3125,6 +3200,9 @@ class YPaintChannel(bpy.types.PropertyGroup):
     baked_disp : StringProperty(default='')
     baked_normal_overlay : StringProperty(default='')
 
+    # Fingerprint of layer stack content when the channel is baked
+    baked_fingerprint : StringProperty(default='')
+
     # Outside baked nodes
     baked_outside : StringProperty(default='')
     baked_outside_disp : StringProperty(default='')
@@ -3304,6 +3382,10 @@ class YPaint(bpy.types.PropertyGroup):
     # Trash node for collecting disabled nodes
     trash : StringProperty(default='')
 
+    def transaction(self):
+        ''' Context manager for scripted bulk edits, node updates are merged and run once on exit '''
+        return node_updates.UpdateTransaction(self.id_data)
+
 class YPaintMaterialProps(bpy.types.PropertyGroup):
     ori_bsdf : StringProperty(default='')
     #ori_blend_method : StringProperty(default='')
@@ -3365,7 +3447,9 @@ def ypaint_hacks_and_scene_updates(scene):
                 yp.active_layer_index = yp.active_layer_index
 
 @persistent
-def ypaint_last_object_update(scene):
+def ypaint_last_object_update(scene, depsgraph=None):
+    invalidate_ui_caches(depsgraph)
+
     try: obj = bpy.context.object
     except: return
     if not obj: return
@@ -3435,6 +3519,7 @@ def register():
     bpy.utils.register_class(YRefreshTangentSignVcol)
     bpy.utils.register_class(YRemoveYPaintNode)
     bpy.utils.register_class(YCleanYPCaches)
+    bpy.utils.register_class(YEntityAddressBenchmark)
     bpy.utils.register_class(YNodeConnections)
     bpy.utils.register_class(YPaintChannel)
     bpy.utils.register_class(YPaintUV)
@@ -3464,6 +3549,10 @@ def register():
 
     bpy.app.handlers.frame_change_pre.append(ypaint_force_update_on_anim)
 
+    bpy.app.handlers.load_post.append(clear_layer_hierarchies)
+    bpy.app.handlers.undo_post.append(clear_layer_hierarchies)
+    bpy.app.handlers.redo_post.append(clear_layer_hierarchies)
+
 def unregister():
     bpy.utils.unregister_class(YSelectMaterialPolygons)
     bpy.utils.unregister_class(YQuickYPaintNodeSetup)
@@ -3482,6 +3571,7 @@ def unregister():
     bpy.utils.unregister_class(YRefreshTangentSignVcol)
     bpy.utils.unregister_class(YRemoveYPaintNode)
     bpy.utils.unregister_class(YCleanYPCaches)
+    bpy.utils.unregister_class(YEntityAddressBenchmark)
     bpy.utils.unregister_class(YNodeConnections)
     bpy.utils.unregister_class(YPaintChannel)
     bpy.utils.unregister_class(YPaintUV)
@@ -3502,3 +3592,7 @@ def unregister():
 
     bpy.app.handlers.frame_change_pre.remove(ypaint_force_update_on_anim)
 
+    bpy.app.handlers.load_post.remove(clear_layer_hierarchies)
+    bpy.app.handlers.undo_post.remove(clear_layer_hierarchies)
+    bpy.app.handlers.redo_post.remove(clear_layer_hierarchies)
+
@@ -12,17 +12,26 @@ bl_info = {
 if "bpy" in locals():
     import imp
     imp.reload(image_ops)
+    imp.reload(image_buffer)
+    imp.reload(image_filters)
+    imp.reload(image_resample)
     imp.reload(common)
     imp.reload(bake_common)
+    imp.reload(bake_fingerprint)
+    imp.reload(mesh_cache)
+    imp.reload(uv_raster)
     imp.reload(lib)
     imp.reload(ui)
     imp.reload(subtree)
     imp.reload(node_arrangements)
     imp.reload(node_connections)
+    imp.reload(node_updates)
     imp.reload(preferences)
     imp.reload(vcol_editor)
     imp.reload(transition)
     imp.reload(BakeInfo)
+    imp.reload(bake_cache)
+    imp.reload(parallel_bake)
     imp.reload(ImageAtlas)
     imp.reload(MaskModifier)
     imp.reload(Mask)
@@ -32,9 +41,10 @@ if "bpy" in locals():
     imp.reload(Bake)
     imp.reload(BakeToLayer)
     imp.reload(Root)
+    imp.reload(batch_bake)
 else:
-    from . import image_ops, common, bake_common, lib, ui, subtree, node_arrangements, node_connections, preferences
-    from . import vcol_editor, transition, BakeInfo, ImageAtlas, MaskModifier, Mask, Modifier, NormalMapModifier, Layer, Bake, BakeToLayer, Root
+    from . import image_ops, image_buffer, image_filters, image_resample, common, bake_common, bake_fingerprint, mesh_cache, uv_raster, lib, ui, subtree, node_arrangements, node_connections, node_updates, preferences
+    from . import vcol_editor, transition, BakeInfo, bake_cache, parallel_bake, ImageAtlas, MaskModifier, Mask, Modifier, NormalMapModifier, Layer, Bake, BakeToLayer, Root, batch_bake
 
 import bpy 
 
@@ -42,10 +52,13 @@ def register():
     image_ops.register()
     preferences.register()
     lib.register()
+    mesh_cache.register()
+    node_arrangements.register()
     ui.register()
     vcol_editor.register()
     transition.register()
     BakeInfo.register()
+    bake_cache.register()
     ImageAtlas.register()
     MaskModifier.register()
     Mask.register()
@@ -62,10 +75,13 @@ def unregister():
     image_ops.unregister()
     preferences.unregister()
     lib.unregister()
+    mesh_cache.unregister()
+    node_arrangements.unregister()
     ui.unregister()
     vcol_editor.unregister()
     transition.unregister()
     BakeInfo.unregister()
+    bake_cache.unregister()
     ImageAtlas.unregister()
     MaskModifier.unregister()
     Mask.unregister()
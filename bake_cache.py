@@ -0,0 +1,198 @@
+import bpy, os, tempfile, hashlib
+from .common import *
+from . import image_buffer, bake_fingerprint, BakeInfo
+
+CACHE_FOLDER_NAME = 'ucupaint_bake_cache'
+CACHE_EXTENSIONS = {'.exr', '.png'}
+
+# Bake info properties that doesn't change bake result
+IGNORED_BAKE_INFO_PROPS = {'rna_type', 'name', 'is_baked', 'other_objects', 'selected_objects', 'use_image_atlas'}
+
+# Object types that can't occlude ambient occlusion by themselves
+NON_OCCLUDER_OBJECT_TYPES = {'EMPTY', 'CAMERA', 'LIGHT', 'LAMP', 'SPEAKER', 'LIGHT_PROBE', 'ARMATURE', 'LATTICE'}
+
+def is_bake_cache_enabled():
+    try: return get_user_preferences().use_bake_cache
+    except: return False
+
+def get_cache_dir():
+    ypup = get_user_preferences()
+    path = bpy.path.abspath(ypup.bake_cache_dir) if ypup.bake_cache_dir != '' else ''
+    if path == '':
+        path = os.path.join(tempfile.gettempdir(), CACHE_FOLDER_NAME)
+    if not os.path.isdir(path):
+        os.makedirs(path, exist_ok=True)
+    return path
+
+def get_entry_name(key, output='MAIN'):
+    return hashlib.sha1(repr((key, output)).encode()).hexdigest()
+
+def get_entry_path(key, output='MAIN', is_float=False):
+    ext = '.exr' if is_float else '.png'
+    return os.path.join(get_cache_dir(), get_entry_name(key, output) + ext)
+
+def find_entry_path(key, output='MAIN'):
+    for is_float in (False, True):
+        path = get_entry_path(key, output, is_float)
+        if os.path.isfile(path): return path
+    return ''
+
+def has_cached_image(key, output='MAIN'):
+    if not key or not is_bake_cache_enabled(): return False
+    return find_entry_path(key, output) != ''
+
+def load_cached_image(image, key, output='MAIN'):
+    ''' Load pixels from cache entry to the image, returns True if cache hit '''
+    if not key or not is_bake_cache_enabled(): return False
+
+    path = find_entry_path(key, output)
+    if path == '': return False
+
+    try: cached = bpy.data.images.load(path, check_existing=False)
+    except Exception as e:
+        print('BAKE CACHE: Cannot load', path, '(' + str(e) + ')')
+        return False
+
+    success = False
+    if tuple(cached.size) == tuple(image.size) and cached.is_float == image.is_float:
+        # Use the same colorspace so the pixels are read as it's saved
+        cached.colorspace_settings.name = image.colorspace_settings.name
+        image_buffer.blit_image(cached, image)
+        success = True
+
+    bpy.data.images.remove(cached)
+
+    if success:
+        # Mark entry as recently used
+        os.utime(path, None)
+        print('BAKE CACHE: Loaded', output.lower(), 'bake result from', path)
+
+    return success
+
+def store_cached_image(image, key, output='MAIN'):
+    ''' Save pixels of the image as cache entry, then evict old entries if the cache is full '''
+    if not key or not is_bake_cache_enabled(): return
+
+    path = get_entry_path(key, output, image.is_float)
+    width, height = image.size
+
+    # Save using temporary image so original image filepath and format stay the same
+    temp = bpy.data.images.new(name='__TEMP_CACHE__', width=width, height=height,
+            alpha=True, float_buffer=image.is_float)
+    temp.colorspace_settings.name = image.colorspace_settings.name
+    image_buffer.blit_image(image, temp)
+
+    temp.filepath_raw = path
+    temp.file_format = 'OPEN_EXR' if image.is_float else 'PNG'
+
+    try: temp.save()
+    except Exception as e: print('BAKE CACHE: Cannot save', path, '(' + str(e) + ')')
+
+    bpy.data.images.remove(temp)
+
+    evict_cache()
+
+def get_cache_entries():
+    ''' Returns list of (path, size, last used time) sorted from least recently used '''
+    cache_dir = get_cache_dir()
+    entries = []
+    for f in os.listdir(cache_dir):
+        if os.path.splitext(f)[1] not in CACHE_EXTENSIONS: continue
+        path = os.path.join(cache_dir, f)
+        try: stat = os.stat(path)
+        except: continue
+        entries.append((path, stat.st_size, stat.st_mtime))
+
+    entries.sort(key=lambda e: e[2])
+    return entries
+
+def evict_cache(max_size=None):
+    ''' Remove least recently used entries until the cache fits the size limit (in bytes) '''
+    if max_size == None:
+        max_size = get_user_preferences().bake_cache_size * 1024 * 1024
+
+    entries = get_cache_entries()
+    total = sum([e[1] for e in entries])
+
+    for path, size, mtime in entries:
+        if total <= max_size: break
+        try:
+            os.remove(path)
+            total -= size
+        except: pass
+
+def clear_cache():
+    evict_cache(0)
+
+def get_ao_occluders(objs):
+    ''' Returns renderable mesh objects other than the bake targets,
+        or None if there's other geometry that can't be fingerprinted (curves, instances, etc)
+    '''
+    occluders = []
+    for obj in get_scene_objects():
+        if obj in objs or obj.hide_render: continue
+        if obj.type in NON_OCCLUDER_OBJECT_TYPES:
+            # Empty can instance a collection
+            instance_type = obj.instance_type if hasattr(obj, 'instance_type') else obj.dupli_type
+            if obj.type == 'EMPTY' and instance_type != 'NONE': return None
+            continue
+        if obj.type != 'MESH': return None
+        occluders.append(obj)
+
+    return occluders
+
+def get_bake_to_layer_key(op, objs, other_objs=[], extra=''):
+    ''' Key of bake to layer result based on bake info settings and source meshes
+        Returns empty string if the result can't be cached
+    '''
+    # AO without only local option is occluded by every visible object in the scene
+    occluders = []
+    if op.type == 'AO' and not op.only_local:
+        occluders = get_ao_occluders(objs)
+        if occluders == None: return ''
+
+    if not all([bake_fingerprint.is_mesh_hashable(o) for o in objs + other_objs + occluders]): return ''
+
+    h = hashlib.sha1()
+    hash_value = bake_fingerprint.hash_value
+
+    hash_value(h, 'type', op.type)
+    hash_value(h, 'size', (op.width, op.height, op.uv_map))
+
+    for prop in BakeInfo.YBakeInfoProps.bl_rna.properties:
+        pid = prop.identifier
+        if pid in IGNORED_BAKE_INFO_PROPS or not hasattr(op, pid): continue
+        hash_value(h, pid, getattr(op, pid))
+
+    for obj in objs:
+        bake_fingerprint.hash_mesh(h, obj)
+
+    # Other object bake result depends on their transforms and materials
+    for obj in other_objs:
+        hash_value(h, 'other', obj.name)
+        bake_fingerprint.hash_mesh(h, obj)
+        bake_fingerprint.hash_object_materials(h, obj)
+
+    for obj in occluders:
+        hash_value(h, 'occluder', obj.name)
+        bake_fingerprint.hash_mesh(h, obj)
+
+    hash_value(h, 'extra', extra)
+
+    return h.hexdigest()
+
+class YClearBakeCache(bpy.types.Operator):
+    bl_idname = "node.y_clear_bake_cache"
+    bl_label = "Clear Bake Cache"
+    bl_description = "Remove all cached bake results from disk"
+
+    def execute(self, context):
+        clear_cache()
+        self.report({'INFO'}, 'Bake cache is cleared!')
+        return {'FINISHED'}
+
+def register():
+    bpy.utils.register_class(YClearBakeCache)
+
+def unregister():
+    bpy.utils.unregister_class(YClearBakeCache)
@@ -1,101 +1,135 @@
-import bpy, time
+import bpy, time, numpy
 from .common import *
 from .node_connections import *
-from . import lib, Layer, ImageAtlas
+from . import lib, Layer, ImageAtlas, image_buffer, image_filters, image_resample, bake_cache
 
 BL28_HACK = True
 
+# Temporary uv used by tiled bake
+TILE_UV = '__ybake_tile_uv'
+
+# Baked image nodes of a channel and their label suffixes
+baked_image_props = ('baked', 'baked_disp', 'baked_normal_overlay')
+baked_image_suffixes = {
+        'baked' : '',
+        'baked_disp' : ' Displacement',
+        'baked_normal_overlay' : ' Overlay Only',
+        }
+
 problematic_modifiers = {
         'MIRROR',
         'SOLIDIFY',
         'ARRAY',
         }
 
-def remember_before_bake(yp=None):
-    book = {}
-    book['scene'] = scene = bpy.context.scene
-    book['obj'] = obj = bpy.context.object
-    book['mode'] = obj.mode
-    uv_layers = get_uv_layers(obj)
-    ypui = bpy.context.window_manager.ypui
-
-    # Remember render settings
-    book['ori_engine'] = scene.render.engine
-    book['ori_bake_type'] = scene.cycles.bake_type
-    book['ori_samples'] = scene.cycles.samples
-    book['ori_threads_mode'] = scene.render.threads_mode
-    book['ori_margin'] = scene.render.bake.margin
-    book['ori_use_clear'] = scene.render.bake.use_clear
-    book['ori_normal_space'] = scene.render.bake.normal_space
-    book['ori_simplify'] = scene.render.use_simplify
-    book['ori_device'] = scene.cycles.device
-    if hasattr(scene.render, 'tile_x'):
-        book['ori_tile_x'] = scene.render.tile_x
-        book['ori_tile_y'] = scene.render.tile_y
-    book['ori_use_selected_to_active'] = scene.render.bake.use_selected_to_active
-    if is_greater_than_280():
-        book['ori_max_ray_distance'] = scene.render.bake.max_ray_distance
-    book['ori_cage_extrusion'] = scene.render.bake.cage_extrusion
-    book['ori_use_cage'] = scene.render.bake.use_cage
-
-    if hasattr(scene.cycles, 'use_denoising'):
-        book['ori_use_denoising'] = scene.cycles.use_denoising
-
-    if hasattr(scene.render.bake, 'target'):
-        book['ori_bake_target'] = scene.render.bake.target
-
-    if is_greater_than_280():
-        book['ori_material_override'] = bpy.context.view_layer.material_override
-    else: book['ori_material_override'] = scene.render.layers.active.material_override
-
-    # Multires related
-    book['ori_use_bake_multires'] = scene.render.use_bake_multires
-    book['ori_use_bake_clear'] = scene.render.use_bake_clear
-    book['ori_render_bake_type'] = scene.render.bake_type
-    book['ori_bake_margin'] = scene.render.bake_margin
-
-    if is_greater_than_281() and not is_greater_than_300() and scene.cycles.device == 'GPU' and 'compute_device_type' in bpy.context.preferences.addons['cycles'].preferences:
-        book['compute_device_type'] = bpy.context.preferences.addons['cycles'].preferences['compute_device_type']
-
-    # Remember uv
-    book['ori_active_uv'] = uv_layers.active.name
-    active_render_uvs = [u for u in uv_layers if u.active_render]
-    if active_render_uvs:
-        book['ori_active_render_uv'] = active_render_uvs[0].name
-
-    # Remember scene objects
-    if is_greater_than_280():
-        book['ori_active_selected_objs'] = [o for o in bpy.context.view_layer.objects if o.select_get()]
-        book['ori_hide_renders'] = [o for o in bpy.context.view_layer.objects if o.hide_render]
-        book['ori_hide_viewports'] = [o for o in bpy.context.view_layer.objects if o.hide_viewport]
-        book['ori_hide_objs'] = [o for o in bpy.context.view_layer.objects if o.hide_get()]
-
-        layer_cols = get_all_layer_collections([], bpy.context.view_layer.layer_collection)
+class BakeStateGuard():
+    ''' Journal of scene states changed by the bake process
+        Only properties that are actually changed are remembered, so recovering doesn't need to scan the whole scene
+        It can be used as context manager, so the scene is always recovered even if the bake is failed
+    '''
+    def __init__(self, yp=None):
+        self.scene = bpy.context.scene
+        self.obj = bpy.context.object
+        self.mode = self.obj.mode
+        self.journal = []
+        self.recorded = set()
+        self.recovered = False
+
+        # Remember uv
+        uv_layers = get_uv_layers(self.obj)
+        self.ori_active_uv = uv_layers.active.name if uv_layers.active else ''
+        active_render_uvs = [u for u in uv_layers if u.active_render]
+        self.ori_active_render_uv = active_render_uvs[0].name if active_render_uvs else ''
+
+        # Remember yp
+        self.parallax_ch = get_root_parallax_channel(yp) if yp else None
+
+        _active_guards.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Guards created inside this block are also recovered, so early returns and errors don't leave them behind
+        if self in _active_guards:
+            for guard in reversed(_active_guards[_active_guards.index(self) + 1:]):
+                guard.recover()
+        self.recover()
+
+    def record(self, key, recover_func):
+        ''' Only the first change of a property need to be recorded '''
+        if key in self.recorded: return
+        self.recorded.add(key)
+        self.journal.append(recover_func)
+
+    def set(self, struct, attr, value):
+        ori = getattr(struct, attr)
+        if ori == value: return
+        self.record((struct.as_pointer(), attr), lambda: setattr(struct, attr, ori))
+        setattr(struct, attr, value)
+
+    def set_item(self, container, key, value):
+        ori = container[key]
+        if ori == value: return
+        self.record((id(container), key), lambda: container.__setitem__(key, ori))
+        container[key] = value
+
+    def set_hide(self, obj, value):
+        ori = obj.hide_get()
+        if ori == value: return
+        self.record((obj.as_pointer(), 'hide_get'), lambda: obj.hide_set(ori))
+        obj.hide_set(value)
+
+    def set_select(self, obj, value):
+        ori = obj.select_get()
+        if ori == value: return
+        self.record((obj.as_pointer(), 'select_get'), lambda: obj.select_set(ori))
+        obj.select_set(value)
+
+    def recover(self, recover_active_uv=False):
+        if self.recovered: return
+        self.recovered = True
+
+        if self in _active_guards:
+            _active_guards.remove(self)
+
+        obj = self.obj
+
+        # Recover uv
+        if recover_active_uv:
+            uv_layers = get_uv_layers(obj)
+            uvl = uv_layers.get(self.ori_active_uv)
+            if uvl: uv_layers.active = uvl
+            uvl = uv_layers.get(self.ori_active_render_uv)
+            if uvl: uvl.active_render = True
 
-        book['ori_layer_col_hide_viewport'] = [lc for lc in layer_cols if lc.hide_viewport]
-        book['ori_layer_col_exclude'] = [lc for lc in layer_cols if lc.exclude]
-        book['ori_col_hide_viewport'] = [c for c in bpy.data.collections if c.hide_viewport]
-        book['ori_col_hide_render'] = [c for c in bpy.data.collections if c.hide_render]
+        # Recover active object and mode
+        if is_greater_than_280():
+            bpy.context.view_layer.objects.active = obj
+        else: self.scene.objects.active = obj
+        try: bpy.ops.object.mode_set(mode = self.mode)
+        except: pass
 
-    else: 
-        book['ori_hide_selects'] = [o for o in scene.objects if o.hide_select]
-        book['ori_active_selected_objs'] = [o for o in scene.objects if o.select]
-        book['ori_hide_renders'] = [o for o in scene.objects if o.hide_render]
-        book['ori_hide_objs'] = [o for o in scene.objects if o.hide]
+        # Revert the changes in reverse order
+        for recover_func in reversed(self.journal):
+            # Some of the data can be already removed
+            try: recover_func()
+            except ReferenceError: pass
+        self.journal = []
 
-    # Remember world settings
-    if is_greater_than_280() and scene.world:
-        book['ori_distance'] = scene.world.light_settings.distance
+        # Free reusable pixel buffers since bake results can be really big
+        image_buffer.clear_pixel_buffers()
 
-    # Remember ypui
-    #book['ori_disable_temp_uv'] = ypui.disable_auto_temp_uv_update
+# Guards that are not recovered yet, latest one is the last
+_active_guards = []
 
-    # Remember yp
-    if yp:
-        book['parallax_ch'] = get_root_parallax_channel(yp)
-    else: book['parallax_ch'] = None
+def run_guarded_bake(func, *args):
+    ''' Run bake function inside a guard, scene changes of unfinished bakes are always recovered '''
+    with BakeStateGuard():
+        return func(*args)
 
-    return book
+def remember_before_bake(yp=None):
+    return BakeStateGuard(yp)
 
 def prepare_bake_settings(book, objs, yp=None, samples=1, margin=5, uv_map='', bake_type='EMIT', 
         disable_problematic_modifiers=False, force_use_cpu=False, hide_other_objs=True, bake_from_multires=False, 
@@ -108,52 +142,53 @@ def prepare_bake_settings(book, objs, yp=None, samples=1, margin=5, uv_map='', b
     #obj = bpy.context.object
     ypui = bpy.context.window_manager.ypui
 
-    scene.render.engine = 'CYCLES'
-    scene.cycles.samples = samples
-    scene.render.threads_mode = 'AUTO'
-    scene.render.bake.margin = margin
+    book.set(scene.render, 'engine', 'CYCLES')
+    book.set(scene.cycles, 'samples', samples)
+    book.set(scene.render, 'threads_mode', 'AUTO')
+    book.set(scene.render.bake, 'margin', margin)
     #scene.render.bake.use_clear = True
-    scene.render.bake.use_clear = False
-    scene.render.bake.use_selected_to_active = use_selected_to_active
+    book.set(scene.render.bake, 'use_clear', False)
+    book.set(scene.render.bake, 'use_selected_to_active', use_selected_to_active)
     if is_greater_than_280():
-        scene.render.bake.max_ray_distance = max_ray_distance
-    scene.render.bake.cage_extrusion = cage_extrusion
-    scene.render.bake.use_cage = False
-    scene.render.use_simplify = False
+        book.set(scene.render.bake, 'max_ray_distance', max_ray_distance)
+    book.set(scene.render.bake, 'cage_extrusion', cage_extrusion)
+    book.set(scene.render.bake, 'use_cage', False)
+    book.set(scene.render, 'use_simplify', False)
     if hasattr(scene.render, 'tile_x'):
-        scene.render.tile_x = tile_x
-        scene.render.tile_y = tile_y
+        book.set(scene.render, 'tile_x', tile_x)
+        book.set(scene.render, 'tile_y', tile_y)
 
     if hasattr(scene.cycles, 'use_denoising'):
-        scene.cycles.use_denoising = False
+        book.set(scene.cycles, 'use_denoising', False)
 
     if hasattr(scene.render.bake, 'target'):
-        scene.render.bake.target = bake_target
+        book.set(scene.render.bake, 'target', bake_target)
 
+    # Disable material override
     if is_greater_than_280():
-        bpy.context.view_layer.material_override = None
-    else: scene.render.layers.active.material_override = None
+        book.set(bpy.context.view_layer, 'material_override', None)
+    else: book.set(scene.render.layers.active, 'material_override', None)
 
     if bake_from_multires:
-        scene.render.use_bake_multires = True
-        scene.render.bake_type = bake_type
-        scene.render.bake_margin = margin
-        scene.render.use_bake_clear = False
+        book.set(scene.render, 'use_bake_multires', True)
+        book.set(scene.render, 'bake_type', bake_type)
+        book.set(scene.render, 'bake_margin', margin)
+        book.set(scene.render, 'use_bake_clear', False)
     else: 
-        scene.render.use_bake_multires = False
-        scene.cycles.bake_type = bake_type
+        book.set(scene.render, 'use_bake_multires', False)
+        book.set(scene.cycles, 'bake_type', bake_type)
 
     # Use CPU if being forced
     if force_use_cpu:
-        scene.cycles.device = 'CPU'
+        book.set(scene.cycles, 'device', 'CPU')
     # Use CUDA bake if Optix is selected
     elif (is_greater_than_281() and not is_greater_than_300() and 'compute_device_type' in bpy.context.preferences.addons['cycles'].preferences and
             bpy.context.preferences.addons['cycles'].preferences['compute_device_type'] == 3):
         #scene.cycles.device = 'CPU'
-        bpy.context.preferences.addons['cycles'].preferences['compute_device_type'] = 1
+        book.set_item(bpy.context.preferences.addons['cycles'].preferences, 'compute_device_type', 1)
 
     if bake_type == 'NORMAL':
-        scene.render.bake.normal_space = 'TANGENT'
+        book.set(scene.render.bake, 'normal_space', 'TANGENT')
 
     # Disable other object selections and select only active object
     if is_greater_than_280():
@@ -162,67 +197,56 @@ def prepare_bake_settings(book, objs, yp=None, samples=1, margin=5, uv_map='', b
         for o in source_objs:
             layer_cols = get_object_parent_layer_collections([], bpy.context.view_layer.layer_collection, o)
             for lc in layer_cols:
-                lc.exclude = False
+                book.set(lc, 'exclude', False)
 
         # Show viewport and render of object layer collection
         for o in objs:
-            o.hide_render = False
-            o.hide_viewport = False
+            book.set(o, 'hide_render', False)
+            book.set(o, 'hide_viewport', False)
             layer_cols = get_object_parent_layer_collections([], bpy.context.view_layer.layer_collection, o)
             for lc in layer_cols:
-                lc.hide_viewport = False
-                lc.collection.hide_viewport = False
-                lc.collection.hide_render = False
+                book.set(lc, 'hide_viewport', False)
+                book.set(lc.collection, 'hide_viewport', False)
+                book.set(lc.collection, 'hide_render', False)
 
         if hide_other_objs:
             for o in bpy.context.view_layer.objects:
                 if o not in objs:
-                    o.hide_render = True
+                    book.set(o, 'hide_render', True)
 
-        #for o in scene.objects:
-        for o in bpy.context.view_layer.objects:
-            o.select_set(False)
+        # Only selected objects need to be deselected
+        for o in bpy.context.selected_objects:
+            book.set_select(o, False)
 
         for obj in objs:
-            obj.hide_set(False)
-            obj.select_set(True)
+            book.set_hide(obj, False)
+            book.set_select(obj, True)
             #print(obj.name, obj.hide_render, obj.select_get())
 
-        # Disable material override
-        book['material_override'] = bpy.context.view_layer.material_override
-        bpy.context.view_layer.material_override = None
-
     else:
 
         for obj in objs:
-            obj.hide_render = False
-            obj.hide = False
+            book.set(obj, 'hide_render', False)
+            book.set(obj, 'hide', False)
 
         if hide_other_objs:
             for o in scene.objects:
                 if o not in objs:
-                    o.hide_render = True
+                    book.set(o, 'hide_render', True)
 
         for o in scene.objects:
-            o.select = False
+            book.set(o, 'select', False)
 
         for obj in objs:
-            obj.hide_select = False
-            obj.select = True
+            book.set(obj, 'hide_select', False)
+            book.set(obj, 'select', True)
 
     if disable_problematic_modifiers:
-        book['disabled_mods'] = []
-        book['disabled_viewport_mods'] = []
         for obj in objs:
             for mod in obj.modifiers:
-
-                if mod.show_render and mod.type in problematic_modifiers: #{'MIRROR', 'SOLIDIFY'}:
-                    mod.show_render = False
-                    book['disabled_mods'].append(mod)
-
-                if mod.show_viewport and mod.type in problematic_modifiers: #{'MIRROR', 'SOLIDIFY'}:
-                    mod.show_viewport = False
-                    book['disabled_viewport_mods'].append(mod)
+                if mod.type in problematic_modifiers: #{'MIRROR', 'SOLIDIFY'}:
+                    book.set(mod, 'show_render', False)
+                    book.set(mod, 'show_viewport', False)
 
     # Set active uv layers
     if uv_map != '':
@@ -243,143 +267,30 @@ def prepare_bake_settings(book, objs, yp=None, samples=1, margin=5, uv_map='', b
 
     # Disable parallax channel
     #parallax_ch = get_root_parallax_channel(yp)
-    if book['parallax_ch']:
-        book['parallax_ch'].enable_parallax = False
+    if book.parallax_ch:
+        book.set(book.parallax_ch, 'enable_parallax', False)
 
 def recover_bake_settings(book, yp=None, recover_active_uv=False):
-    scene = book['scene']
-    obj = book['obj']
-    uv_layers = get_uv_layers(obj)
-    ypui = bpy.context.window_manager.ypui
+    book.recover(recover_active_uv)
 
-    scene.render.engine = book['ori_engine']
-    scene.cycles.samples = book['ori_samples']
-    scene.cycles.bake_type = book['ori_bake_type']
-    scene.render.threads_mode = book['ori_threads_mode']
-    scene.render.bake.margin = book['ori_margin']
-    scene.render.bake.use_clear = book['ori_use_clear']
-    scene.render.use_simplify = book['ori_simplify']
-    scene.cycles.device = book['ori_device']
-    if hasattr(scene.render, 'tile_x'):
-        scene.render.tile_x = book['ori_tile_x']
-        scene.render.tile_y = book['ori_tile_y']
-    if hasattr(scene.cycles, 'use_denoising'):
-        scene.cycles.use_denoising = book['ori_use_denoising']
-    if hasattr(scene.render.bake, 'target'):
-        scene.render.bake.target = book['ori_bake_target']
-    scene.render.bake.use_selected_to_active = book['ori_use_selected_to_active']
-    if is_greater_than_280():
-        scene.render.bake.max_ray_distance = book['ori_max_ray_distance']
-    scene.render.bake.cage_extrusion = book['ori_cage_extrusion']
-    scene.render.bake.use_cage = book['ori_use_cage']
+def fxaa_image_numpy(image, alpha_aware=True):
+    T = time.time()
+    print('FXAA: Doing FXAA pass on', image.name + '...')
 
-    if is_greater_than_280():
-        bpy.context.view_layer.material_override = book['ori_material_override']
-    else: scene.render.layers.active.material_override = book['ori_material_override']
-
-    # Multires related
-    scene.render.use_bake_multires = book['ori_use_bake_multires']
-    scene.render.use_bake_clear = book['ori_use_bake_clear']
-    scene.render.bake_type = book['ori_render_bake_type']
-    scene.render.bake_margin = book['ori_bake_margin']
-
-    if 'compute_device_type' in book:
-        bpy.context.preferences.addons['cycles'].preferences['compute_device_type'] = book['compute_device_type']
-
-    if is_greater_than_280() and 'material_override' in book:
-        bpy.context.view_layer.material_override = book['material_override']
-
-    # Recover world settings
-    if is_greater_than_280() and scene.world:
-        scene.world.light_settings.distance = book['ori_distance']
-
-    # Recover uv
-    if recover_active_uv:
-        uvl = uv_layers.get(book['ori_active_uv'])
-        if uvl: uv_layers.active = uvl
-        if 'ori_active_render_uv' in book:
-            uvl = uv_layers.get(book['ori_active_render_uv'])
-            if uvl: uvl.active_render = True
+    pxs = image_buffer.read_pixels(image)
+    pxs = image_filters.fxaa_pixels(pxs, alpha_aware, hdr=image.is_float)
+    image_buffer.write_pixels(image, pxs)
 
-    #return
+    print('FXAA:', image.name, 'FXAA pass is done at', '{:0.2f}'.format(time.time() - T), 'seconds!')
 
-    # Recover active object and mode
-    if is_greater_than_280():
-        bpy.context.view_layer.objects.active = obj
-    else: scene.objects.active = obj
-    bpy.ops.object.mode_set(mode = book['mode'])
+    return image
 
-    # Disable other object selections
-    if is_greater_than_280():
+def fxaa_image(image, alpha_aware=True, force_use_cpu=False, method='NUMPY'):
+
+    # Pixel based FXAA doesn't need any scene setup
+    if method == 'NUMPY':
+        return fxaa_image_numpy(image, alpha_aware)
 
-        # Recover collections
-        layer_cols = get_all_layer_collections([], bpy.context.view_layer.layer_collection)
-        for lc in layer_cols:
-            if lc in book['ori_layer_col_hide_viewport']:
-                lc.hide_viewport = True
-            else: lc.hide_viewport = False
-
-            if lc in book['ori_layer_col_exclude']:
-                lc.exclude = True
-            else: lc.exclude = False
-
-        for c in bpy.data.collections:
-            if c in book['ori_col_hide_viewport']:
-                c.hide_viewport = True
-            else: c.hide_viewport = False
-
-            if c in book['ori_col_hide_render']:
-                c.hide_render = True
-            else: c.hide_render = False
-
-        #for o in scene.objects:
-        for o in bpy.context.view_layer.objects:
-            if o in book['ori_active_selected_objs']:
-                o.select_set(True)
-            else: o.select_set(False)
-            if o in book['ori_hide_renders']:
-                o.hide_render = True
-            else: o.hide_render = False
-            if o in book['ori_hide_viewports']:
-                o.hide_viewport = True
-            else: o.hide_viewport = False
-            if o in book['ori_hide_objs']:
-                o.hide_set(True)
-            else: o.hide_set(False)
-    else:
-        for o in scene.objects:
-            if o in book['ori_active_selected_objs']:
-                o.select = True
-            else: o.select = False
-            if o in book['ori_hide_renders']:
-                o.hide_render = True
-            else: o.hide_render = False
-            if o in book['ori_hide_objs']:
-                o.hide = True
-            else: o.hide = False
-            if o in book['ori_hide_selects']:
-                o.hide_select = True
-            else: o.hide_select = False
-
-    # Recover active object
-
-    # Recover ypui
-    #ypui.disable_auto_temp_uv_update = book['ori_disable_temp_uv']
-
-    # Recover parallax
-    if book['parallax_ch']:
-        book['parallax_ch'].enable_parallax = True
-
-    # Recover modifiers
-    if 'disabled_mods' in book:
-        for mod in book['disabled_mods']:
-            mod.show_render = True
-
-    if 'disabled_viewport_mods' in book:
-        for mod in book['disabled_viewport_mods']:
-            mod.show_viewport = True
-
-def fxaa_image(image, alpha_aware=True, force_use_cpu=False):
     T = time.time()
     print('FXAA: Doing FXAA pass on', image.name + '...')
     book = remember_before_bake()
@@ -388,9 +299,9 @@ def fxaa_image(image, alpha_aware=True, force_use_cpu=False):
     height = image.size[1]
 
     # Copy image
-    pixels = list(image.pixels)
+    ori_alpha = image_buffer.read_pixels(image)[:, :, 3].copy()
     image_copy = image.copy()
-    image_copy.pixels = pixels
+    image_buffer.blit_image(image, image_copy)
 
     # Set active collection to be root collection
     if is_greater_than_280():
@@ -444,8 +355,7 @@ def fxaa_image(image, alpha_aware=True, force_use_cpu=False):
         print('FXAA: Baking straight over on', image.name + '...')
         bpy.ops.object.bake()
 
-        pixels_1 = list(image.pixels)
-        image_copy.pixels = pixels_1
+        image_buffer.blit_image(image, image_copy)
 
     # Fill fxaa nodes
     res_x = fxaa.node_tree.nodes.get('res_x')
@@ -474,19 +384,9 @@ def fxaa_image(image, alpha_aware=True, force_use_cpu=False):
     # Copy original alpha to baked image
     if alpha_aware:
         print('FXAA: Copying original alpha to FXAA result of', image.name + '...')
-        target_pxs = list(image.pixels)
-        start_x = 0
-        start_y = 0
-
-        for y in range(height):
-            temp_offset_y = width * 4 * y
-            offset_y = width * 4 * (y + start_y)
-            for x in range(width):
-                temp_offset_x = 4 * x
-                offset_x = 4 * (x + start_x)
-                target_pxs[offset_y + offset_x + 3] = pixels[temp_offset_y + temp_offset_x + 3]
-
-        image.pixels = target_pxs
+        pxs = image_buffer.read_pixels(image)
+        pxs[:, :, 3] = ori_alpha
+        image_buffer.write_pixels(image, pxs)
 
     # Remove temp datas
     print('FXAA: Removing temporary data of FXAA pass')
@@ -570,26 +470,245 @@ def bake_to_vcol(mat, node, root_ch, extra_channel=None, extra_multiplier=1.0):
     # Recover original bsdf
     mat.node_tree.links.new(ori_bsdf, output.inputs[0])
 
-def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_layer=None, use_hdr=False, aa_level=1):
+def is_temp_bake_needed(yp):
+    for lay in yp.layers:
+        if lay.type in {'HEMI'} and not lay.use_temp_bake:
+            return True
+        for mask in lay.masks:
+            if mask.type in {'HEMI'} and not mask.use_temp_bake:
+                return True
+    return False
 
-    print('BAKE CHANNEL: Baking', root_ch.name + ' channel...')
+def get_scalar_bake_outputs(yp, node, channels):
+    ''' Get grayscale outputs of channels that can be packed into single RGB bake '''
 
-    tree = node.node_tree
-    yp = tree.yp
+    # Fake lighting layers need temporary bake while baking normal channel, so normal outputs can't be packed
+    normal_packable = not is_temp_bake_needed(yp)
 
-    # Check if temp bake is necessary
-    temp_baked = []
-    if root_ch.type == 'NORMAL':
+    outputs = []
+    for ch in channels:
+        if ch.type == 'NORMAL' and not normal_packable: continue
+
+        if ch.type == 'VALUE':
+            outputs.append((ch.name, 'MAIN', node.outputs[ch.name]))
+
+        if ch.type == 'NORMAL':
+            outputs.append((ch.name, 'HEIGHT', node.outputs[ch.name + io_suffix['HEIGHT']]))
+
+        if ch.enable_alpha:
+            outputs.append((ch.name, 'ALPHA', node.outputs[ch.name + io_suffix['ALPHA']]))
+
+    return outputs
+
+def bake_packed_scalar_outputs(mat, node, channels, width=1024, height=1024, session=None):
+    ''' Bake grayscale outputs three at a time using R, G, and B of a single emission bake
+        Returns dictionary of (channel name, output type) to pixel values with shape (height, width)
+    '''
+    yp = node.node_tree.yp
+    outputs = get_scalar_bake_outputs(yp, node, channels)
+
+    # Nothing to gain from packing single output
+    if len(outputs) < 2: return {}
+
+    T = time.time()
+
+    # Float image so values won't lose precision before unpacking
+    temp_img = bpy.data.images.new(name='__TEMP_PACKED__', 
+            width=width, height=height, alpha=True, float_buffer=True)
+    temp_img.colorspace_settings.name = 'Linear'
+
+    # Create setup nodes
+    own_session = session == None
+    if own_session:
+        session = BakeSession(mat, node, '', width, height)
+
+    if is_greater_than_330():
+        combine = mat.node_tree.nodes.new('ShaderNodeCombineColor')
+    else: combine = mat.node_tree.nodes.new('ShaderNodeCombineRGB')
+
+    session.bind(temp_img, combine.outputs[0])
+
+    results = {}
+
+    for i in range(0, len(outputs), 3):
+        triplet = outputs[i:i+3]
+
+        for j in range(3):
+            inp = combine.inputs[j]
+            for l in inp.links:
+                mat.node_tree.links.remove(l)
+            inp.default_value = 0.0
+
+        for j, (ch_name, output_type, soc) in enumerate(triplet):
+            mat.node_tree.links.new(soc, combine.inputs[j])
+
+        print('BAKE CHANNEL: Baking packed outputs of', ', '.join([o[0] + ' ' + o[1].lower() for o in triplet]) + '...')
+        bpy.ops.object.bake()
+
+        pxs = image_buffer.read_pixels(temp_img)
+        for j, (ch_name, output_type, soc) in enumerate(triplet):
+            results[(ch_name, output_type)] = pxs[:, :, j].copy()
+
+    # Remove temp datas
+    simple_remove_node(mat.node_tree, combine)
+    if own_session:
+        session.end()
+    else: session.tex.image = None
+    bpy.data.images.remove(temp_img)
+
+    print('BAKE CHANNEL:', len(outputs), 'outputs are baked in', (len(outputs) + 2) // 3, 'pass(es) at', '{:0.2f}'.format(time.time() - T), 'seconds!')
+
+    return results
+
+def get_baked_node(tree, root_ch, prop='baked'):
+    ''' Get baked image node of the channel, it will be created if it's not there yet '''
+    baked = tree.nodes.get(getattr(root_ch, prop))
+    if not baked:
+        baked = new_node(tree, root_ch, prop, 'ShaderNodeTexImage', 'Baked ' + root_ch.name + baked_image_suffixes[prop])
+
+    if hasattr(baked, 'color_space'):
+        if prop != 'baked' or root_ch.colorspace == 'LINEAR' or root_ch.type == 'NORMAL':
+            baked.color_space = 'NONE'
+        else: baked.color_space = 'COLOR'
+
+    return baked
+
+def check_baked_normal_nodes(tree, root_ch, uv_map):
+    baked_normal = tree.nodes.get(root_ch.baked_normal)
+    if not baked_normal:
+        baked_normal = new_node(tree, root_ch, 'baked_normal', 'ShaderNodeNormalMap', 'Baked Normal')
+    baked_normal.uv_map = uv_map
+
+    baked_normal_prep = tree.nodes.get(root_ch.baked_normal_prep)
+    if not baked_normal_prep:
+        baked_normal_prep = new_node(tree, root_ch, 'baked_normal_prep', 'ShaderNodeGroup', 
+                'Baked Normal Preparation')
+        if is_greater_than_280:
+            baked_normal_prep.node_tree = get_node_tree_lib(lib.NORMAL_MAP_PREP)
+        else: baked_normal_prep.node_tree = get_node_tree_lib(lib.NORMAL_MAP_PREP_LEGACY)
+
+def set_baked_image(baked, image):
+    ''' Set image to baked node and replace all users of previously baked image '''
+    if baked.image:
+        temp = baked.image
+        img_users = get_all_image_users(baked.image)
+        for user in img_users:
+            user.image = image
+        bpy.data.images.remove(temp)
+    else:
+        baked.image = image
+
+def bake_cached(image, cache_key='', output='MAIN', **kwargs):
+    ''' Load bake result from disk cache if available, otherwise bake and store the result to the cache '''
+    if bake_cache.load_cached_image(image, cache_key, output):
+        return
+
+    bpy.ops.object.bake(**kwargs)
+    bake_cache.store_cached_image(image, cache_key, output)
+
+class BakeSession():
+    ''' Temporary bake nodes and material output wiring shared by multiple channel bakes
+        Every bake only need to rebind target image and emission input,
+        fake lighting layers are also temporarily baked only once per session
+    '''
+    def __init__(self, mat, node, uv_map, width=1024, height=1024):
+        self.mat = mat
+        self.node = node
+        self.uv_map = uv_map
+        self.width = width
+        self.height = height
+        self.norm = None
+        self.temp_baked = []
+        self.temp_bake_checked = False
+
+        # Create setup nodes
+        self.tex = mat.node_tree.nodes.new('ShaderNodeTexImage')
+        self.emit = mat.node_tree.nodes.new('ShaderNodeEmission')
+
+        # Get output node and remember original bsdf input
+        self.output = get_active_mat_output_node(mat.node_tree)
+        self.ori_bsdf = self.output.inputs[0].links[0].from_socket
+
+        # Connect emit to output material
+        mat.node_tree.links.new(self.emit.outputs[0], self.output.inputs[0])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end()
+
+    def get_normal_node(self):
+        if not self.norm:
+            self.norm = self.mat.node_tree.nodes.new('ShaderNodeGroup')
+            self.norm.node_tree = get_node_tree_lib(lib.BAKE_NORMAL_ACTIVE_UV)
+        return self.norm
+
+    def temp_bake_fake_lighting(self, width=None, height=None):
+        ''' Normal channel needs temporary bake of fake lighting layers and masks
+            Returns True if this call started the temporary bake, the caller should recover it after the channel is baked
+        '''
+        if self.temp_bake_checked: return False
+        self.temp_bake_checked = True
+
+        if not width: width = self.width
+        if not height: height = self.height
+
+        yp = self.node.node_tree.yp
+        margin = bpy.context.scene.render.bake.margin
         for lay in yp.layers:
             if lay.type in {'HEMI'} and not lay.use_temp_bake:
                 print('BAKE CHANNEL: Fake lighting layer found! Baking temporary image of ' + lay.name + ' layer...')
-                temp_bake(bpy.context, lay, width, height, True, 1, bpy.context.scene.render.bake.margin, uv_map)
-                temp_baked.append(lay)
+                temp_bake(bpy.context, lay, width, height, True, 1, margin, self.uv_map)
+                self.temp_baked.append(lay)
             for mask in lay.masks:
                 if mask.type in {'HEMI'} and not mask.use_temp_bake:
                     print('BAKE CHANNEL: Fake lighting mask found! Baking temporary image of ' + mask.name + ' mask...')
-                    temp_bake(bpy.context, mask, width, height, True, 1, bpy.context.scene.render.bake.margin, uv_map)
-                    temp_baked.append(mask)
+                    temp_bake(bpy.context, mask, width, height, True, 1, margin, self.uv_map)
+                    self.temp_baked.append(mask)
+
+        return True
+
+    def recover_fake_lighting(self):
+        ''' Other channels should use the original fake lighting nodes, not the temporary bake '''
+        for ent in self.temp_baked:
+            print('BAKE CHANNEL: Removing temporary baked ' + ent.name + '...')
+            disable_temp_bake(ent)
+        self.temp_baked = []
+        self.temp_bake_checked = False
+
+    def bind(self, image, socket=None):
+        ''' Set bake target image and emission input '''
+        self.tex.image = image
+        self.mat.node_tree.nodes.active = self.tex
+        if socket: create_link(self.mat.node_tree, socket, self.emit.inputs[0])
+
+    def end(self):
+        if not self.tex: return
+
+        simple_remove_node(self.mat.node_tree, self.tex)
+        simple_remove_node(self.mat.node_tree, self.emit)
+        if self.norm: simple_remove_node(self.mat.node_tree, self.norm)
+        self.tex = self.emit = self.norm = None
+
+        # Recover original bsdf
+        self.mat.node_tree.links.new(self.ori_bsdf, self.output.inputs[0])
+
+        # Recover baked temp
+        self.recover_fake_lighting()
+
+def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_layer=None, use_hdr=False, aa_level=1, packed=None, cache_key='', session=None):
+
+    print('BAKE CHANNEL: Baking', root_ch.name + ' channel...')
+
+    # Results from packed scalar bake
+    if packed == None: packed = {}
+    packed_main = packed.get((root_ch.name, 'MAIN'))
+    packed_height = packed.get((root_ch.name, 'HEIGHT'))
+    packed_alpha = packed.get((root_ch.name, 'ALPHA'))
+
+    tree = node.node_tree
+    yp = tree.yp
 
     ch = None
     img = None
@@ -611,25 +730,23 @@ def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_lay
 
         ch = target_layer.channels[get_channel_index(root_ch)]
 
-    # Create setup nodes
-    tex = mat.node_tree.nodes.new('ShaderNodeTexImage')
-    emit = mat.node_tree.nodes.new('ShaderNodeEmission')
+    # Use temporary session if this bake is not part of bigger session
+    own_session = session == None
+    if own_session:
+        session = BakeSession(mat, node, uv_map, width, height)
 
+    # Check if temp bake is necessary
+    own_temp_bake = False
     if root_ch.type == 'NORMAL':
+        own_temp_bake = session.temp_bake_fake_lighting(width, height)
+        norm = session.get_normal_node()
 
-        norm = mat.node_tree.nodes.new('ShaderNodeGroup')
-        norm.node_tree = get_node_tree_lib(lib.BAKE_NORMAL_ACTIVE_UV)
+    tex = session.tex
+    emit = session.emit
 
     # Set tex as active node
     mat.node_tree.nodes.active = tex
 
-    # Get output node and remember original bsdf input
-    output = get_active_mat_output_node(mat.node_tree)
-    ori_bsdf = output.inputs[0].links[0].from_socket
-
-    # Connect emit to output material
-    mat.node_tree.links.new(emit.outputs[0], output.inputs[0])
-
     # Image name
     if segment:
         img_name = '__TEMP_SEGMENT_'
@@ -643,28 +760,11 @@ def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_lay
 
     if not target_layer:
         # Set nodes
-        baked = tree.nodes.get(root_ch.baked)
-        if not baked:
-            baked = new_node(tree, root_ch, 'baked', 'ShaderNodeTexImage', 'Baked ' + root_ch.name)
-        if hasattr(baked, 'color_space'):
-            if root_ch.colorspace == 'LINEAR' or root_ch.type == 'NORMAL':
-                baked.color_space = 'NONE'
-            else: baked.color_space = 'COLOR'
+        baked = get_baked_node(tree, root_ch, 'baked')
         
         # Normal related nodes
         if root_ch.type == 'NORMAL':
-            baked_normal = tree.nodes.get(root_ch.baked_normal)
-            if not baked_normal:
-                baked_normal = new_node(tree, root_ch, 'baked_normal', 'ShaderNodeNormalMap', 'Baked Normal')
-            baked_normal.uv_map = uv_map
-
-            baked_normal_prep = tree.nodes.get(root_ch.baked_normal_prep)
-            if not baked_normal_prep:
-                baked_normal_prep = new_node(tree, root_ch, 'baked_normal_prep', 'ShaderNodeGroup', 
-                        'Baked Normal Preparation')
-                if is_greater_than_280:
-                    baked_normal_prep.node_tree = get_node_tree_lib(lib.NORMAL_MAP_PREP)
-                else: baked_normal_prep.node_tree = get_node_tree_lib(lib.NORMAL_MAP_PREP_LEGACY)
+            check_baked_normal_nodes(tree, root_ch, uv_map)
 
         # Check if image is available
         if baked.image:
@@ -746,9 +846,19 @@ def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_lay
         #if root_ch.type == 'NORMAL':
         #    return
 
-        # Bake!
-        print('BAKE CHANNEL: Baking main image of ' + root_ch.name + ' channel...')
-        bpy.ops.object.bake()
+        if bake_cache.load_cached_image(img, cache_key, 'MAIN'):
+            pass
+        elif packed_main is not None:
+            print('BAKE CHANNEL: Using packed bake result as main image of ' + root_ch.name + ' channel...')
+            # Packed bake is linear
+            if img.colorspace_settings.name == 'sRGB' and not img.is_float:
+                packed_main = image_filters.linear_to_srgb(packed_main)
+            image_buffer.write_scalar_pixels(img, packed_main)
+            bake_cache.store_cached_image(img, cache_key, 'MAIN')
+        else:
+            # Bake!
+            print('BAKE CHANNEL: Baking main image of ' + root_ch.name + ' channel...')
+            bake_cached(img, cache_key, 'MAIN')
 
     # Bake displacement
     if root_ch.type == 'NORMAL': # and root_ch.enable_parallax:
@@ -761,12 +871,7 @@ def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_lay
                 remove_node(tree, root_ch, 'baked_normal_overlay')
             else:
 
-                baked_normal_overlay = tree.nodes.get(root_ch.baked_normal_overlay)
-                if not baked_normal_overlay:
-                    baked_normal_overlay = new_node(tree, root_ch, 'baked_normal_overlay', 'ShaderNodeTexImage', 
-                            'Baked ' + root_ch.name + ' Overlay Only')
-                    if hasattr(baked_normal_overlay, 'color_space'):
-                        baked_normal_overlay.color_space = 'NONE'
+                baked_normal_overlay = get_baked_node(tree, root_ch, 'baked_normal_overlay')
 
                 if baked_normal_overlay.image:
                     norm_img_name = baked_normal_overlay.image.name
@@ -792,7 +897,7 @@ def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_lay
 
                 # Bake
                 print('BAKE CHANNEL: Baking normal overlay image of ' + root_ch.name + ' channel...')
-                bpy.ops.object.bake()
+                bake_cached(norm_img, cache_key, 'NORMAL_OVERLAY')
 
                 #return
 
@@ -800,24 +905,12 @@ def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_lay
                 create_link(tree, ori_soc, end.inputs[root_ch.name])
 
                 # Set baked normal overlay image
-                if baked_normal_overlay.image:
-                    temp = baked_normal_overlay.image
-                    img_users = get_all_image_users(baked_normal_overlay.image)
-                    for user in img_users:
-                        user.image = norm_img
-                    bpy.data.images.remove(temp)
-                else:
-                    baked_normal_overlay.image = norm_img
+                set_baked_image(baked_normal_overlay, norm_img)
 
             ### Displacement
 
             # Create target image
-            baked_disp = tree.nodes.get(root_ch.baked_disp)
-            if not baked_disp:
-                baked_disp = new_node(tree, root_ch, 'baked_disp', 'ShaderNodeTexImage', 
-                        'Baked ' + root_ch.name + ' Displacement')
-                if hasattr(baked_disp, 'color_space'):
-                    baked_disp.color_space = 'NONE'
+            baked_disp = get_baked_node(tree, root_ch, 'baked_disp')
 
             if baked_disp.image:
                 disp_img_name = baked_disp.image.name
@@ -857,28 +950,40 @@ def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_lay
 
             #return
 
-            # Bake
-            print('BAKE CHANNEL: Baking displacement image of ' + root_ch.name + ' channel...')
-            bpy.ops.object.bake()
+            if target_layer:
+                print('BAKE CHANNEL: Baking displacement image of ' + root_ch.name + ' channel...')
+                bpy.ops.object.bake()
+            elif bake_cache.load_cached_image(disp_img, cache_key, 'DISPLACEMENT'):
+                pass
+            elif packed_height is not None:
+                print('BAKE CHANNEL: Using packed bake result as displacement image of ' + root_ch.name + ' channel...')
+                image_buffer.write_scalar_pixels(disp_img, packed_height)
+                bake_cache.store_cached_image(disp_img, cache_key, 'DISPLACEMENT')
+            else:
+                # Bake
+                print('BAKE CHANNEL: Baking displacement image of ' + root_ch.name + ' channel...')
+                bake_cached(disp_img, cache_key, 'DISPLACEMENT')
 
             if not target_layer:
 
                 # Set baked displacement image
-                if baked_disp.image:
-                    temp = baked_disp.image
-                    img_users = get_all_image_users(baked_disp.image)
-                    for user in img_users:
-                        user.image = disp_img
-                    bpy.data.images.remove(temp)
-                else:
-                    baked_disp.image = disp_img
+                set_baked_image(baked_disp, disp_img)
 
             if spread_height:
                 simple_remove_node(mat.node_tree, spread_height)
 
     # Bake alpha
     #if root_ch.type != 'NORMAL' and root_ch.enable_alpha:
-    if root_ch.enable_alpha:
+    if root_ch.enable_alpha and bake_cache.load_cached_image(img, cache_key, 'ALPHA'):
+        # Cached image already has the alpha
+        pass
+
+    elif root_ch.enable_alpha and packed_alpha is not None:
+        print('BAKE CHANNEL: Using packed bake result as alpha of ' + root_ch.name + ' channel...')
+        image_buffer.write_channel(img, packed_alpha, 3)
+        bake_cache.store_cached_image(img, cache_key, 'ALPHA')
+
+    elif root_ch.enable_alpha:
         # Create temp image
         alpha_img = bpy.data.images.new(name='__TEMP__', width=width, height=height) 
         alpha_img.colorspace_settings.name = 'Linear'
@@ -893,17 +998,8 @@ def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_lay
         bpy.ops.object.bake()
 
         # Copy alpha pixels to main image alpha channel
-        img_pxs = list(img.pixels)
-        alp_pxs = list(alpha_img.pixels)
-
-        for y in range(height):
-            offset_y = width * 4 * y
-            for x in range(width):
-                a = alp_pxs[offset_y + (x*4)]
-                #a = srgb_to_linear_per_element(a)
-                img_pxs[offset_y + (x*4) + 3] = a
-
-        img.pixels = img_pxs
+        image_buffer.inject_alpha(alpha_img, img)
+        bake_cache.store_cached_image(img, cache_key, 'ALPHA')
 
         #return
 
@@ -912,51 +1008,22 @@ def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_lay
 
     if not target_layer:
         # Set image to baked node and replace all previously original users
-        if baked.image:
-            temp = baked.image
-            img_users = get_all_image_users(baked.image)
-            for user in img_users:
-                user.image = img
-            bpy.data.images.remove(temp)
-        else:
-            baked.image = img
+        set_baked_image(baked, img)
 
-    simple_remove_node(mat.node_tree, tex)
-    simple_remove_node(mat.node_tree, emit)
-    #simple_remove_node(mat.node_tree, lin2srgb)
-    #simple_remove_node(mat.node_tree, srgb2lin)
-    if root_ch.type == 'NORMAL':
-        simple_remove_node(mat.node_tree, norm)
-
-    # Recover original bsdf
-    mat.node_tree.links.new(ori_bsdf, output.inputs[0])
-
-    # Recover baked temp
-    for ent in temp_baked:
-        print('BAKE CHANNEL: Removing temporary baked ' + ent.name + '...')
-        disable_temp_bake(ent)
+    # Only unbind target image when the session is still used by other bakes
+    if own_session:
+        session.end()
+    else: 
+        tex.image = None
+        if own_temp_bake: session.recover_fake_lighting()
 
     # Set image to target layer
     if target_layer:
         ori_img = source.image
 
         if segment:
-            start_x = width * segment.tile_x
-            start_y = height * segment.tile_y
-
-            target_pxs = list(ori_img.pixels)
-            temp_pxs = list(img.pixels)
-
-            for y in range(height):
-                temp_offset_y = width * 4 * y
-                offset_y = ori_img.size[0] * 4 * (y + start_y)
-                for x in range(width):
-                    temp_offset_x = 4 * x
-                    offset_x = 4 * (x + start_x)
-                    for i in range(4):
-                        target_pxs[offset_y + offset_x + i] = temp_pxs[temp_offset_y + temp_offset_x + i]
-
-            ori_img.pixels = target_pxs
+            # Copy baked image to the segment
+            image_buffer.blit_image(img, ori_img, *get_segment_start(segment))
 
             # Remove temp image
             bpy.data.images.remove(img)
@@ -968,6 +1035,156 @@ def bake_channel(uv_map, mat, node, root_ch, width=1024, height=1024, target_lay
 
         return True
 
+def get_bake_tiles(width, height, tile_size):
+    ''' Split image area into tiles of (x, y, width, height) '''
+    tiles = []
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            tiles.append((x, y, min(tile_size, width - x), min(tile_size, height - y)))
+    return tiles
+
+def prepare_tile_uvs(objs, uv_map):
+    ''' Create temporary copy of bake uv on all objects, returns original uv coordinates '''
+    ori_uvs = {}
+    for ob in objs:
+        uv_layers = get_uv_layers(ob)
+        tile_uv = uv_layers.get(TILE_UV)
+        if not tile_uv:
+            if len(uv_layers) >= MAX_VERTEX_DATA: return None
+            uv_layers.new(name=TILE_UV)
+
+        uvl = ob.data.uv_layers.get(uv_map)
+        uvs = numpy.empty(len(ob.data.loops) * 2, dtype=numpy.float32)
+        uvl.data.foreach_get('uv', uvs)
+        ori_uvs[ob.name] = uvs.reshape(-1, 2)
+
+    return ori_uvs
+
+def set_tile_uvs(objs, ori_uvs, x, y, tile_width, tile_height, width, height):
+    ''' Transform temporary uv so the tile rectangle covers the whole 0-1 uv space '''
+    for ob in objs:
+        uvs = ori_uvs[ob.name].copy()
+        uvs[:, 0] = (uvs[:, 0] * width - x) / tile_width
+        uvs[:, 1] = (uvs[:, 1] * height - y) / tile_height
+
+        ob.data.uv_layers.get(TILE_UV).data.foreach_set('uv', uvs.reshape(-1))
+
+        uv_layers = get_uv_layers(ob)
+        tile_uv = uv_layers.get(TILE_UV)
+        uv_layers.active = tile_uv
+        tile_uv.active_render = True
+
+def remove_tile_uvs(objs, uv_map):
+    for ob in objs:
+        uv_layers = get_uv_layers(ob)
+        tile_uv = uv_layers.get(TILE_UV)
+        if tile_uv: uv_layers.remove(tile_uv)
+
+        uv = uv_layers.get(uv_map)
+        if uv:
+            uv_layers.active = uv
+            uv.active_render = True
+
+def bake_channel_tiled(uv_map, mat, node, root_ch, objs, width, height, tile_size=2048, margin=5, use_hdr=False, cache_key='', session=None):
+    ''' Bake channel tile by tile using uv transformed copy of bake uv
+        Cycles and temporary images only need the memory of a single tile,
+        finished tiles are copied into full size pixel arrays that are written to the images once at the end
+    '''
+    tree = node.node_tree
+    yp = tree.yp
+
+    ori_uvs = prepare_tile_uvs(objs, uv_map)
+    if ori_uvs == None:
+        print('BAKE CHANNEL: No more room for temporary uv, baking without tiles...')
+        remove_tile_uvs(objs, uv_map)
+        return bake_channel(uv_map, mat, node, root_ch, width, height, use_hdr=use_hdr, cache_key=cache_key, session=session)
+
+    own_session = session == None
+    if own_session:
+        session = BakeSession(mat, node, uv_map, min(width, tile_size), min(height, tile_size))
+
+    tiles = get_bake_tiles(width, height, tile_size)
+
+    # Full size pixels of every baked output, {prop : (pixels, is_float, colorspace)}
+    finals = {}
+
+    own_temp_bake = False
+
+    wm = bpy.context.window_manager
+    wm.progress_begin(0, len(tiles))
+
+    # Temporary uv, progress and session should always be recovered, even if one of the tiles failed
+    try:
+        # Fake lighting need temporary bake on its own uv, so do it at full size before tiled bake
+        if root_ch.type == 'NORMAL':
+            own_temp_bake = session.temp_bake_fake_lighting(width, height)
+
+        for i, (x, y, tile_width, tile_height) in enumerate(tiles):
+
+            T = time.time()
+
+            # Tiles are baked with extra margin so islands on the neighbor tiles still contribute to the bake margin
+            px = max(x - margin, 0)
+            py = max(y - margin, 0)
+            pw = min(x + tile_width + margin, width) - px
+            ph = min(y + tile_height + margin, height) - py
+
+            set_tile_uvs(objs, ori_uvs, px, py, pw, ph, width, height)
+
+            tile_key = cache_key + ' tile ' + str((px, py, pw, ph)) if cache_key else ''
+            bake_channel(uv_map, mat, node, root_ch, pw, ph, use_hdr=use_hdr, cache_key=tile_key, session=session)
+
+            # Copy the tile into full size pixel array, images are only written once after all tiles are baked
+            for prop in baked_image_props:
+                baked = tree.nodes.get(getattr(root_ch, prop))
+                if not baked or not baked.image: continue
+
+                tile_img = baked.image
+                if prop not in finals:
+                    finals[prop] = (numpy.zeros((height, width, 4), dtype=numpy.float32), 
+                            tile_img.is_float, tile_img.colorspace_settings.name)
+
+                pxs = image_buffer.read_pixels(tile_img, slot=1)
+                final_pxs = finals[prop][0]
+                final_pxs[y : y + tile_height, x : x + tile_width] = image_buffer.get_rect_view(pxs, x - px, y - py, tile_width, tile_height)
+
+            wm.progress_update(i + 1)
+            print('BAKE CHANNEL: Tile', i + 1, 'of', len(tiles), 'of', root_ch.name, 'channel is baked at', 
+                    '{:0.2f}'.format(time.time() - T), 'seconds!')
+
+        # Replace tile sized images with the full size ones
+        for prop, (final_pxs, is_float, colorspace) in finals.items():
+            final = bpy.data.images.new(name='__TEMP_TILED__', width=width, height=height, 
+                    alpha=True, float_buffer=is_float)
+            final.colorspace_settings.name = colorspace
+            image_buffer.write_pixels(final, final_pxs)
+
+            baked = tree.nodes.get(getattr(root_ch, prop))
+            tile_img = baked.image
+
+            name = tile_img.name
+            filepath = tile_img.filepath
+            tile_img.name = '____TEMP'
+            final.name = name
+            if filepath != '':
+                final.filepath = filepath
+
+            for user in get_all_image_users(tile_img):
+                user.image = final
+            bpy.data.images.remove(tile_img)
+
+    finally:
+        wm.progress_end()
+
+        image_buffer.clear_pixel_buffers()
+
+        remove_tile_uvs(objs, uv_map)
+
+        if own_session:
+            session.end()
+        elif own_temp_bake: 
+            session.recover_fake_lighting()
+
 def temp_bake(context, entity, width, height, hdr, samples, margin, uv_map, force_use_cpu=False):
 
     m1 = re.match(r'yp\.layers\[(\d+)\]$', entity.path_from_id())
@@ -1114,13 +1331,56 @@ def join_objects(objs):
 
     return bpy.context.object
 
-def resize_image(image, width, height, colorspace='Linear', samples=1, margin=0, segment=None, alpha_aware=True, force_use_cpu=False, yp=None):
+def resize_image_numpy(image, width, height, colorspace='Linear', segment=None, alpha_aware=True, yp=None, filter_type='LANCZOS'):
 
     T = time.time()
     image_name = image.name
     print('RESIZE IMAGE: Doing resize image pass on', image_name + '...')
 
-    book = remember_before_bake()
+    if segment:
+        rect = get_segment_rect(segment)
+    else: rect = (0, 0, image.size[0], image.size[1])
+
+    if rect[2] == width and rect[3] == height:
+        return
+
+    # Resampled pixels is a new array, so reusable buffer can be used again to write the result
+    pxs = image_buffer.get_rect_view(image_buffer.read_pixels(image), *rect)
+    pxs = image_resample.resample_pixels(pxs, width, height, filter_type, alpha_aware, clamp=not image.is_float)
+
+    if segment:
+        new_segment = ImageAtlas.get_set_image_atlas_segment(
+                    width, height, image.yia.color, image.is_float, yp=yp)
+        scaled_img = new_segment.id_data
+
+        image_buffer.write_rect(scaled_img, *get_segment_start(new_segment), pxs)
+    else:
+        scaled_img = bpy.data.images.new(name='__TEMP__', 
+            width=width, height=height, alpha=True, float_buffer=image.is_float)
+        scaled_img.colorspace_settings.name = colorspace
+        if image.filepath != '' and not image.packed_file:
+            scaled_img.filepath = image.filepath
+
+        image_buffer.write_pixels(scaled_img, pxs)
+
+        new_segment = None
+
+        # Replace original image to scaled image
+        replace_image(image, scaled_img)
+
+    print('RESIZE IMAGE:', image_name, 'Resize image is done at', '{:0.2f}'.format(time.time() - T), 'seconds!')
+
+    return scaled_img, new_segment
+
+def resize_image(image, width, height, colorspace='Linear', samples=1, margin=0, segment=None, alpha_aware=True, force_use_cpu=False, yp=None, method='LANCZOS'):
+
+    # Resample pixels directly unless Cycles bake is requested
+    if method != 'CYCLES':
+        return resize_image_numpy(image, width, height, colorspace, segment, alpha_aware, yp, method)
+
+    T = time.time()
+    image_name = image.name
+    print('RESIZE IMAGE: Doing resize image pass on', image_name + '...')
 
     if segment:
         ori_width = segment.width
@@ -1132,16 +1392,15 @@ def resize_image(image, width, height, colorspace='Linear', samples=1, margin=0,
     if ori_width == width and ori_height == height:
         return
 
+    book = remember_before_bake()
+
     if segment:
         new_segment = ImageAtlas.get_set_image_atlas_segment(
                     width, height, image.yia.color, image.is_float, yp=yp) #, ypup.image_atlas_size)
         scaled_img = new_segment.id_data
 
-        ori_start_x = segment.width * segment.tile_x
-        ori_start_y = segment.height * segment.tile_y
-
-        start_x = width * new_segment.tile_x
-        start_y = height * new_segment.tile_y
+        ori_start_x, ori_start_y = get_segment_start(segment)
+        start_x, start_y = get_segment_start(new_segment)
     else:
         scaled_img = bpy.data.images.new(name='__TEMP__', 
             width=width, height=height, alpha=True, float_buffer=image.is_float)
@@ -1273,18 +1532,7 @@ def resize_image(image, width, height, colorspace='Linear', samples=1, margin=0,
         bpy.ops.object.bake()
 
         # Copy alpha image to scaled image
-        target_pxs = list(scaled_img.pixels)
-        temp_pxs = list(alpha_img.pixels)
-
-        for y in range(height):
-            temp_offset_y = width * 4 * y
-            offset_y = scaled_img.size[0] * 4 * (y + start_y)
-            for x in range(width):
-                temp_offset_x = 4 * x
-                offset_x = 4 * (x + start_x)
-                target_pxs[offset_y + offset_x + 3] = temp_pxs[temp_offset_y + temp_offset_x]
-
-        scaled_img.pixels = target_pxs
+        image_buffer.inject_alpha(alpha_img, scaled_img, start_x, start_y)
 
         # Remove alpha image
         bpy.data.images.remove(alpha_img)
@@ -0,0 +1,321 @@
+import bpy, os, hashlib, numpy
+from .common import *
+from . import image_buffer
+
+# Properties that only affect UI or store connection state, they don't change bake results
+IGNORED_PROP_PREFIXES = ('expand_', 'show_', 'ori_', 'baked', 'rna_')
+IGNORED_PROPS = {
+        'rna_type', 'name', 'active_edit', 'no_layer_using', 'baked_fingerprint',
+        'active_modifier_index', 'active_mask_index',
+        }
+
+# Node properties that only affect node editor
+IGNORED_NODE_PROPS = {
+        'rna_type', 'location', 'width', 'width_hidden', 'height', 'dimensions', 'select', 'hide', 'label',
+        'color', 'use_custom_color', 'show_options', 'show_preview', 'show_texture', 'parent', 'name',
+        'inputs', 'outputs', 'internal_links', 'bl_idname', 'bl_label', 'bl_description', 'bl_icon',
+        'bl_static_type', 'bl_width_default', 'bl_width_min', 'bl_width_max', 'bl_height_default',
+        'bl_height_min', 'bl_height_max', 'type', 'is_active_output', 'warning_propagation',
+        }
+
+MAX_RNA_DEPTH = 4
+
+def is_ignored_prop(identifier):
+    return identifier in IGNORED_PROPS or identifier.startswith(IGNORED_PROP_PREFIXES)
+
+def hash_value(h, key, val):
+    # Enum flags are sets, sort them so the order is stable across sessions
+    if isinstance(val, set):
+        val = tuple(sorted(val))
+    elif hasattr(val, '__len__') and not isinstance(val, str):
+        val = tuple(val)
+    h.update(repr((key, val)).encode())
+
+def hash_rna(h, struct, ignore_func=is_ignored_prop, depth=0):
+    ''' Hash all properties of RNA struct, nested pointers and collections are hashed recursively '''
+    for prop in struct.bl_rna.properties:
+        pid = prop.identifier
+        if ignore_func(pid): continue
+
+        try: val = getattr(struct, pid)
+        except: continue
+
+        if prop.type == 'POINTER':
+            if val == None: continue
+            if isinstance(val, bpy.types.Image):
+                hash_image(h, val)
+            elif isinstance(val, bpy.types.ID):
+                hash_value(h, pid, val.name)
+            elif depth < MAX_RNA_DEPTH:
+                hash_rna(h, val, ignore_func, depth+1)
+
+        elif prop.type == 'COLLECTION':
+            if depth < MAX_RNA_DEPTH:
+                for item in val:
+                    hash_rna(h, item, ignore_func, depth+1)
+
+        else: hash_value(h, pid, val)
+
+def hash_image(h, image):
+    ''' Hash image data-block identity and its generation state
+        Pixels of image atlas are not hashed here, segments are hashed on their own by get_segment_digests
+    '''
+    hash_value(h, 'image', (image.name, tuple(image.size), image.source, image.filepath,
+        image.is_float, image.colorspace_settings.name))
+
+    # Unsaved changes only live in pixels
+    if image.is_dirty:
+        if not image.yia.is_image_atlas:
+            h.update(memoryview(image_buffer.read_pixels(image)))
+
+    elif image.packed_file:
+        hash_value(h, 'packed', image.packed_file.size)
+
+    elif image.source == 'GENERATED':
+        hash_value(h, 'generated', (image.generated_type, tuple(image.generated_color)))
+
+    elif image.filepath != '':
+        path = bpy.path.abspath(image.filepath)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            hash_value(h, 'file', (stat.st_mtime, stat.st_size))
+
+def is_ignored_node_prop(identifier):
+    return identifier in IGNORED_NODE_PROPS
+
+def hash_node(h, node, visited, skipped_trees=None):
+    hash_value(h, 'node', (node.name, node.bl_idname, node.mute))
+
+    for prop in node.bl_rna.properties:
+        pid = prop.identifier
+        if is_ignored_node_prop(pid): continue
+
+        try: val = getattr(node, pid)
+        except: continue
+
+        if prop.type == 'POINTER':
+            if val == None: continue
+            if isinstance(val, bpy.types.Image):
+                hash_image(h, val)
+            elif isinstance(val, bpy.types.NodeTree):
+                if not skipped_trees or val.name not in skipped_trees:
+                    hash_node_tree(h, val, visited, skipped_trees)
+            elif isinstance(val, bpy.types.ID):
+                hash_value(h, pid, val.name)
+            else:
+                # Color ramp, curve mapping, image user, etc
+                hash_rna(h, val, is_ignored_node_prop, 1)
+
+        elif prop.type != 'COLLECTION':
+            hash_value(h, pid, val)
+
+    for inp in node.inputs:
+        if not inp.is_linked and hasattr(inp, 'default_value'):
+            hash_value(h, inp.identifier, inp.default_value)
+
+def hash_entity_nodes(h, entity, tree, visited, skipped_trees=None):
+    ''' Hash nodes of the tree that are stored by name on the entity, baked nodes are ignored '''
+    for prop in entity.bl_rna.properties:
+        pid = prop.identifier
+        if prop.type != 'STRING' or is_ignored_prop(pid): continue
+        val = getattr(entity, pid)
+        if val == '': continue
+        node = tree.nodes.get(val)
+        if node: hash_node(h, node, visited, skipped_trees)
+
+def hash_node_tree(h, tree, visited, skipped_trees=None):
+    if tree.name in visited: return
+    visited.add(tree.name)
+
+    hash_value(h, 'tree', tree.name)
+
+    for node in tree.nodes:
+        hash_node(h, node, visited, skipped_trees)
+
+    for link in tree.links:
+        hash_value(h, 'link', (link.from_node.name, link.from_socket.identifier,
+            link.to_node.name, link.to_socket.identifier, link.is_muted if hasattr(link, 'is_muted') else False))
+
+def hash_mesh(h, obj, uv_names=None):
+    ''' Hash mesh inputs of bake: topology, vertex positions, uv and vertex colors '''
+    mesh = obj.data
+
+    hash_value(h, 'mesh', (mesh.name, len(mesh.vertices), len(mesh.loops), len(mesh.polygons)))
+    hash_value(h, 'matrix', [tuple(r) for r in obj.matrix_world])
+
+    arr = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+    mesh.vertices.foreach_get('co', arr)
+    h.update(memoryview(arr))
+
+    arr = numpy.empty(len(mesh.loops), dtype=numpy.int32)
+    mesh.loops.foreach_get('vertex_index', arr)
+    h.update(memoryview(arr))
+
+    arr = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+    mesh.polygons.foreach_get('loop_total', arr)
+    h.update(memoryview(arr))
+
+    arr = numpy.empty(len(mesh.loops) * 2, dtype=numpy.float32)
+    for uv in get_uv_layers(obj):
+        if uv_names != None and uv.name not in uv_names: continue
+        hash_value(h, 'uv', uv.name)
+        uv.data.foreach_get('uv', arr)
+        h.update(memoryview(arr))
+
+    for vcol in get_vertex_colors(obj):
+        if vcol.name.startswith(TANGENT_SIGN_PREFIX): continue
+        hash_value(h, 'vcol', vcol.name)
+        col = numpy.empty(len(vcol.data) * 4, dtype=numpy.float32)
+        vcol.data.foreach_get('color', col)
+        h.update(memoryview(col))
+
+    for mod in obj.modifiers:
+        hash_modifier(h, mod)
+
+def hash_modifier(h, mod):
+    hash_value(h, 'modifier', (mod.name, mod.type, mod.show_render))
+    hash_rna(h, mod)
+
+    # Objects and textures used by modifier can change the result without changing the modifier
+    for prop in mod.bl_rna.properties:
+        if prop.type != 'POINTER': continue
+        val = getattr(mod, prop.identifier, None)
+        if isinstance(val, bpy.types.Object):
+            hash_value(h, prop.identifier + '_matrix', [tuple(r) for r in val.matrix_world])
+        elif isinstance(val, bpy.types.Texture):
+            hash_rna(h, val, depth=1)
+
+def hash_object_materials(h, obj):
+    ''' Hash materials of the object and their node trees, used for objects that are baked as the source '''
+    for slot in obj.material_slots:
+        mat = slot.material
+        if not mat: continue
+        hash_value(h, 'material', (slot.link, mat.name, mat.use_nodes))
+        if mat.use_nodes and mat.node_tree:
+            # Material node trees are embedded and can share the same name, so they're not tracked by visited set
+            hash_node_tree(h, mat.node_tree, set())
+        else: hash_rna(h, mat, depth=MAX_RNA_DEPTH - 1)
+
+def is_mesh_hashable(obj):
+    ''' Multires sculpt data can't be read from python, so objects using it can't be fingerprinted '''
+    return not any([m.type == 'MULTIRES' for m in obj.modifiers])
+
+def get_layer_tree_names(yp):
+    names = set()
+    for layer in yp.layers:
+        tree = get_tree(layer)
+        if tree: names.add(tree.name)
+    return names
+
+def get_segment_digests(yp):
+    ''' Digest of every image atlas segment used by layers and masks, {(image name, segment name) : digest}
+        Pixels of dirty atlas can't be read partially, so every atlas is only read once for all of its segments
+    '''
+    segments = {}
+    for layer in yp.layers:
+        entities = [layer] + [m for m in layer.masks]
+        for entity in entities:
+            if entity.segment_name == '': continue
+            source = get_layer_source(layer) if entity == layer else get_mask_source(entity)
+            if not source or not hasattr(source, 'image') or not source.image: continue
+            image = source.image
+            if not image.yia.is_image_atlas: continue
+            segment = image.yia.segments.get(entity.segment_name)
+            if segment: segments.setdefault(image.name, (image, []))[1].append(segment)
+
+    digests = {}
+    for image, image_segments in segments.values():
+
+        # Saved atlas can only be fingerprinted as a whole
+        ih = hashlib.sha1()
+        hash_image(ih, image)
+        image_digest = ih.hexdigest()
+
+        pxs = image_buffer.read_pixels(image) if image.is_dirty else None
+
+        for segment in image_segments:
+            h = hashlib.sha1()
+            rect = get_segment_rect(segment)
+            hash_value(h, 'segment', rect)
+            if pxs is not None:
+                h.update(memoryview(numpy.ascontiguousarray(image_buffer.get_rect_view(pxs, *rect))))
+            else: hash_value(h, 'image', image_digest)
+            digests[(image.name, segment.name)] = h.hexdigest()
+
+        pxs = None
+
+    return digests
+
+def hash_entity_segment(h, entity, source, segment_digests):
+    if entity.segment_name == '' or not source or not hasattr(source, 'image') or not source.image: return
+    digest = segment_digests.get((source.image.name, entity.segment_name))
+    if digest: hash_value(h, 'segment', digest)
+
+def get_mesh_digest(objs):
+    ''' Digest of mesh inputs of all objects, returns empty string if any of them can't be fingerprinted '''
+    if not all([is_mesh_hashable(o) for o in objs]): return ''
+
+    h = hashlib.sha1()
+    for obj in objs:
+        hash_mesh(h, obj)
+
+    return h.hexdigest()
+
+def get_channel_fingerprint(node, root_ch, objs=None, settings=None, mesh_digest=None, segment_digests=None):
+    ''' Fingerprint of everything that affects bake result of a channel
+        It covers root channel, layers using the channel, their masks, modifiers, and nodes,
+        image states, mesh inputs and bake settings
+        Mesh and segment digests are the same for every channel, so they can be calculated once and passed when baking many channels
+        Returns empty string if the result can't be fingerprinted
+    '''
+    if mesh_digest == None:
+        mesh_digest = get_mesh_digest(objs if objs else [])
+    if mesh_digest == '': return ''
+
+    if segment_digests == None:
+        segment_digests = get_segment_digests(node.node_tree.yp)
+
+    tree = node.node_tree
+    yp = tree.yp
+    ch_idx = get_channel_index(root_ch)
+    h = hashlib.sha1()
+
+    hash_value(h, 'settings', sorted(settings.items()) if settings else [])
+
+    # Root channel and its input value
+    hash_rna(h, root_ch)
+    inp = node.inputs.get(root_ch.name)
+    if inp and hasattr(inp, 'default_value'):
+        hash_value(h, 'input', inp.default_value)
+
+    layer_trees = get_layer_tree_names(yp)
+    visited = set()
+
+    # Root channel nodes and its modifier nodes are on the main tree
+    hash_entity_nodes(h, root_ch, tree, visited, layer_trees)
+    for mod in root_ch.modifiers:
+        hash_value(h, 'modifier', mod.name)
+        hash_rna(h, mod)
+        hash_entity_nodes(h, mod, tree, visited, layer_trees)
+
+    for layer in yp.layers:
+
+        # Group layers can affect its children, so always include them
+        if layer.type != 'GROUP' and not layer.channels[ch_idx].enable: continue
+
+        hash_value(h, 'layer', layer.name)
+        hash_rna(h, layer)
+
+        layer_tree = get_tree(layer)
+        if layer_tree:
+            # Layer tree of other layers are hashed on their own
+            hash_node_tree(h, layer_tree, visited, layer_trees - {layer_tree.name})
+
+        # Images on image atlas only need their segments
+        hash_entity_segment(h, layer, get_layer_source(layer), segment_digests)
+        for mask in layer.masks:
+            hash_entity_segment(h, mask, get_mask_source(mask), segment_digests)
+
+    hash_value(h, 'meshes', mesh_digest)
+
+    return h.hexdigest()
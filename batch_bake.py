@@ -0,0 +1,296 @@
+''' Batch bake for running without UI, for example:
+
+    blender --background --python path/to/addon/batch_bake_cli.py -- job.json
+
+    Job spec example:
+    {
+        "jobs" : [
+            {
+                "file" : "/path/to/file.blend",
+                "width" : 2048, "height" : 2048, "samples" : 1, "margin" : 5,
+                "output_dir" : "/path/to/textures",
+                "filename" : "{material}_{channel}",
+                "format" : "PNG",
+                "materials" : [
+                    { "material" : "Material", "channels" : ["Color", "Roughness"] }
+                ]
+            }
+        ]
+    }
+
+    Settings can be set on the job or overridden per material.
+'''
+
+import bpy, os, sys, time, json
+from .common import *
+from .bake_common import baked_image_props, baked_image_suffixes
+
+REPORT_PREFIX = 'YP_BATCH_REPORT: '
+
+# Bake settings that are passed to bake channels operator and their default values
+bake_setting_defaults = {
+        'width' : 1024,
+        'height' : 1024,
+        'samples' : 1,
+        'margin' : 5,
+        'aa_level' : 1,
+        'fxaa' : True,
+        'fxaa_method' : 'NUMPY',
+        'force_use_cpu' : True,
+        'force_bake_all_polygons' : False,
+        'use_packed_bake' : True,
+        'use_tiled_bake' : True,
+        'tile_size' : 4096,
+        'only_stale' : False,
+        }
+
+# File format and its extension
+image_formats = {
+        'PNG' : ('PNG', '.png'),
+        'OPEN_EXR' : ('OPEN_EXR', '.exr'),
+        'EXR' : ('OPEN_EXR', '.exr'),
+        'TIFF' : ('TIFF', '.tif'),
+        'TARGA' : ('TARGA', '.tga'),
+        'JPEG' : ('JPEG', '.jpg'),
+        }
+
+class BatchBakeError(Exception):
+    pass
+
+def get_setting(name, *specs, default=None):
+    ''' Get setting from the most specific spec '''
+    for spec in specs:
+        if name in spec: return spec[name]
+    return default
+
+def get_ypaint_nodes(mat):
+    if not mat or not mat.node_tree: return []
+    return [n for n in mat.node_tree.nodes if n.type == 'GROUP' and n.node_tree and n.node_tree.yp.is_ypaint_node]
+
+def get_material_object(mat, obj_name=''):
+    ''' Get object to bake the material without relying on active object '''
+    if obj_name != '':
+        obj = bpy.data.objects.get(obj_name)
+        if not obj or obj.type != 'MESH':
+            raise BatchBakeError('Object ' + obj_name + ' is not found!')
+        return obj
+
+    for obj in get_scene_objects():
+        if obj.type != 'MESH' or obj.hide_render: continue
+        if len(get_uv_layers(obj)) == 0: continue
+        if mat.name in [m.name for m in obj.data.materials if m]:
+            return obj
+
+    raise BatchBakeError('No object is using material ' + mat.name + '!')
+
+def set_bake_context(obj, mat, node):
+    ''' Make object, material and node active so the bake operators can find them '''
+    if is_greater_than_280():
+        bpy.context.view_layer.objects.active = obj
+        if obj.hide_viewport: obj.hide_viewport = False
+    else: bpy.context.scene.objects.active = obj
+
+    if obj.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+    for i, m in enumerate(obj.data.materials):
+        if m == mat:
+            obj.active_material_index = i
+            break
+
+    mat.node_tree.nodes.active = node
+
+def get_bake_uv(obj, yp, uv_map=''):
+    uv_layers = get_uv_layers(obj)
+    if uv_map != '':
+        if not uv_layers.get(uv_map):
+            raise BatchBakeError('UV Map ' + uv_map + ' is not found!')
+        return uv_map
+
+    if yp.baked_uv_name != '' and uv_layers.get(yp.baked_uv_name):
+        return yp.baked_uv_name
+
+    for uv in uv_layers:
+        if not uv.name.startswith(TEMP_UV):
+            return uv.name
+
+    raise BatchBakeError('No UV Map found on ' + obj.name + '!')
+
+def get_output_path(output_dir, filename, ext, **names):
+    name = filename.format(**names)
+    name = bpy.path.clean_name(name)
+    return os.path.join(bpy.path.abspath(output_dir), name + ext)
+
+def write_image(image, path, file_format='AUTO'):
+    ''' Save image to path without changing its original filepath and format '''
+    if file_format == 'AUTO':
+        file_format = 'OPEN_EXR' if image.is_float else 'PNG'
+
+    ori_filepath = image.filepath_raw
+    ori_format = image.file_format
+
+    image.filepath_raw = path
+    image.file_format = file_format
+    image.save()
+
+    image.filepath_raw = ori_filepath
+    image.file_format = ori_format
+
+def bake_material(mat_spec, job_spec):
+    ''' Bake and write the channels of a single material, returns report of the material '''
+    report = {'material' : mat_spec.get('material', ''), 'status' : 'OK', 'timings' : {}, 'outputs' : []}
+    timings = report['timings']
+
+    mat = bpy.data.materials.get(report['material'])
+    if not mat:
+        raise BatchBakeError('Material ' + report['material'] + ' is not found!')
+
+    nodes = get_ypaint_nodes(mat)
+    node_name = mat_spec.get('node', '')
+    if node_name != '':
+        nodes = [n for n in nodes if n.name == node_name]
+    if not nodes:
+        raise BatchBakeError('No ' + get_addon_title() + ' node found on material ' + mat.name + '!')
+
+    node = nodes[0]
+    tree = node.node_tree
+    yp = tree.yp
+    report['node'] = node.name
+
+    obj = get_material_object(mat, get_setting('object', mat_spec, job_spec, default=''))
+    set_bake_context(obj, mat, node)
+
+    # Bake
+    T = time.time()
+    props = {}
+    for name, default in bake_setting_defaults.items():
+        props[name] = get_setting(name, mat_spec, job_spec, default=default)
+    props['uv_map'] = get_bake_uv(obj, yp, get_setting('uv_map', mat_spec, job_spec, default=''))
+
+    # Only bake listed channels
+    channel_names = get_setting('channels', mat_spec, job_spec, default=[])
+    props['only_channels'] = [{'name' : n} for n in channel_names]
+
+    result = bpy.ops.node.y_bake_channels('EXEC_DEFAULT', **props)
+    if 'FINISHED' not in result:
+        raise BatchBakeError('Baking ' + mat.name + ' is failed!')
+    timings['bake'] = time.time() - T
+
+    # Write images
+    T = time.time()
+    output_dir = get_setting('output_dir', mat_spec, job_spec, default='//')
+    filename = get_setting('filename', mat_spec, job_spec, default='{material}_{channel}')
+    file_format, ext = image_formats.get(get_setting('format', mat_spec, job_spec, default='PNG'), ('AUTO', ''))
+
+    for ch in yp.channels:
+        if channel_names and ch.name not in channel_names: continue
+
+        for prop in baked_image_props:
+            baked = tree.nodes.get(getattr(ch, prop))
+            if not baked or not baked.image: continue
+
+            image = baked.image
+            if file_format == 'AUTO':
+                ext = '.exr' if image.is_float else '.png'
+            path = get_output_path(output_dir, filename, ext, material=mat.name, node=node.name,
+                    channel=ch.name + baked_image_suffixes[prop])
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_image(image, path, file_format)
+
+            report['outputs'].append({
+                'channel' : ch.name,
+                'output' : prop,
+                'path' : path,
+                'width' : image.size[0],
+                'height' : image.size[1],
+                })
+
+    missing = [n for n in channel_names if n not in [ch.name for ch in yp.channels]]
+    if missing:
+        report['status'] = 'WARNING'
+        report['error'] = 'Channel(s) not found: ' + ', '.join(missing)
+
+    timings['write'] = time.time() - T
+
+    return report
+
+def remap_images(image_remaps):
+    ''' Replace images with the ones saved on different paths, used for images with unsaved changes '''
+    for name, path in image_remaps.items():
+        image = bpy.data.images.get(name)
+        if not image: continue
+
+        image.name = '____TEMP'
+        new_image = bpy.data.images.load(path, check_existing=False)
+        new_image.colorspace_settings.name = image.colorspace_settings.name
+        new_image.name = name
+
+        image.user_remap(new_image)
+        bpy.data.images.remove(image)
+
+def run_job(job_spec):
+    report = {'file' : job_spec.get('file', ''), 'status' : 'OK', 'timings' : {}, 'materials' : []}
+
+    T = time.time()
+    if report['file'] != '':
+        bpy.ops.wm.open_mainfile(filepath=bpy.path.abspath(report['file']))
+    remap_images(job_spec.get('image_remaps', {}))
+    report['timings']['open'] = time.time() - T
+
+    for mat_spec in job_spec.get('materials', []):
+        try: mat_report = bake_material(mat_spec, job_spec)
+        except Exception as e:
+            mat_report = {'material' : mat_spec.get('material', ''), 'status' : 'ERROR', 'error' : str(e)}
+        print('INFO: Batch bake of material', mat_report['material'], 'is done with status', mat_report['status'])
+        report['materials'].append(mat_report)
+        if mat_report['status'] == 'ERROR':
+            report['status'] = 'ERROR'
+
+    if job_spec.get('save_file', False):
+        T = time.time()
+        bpy.ops.wm.save_mainfile()
+        report['timings']['save'] = time.time() - T
+
+    return report
+
+def run_jobs(spec):
+    ''' Run all jobs of job spec, returns report dictionary '''
+    T = time.time()
+    report = {'status' : 'OK', 'jobs' : []}
+
+    jobs = spec.get('jobs', [spec] if 'materials' in spec else [])
+    for job_spec in jobs:
+        try: job_report = run_job(job_spec)
+        except Exception as e:
+            job_report = {'file' : job_spec.get('file', ''), 'status' : 'ERROR', 'error' : str(e)}
+        report['jobs'].append(job_report)
+        if job_report['status'] == 'ERROR':
+            report['status'] = 'ERROR'
+
+    report['total_time'] = time.time() - T
+
+    return report
+
+def main(argv=None):
+    ''' Run batch bake using job spec path from command line arguments after '--' '''
+    if argv == None:
+        argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+
+    if not argv:
+        print('ERROR: Job spec path is needed, usage: blender --background --python batch_bake_cli.py -- job.json [report.json]')
+        return None
+
+    with open(argv[0]) as f:
+        spec = json.load(f)
+
+    report = run_jobs(spec)
+
+    # Machine readable report is printed on a single line
+    print(REPORT_PREFIX + json.dumps(report))
+
+    if len(argv) > 1:
+        with open(argv[1], 'w') as f:
+            json.dump(report, f, indent=4)
+
+    return report
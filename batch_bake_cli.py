@@ -0,0 +1,38 @@
+''' Command line entry point of batch bake, run it using:
+
+    blender --background --python path/to/addon/batch_bake_cli.py -- job.json [report.json]
+
+    This file is run as plain script, so it finds the addon package first then calls batch_bake.main()
+'''
+
+import bpy, os, sys, addon_utils
+
+def get_addon_module():
+    addon_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Addon can be installed using different module name, so search loaded modules first
+    for mod in list(sys.modules.values()):
+        path = getattr(mod, '__file__', None)
+        if not path or os.path.basename(path) != '__init__.py': continue
+        if os.path.dirname(os.path.abspath(path)) == addon_dir:
+            return mod
+
+    # Addon is not enabled yet
+    module_name = os.path.basename(addon_dir)
+    parent_dir = os.path.dirname(addon_dir)
+    if parent_dir not in sys.path:
+        sys.path.append(parent_dir)
+
+    # Enable it so the addon preferences are available
+    return addon_utils.enable(module_name, default_set=True)
+
+if __name__ == '__main__':
+    addon = get_addon_module()
+    if not addon:
+        print('ERROR: Cannot enable the addon!')
+        sys.exit(1)
+
+    report = addon.batch_bake.main()
+
+    if not report or report['status'] == 'ERROR':
+        sys.exit(1)
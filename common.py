@@ -195,6 +195,18 @@ bake_type_items = (
         ('SELECTED_VERTICES', 'Selected Vertices/Edges/Faces', ''),
         )
 
+fxaa_method_items = (
+        ('NUMPY', 'CPU', 'Run FXAA directly on image pixels (faster, works with float images)'),
+        ('CYCLES', 'Cycles', "Run FXAA using Cycles bake (doesn't work with float images)"),
+        )
+
+resize_method_items = (
+        ('LANCZOS', 'Lanczos', 'Resample image pixels using Lanczos filter (sharpest)'),
+        ('BILINEAR', 'Bilinear', 'Resample image pixels using bilinear filter'),
+        ('BOX', 'Box', 'Resample image pixels using box filter'),
+        ('CYCLES', 'Cycles', 'Resize image using Cycles bake (slow)'),
+        )
+
 channel_override_labels = {
         'DEFAULT' : 'Default',
         'IMAGE' : 'Image',
@@ -419,6 +431,11 @@ def is_greater_than_320():
         return True
     return False
 
+def is_greater_than_330():
+    if bpy.app.version >= (3, 3, 0):
+        return True
+    return False
+
 def is_created_using_279():
     if bpy.data.version[:2] == (2, 79):
         return True
@@ -824,7 +841,114 @@ def get_active_node():
 
 # Specific methods for this addon
 
+class ActiveNodeLookups():
+    ''' Memo of the last active yp node lookup, valid while its key and generation are unchanged '''
+
+    # Increased by depsgraph updates, file load and undo
+    generation = 0
+
+    # (object, material, material node tree, active node pointers, number of nodes, generation)
+    key = None
+    node = None
+
+    # Number of lookups and lookups that are not cached since last report, used by developer mode
+    num_calls = 0
+    num_misses = 0
+
+def invalidate_active_ypaint_node():
+    ActiveNodeLookups.generation += 1
+    ActiveNodeLookups.key = None
+    ActiveNodeLookups.node = None
+
+class LayerRows():
+    ''' Cached rows of a layer list, valid while layer generation and row generation are unchanged '''
+
+    # Increased when node trees or images are updated, so every cached row is rebuilt
+    generation = 0
+
+    # {tree name : LayerRows}
+    trees = {}
+
+    def __init__(self, layer_generation):
+        self.layer_generation = layer_generation
+        self.row_generation = LayerRows.generation
+
+        # {layer index : LayerRow}
+        self.rows = {}
+
+def invalidate_layer_rows():
+    LayerRows.generation += 1
+
+# Data collections to check updated data-blocks when there's no depsgraph (Blender 2.79)
+def get_id_type_collection(id_type):
+    if id_type == 'OBJECT': return bpy.data.objects
+    if id_type == 'MATERIAL': return bpy.data.materials
+    if id_type == 'NODETREE': return bpy.data.node_groups
+    if id_type == 'IMAGE': return bpy.data.images
+    return None
+
+def is_id_type_updated(depsgraph, id_type):
+    if depsgraph: return depsgraph.id_type_updated(id_type)
+    return getattr(get_id_type_collection(id_type), 'is_updated', True)
+
+def invalidate_ui_caches(depsgraph=None):
+    ''' Invalidate cached active node and layer list rows only if data-blocks they're using are updated '''
+
+    # Active material and active node are stored on object, material and its node tree
+    if (is_id_type_updated(depsgraph, 'OBJECT') or is_id_type_updated(depsgraph, 'MATERIAL') or 
+        is_id_type_updated(depsgraph, 'NODETREE')):
+        invalidate_active_ypaint_node()
+
+    # Overrides, masks, active edits and images are stored on the tree or image datablocks
+    if is_id_type_updated(depsgraph, 'NODETREE') or is_id_type_updated(depsgraph, 'IMAGE'):
+        invalidate_layer_rows()
+
+def report_active_node_lookups():
+    ''' Print number of lookups since last report, returns them as (calls, misses) '''
+    calls = ActiveNodeLookups.num_calls
+    misses = ActiveNodeLookups.num_misses
+    ActiveNodeLookups.num_calls = 0
+    ActiveNodeLookups.num_misses = 0
+
+    if calls > 0:
+        print('INFO: Active', get_addon_title(), 'node is looked up', calls, 'times,', misses, 'of them without cache')
+
+    return calls, misses
+
 def get_active_ypaint_node():
+    ActiveNodeLookups.num_calls += 1
+
+    # Material can be changed without depsgraph update, so only cache lookup with existing material
+    mat = get_active_material()
+    if not mat or not mat.node_tree: 
+        ActiveNodeLookups.num_misses += 1
+        return find_active_ypaint_node()
+
+    obj = bpy.context.object if hasattr(bpy.context, 'object') else None
+    nodes = mat.node_tree.nodes
+    active = nodes.active
+
+    key = (
+            obj.as_pointer() if obj else 0, 
+            mat.as_pointer(), 
+            mat.node_tree.as_pointer(), 
+            active.as_pointer() if active else 0, 
+            len(nodes), 
+            ActiveNodeLookups.generation
+            )
+
+    if ActiveNodeLookups.key == key:
+        return ActiveNodeLookups.node
+
+    ActiveNodeLookups.num_misses += 1
+    node = find_active_ypaint_node()
+
+    ActiveNodeLookups.key = key
+    ActiveNodeLookups.node = node
+
+    return node
+
+def find_active_ypaint_node():
     ypui = bpy.context.window_manager.ypui
 
     # Get material UI prop
@@ -1105,6 +1229,16 @@ def get_entities_with_specific_image(yp, image):
 
     return entities
 
+def get_segment_start(segment):
+    # Segments from older version only store tile position
+    if segment.start_x < 0 or segment.start_y < 0:
+        return segment.width * segment.tile_x, segment.height * segment.tile_y
+    return segment.start_x, segment.start_y
+
+def get_segment_rect(segment):
+    start_x, start_y = get_segment_start(segment)
+    return start_x, start_y, segment.width, segment.height
+
 def get_layer_ids_with_specific_segment(yp, segment):
 
     ids = []
@@ -1564,11 +1698,11 @@ def get_mod_tree(entity):
 
     yp = entity.id_data.yp
 
-    m = re.match(r'^yp\.channels\[(\d+)\].*', entity.path_from_id())
+    m = re.match(r'^yp\.channels\[(\d+)\].*', get_entity_path(entity))
     if m:
         return entity.id_data
 
-    m = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\].*', entity.path_from_id())
+    m = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\].*', get_entity_path(entity))
     if m:
         layer = yp.layers[int(m.group(1))]
         ch = layer.channels[int(m.group(2))]
@@ -1580,7 +1714,7 @@ def get_mod_tree(entity):
 
         return tree
 
-    m = re.match(r'^yp\.layers\[(\d+)\].*', entity.path_from_id())
+    m = re.match(r'^yp\.layers\[(\d+)\].*', get_entity_path(entity))
     if m:
         layer = yp.layers[int(m.group(1))]
         tree = get_tree(layer)
@@ -1597,11 +1731,11 @@ def get_mod_tree(entity):
 
 def get_mask_tree(mask, ignore_group=False):
 
-    m = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', mask.path_from_id())
-    if not m : return None
+    addr = get_entity_address(mask)
+    if not addr : return None
 
     yp = mask.id_data.yp
-    layer = yp.layers[int(m.group(1))]
+    layer = yp.layers[addr.layer_idx]
     layer_tree = get_tree(layer)
 
     if ignore_group:
@@ -1628,9 +1762,9 @@ def get_channel_source_tree(ch, layer=None, tree=None):
     yp = ch.id_data.yp
 
     if not layer:
-        m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', ch.path_from_id())
-        if not m : return None
-        layer = yp.layers[int(m.group(1))]
+        addr = get_entity_address(ch)
+        if not addr : return None
+        layer = yp.layers[addr.layer_idx]
 
     if not tree: tree = get_tree(layer)
     if not tree: return None
@@ -1658,9 +1792,9 @@ def get_channel_source(ch, layer=None, tree=None):
 def get_channel_source_1(ch, layer=None, tree=None):
     yp = ch.id_data.yp
     if not layer:
-        m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', ch.path_from_id())
-        if not m : return None
-        layer = yp.layers[int(m.group(1))]
+        addr = get_entity_address(ch)
+        if not addr : return None
+        layer = yp.layers[addr.layer_idx]
 
     if not tree: tree = get_tree(layer)
     if tree: return tree.nodes.get(ch.source_1)
@@ -1697,8 +1831,8 @@ def get_layer_mapping(layer):
 
 def get_entity_source(entity):
 
-    m1 = re.match(r'^yp\.layers\[(\d+)\]$', entity.path_from_id())
-    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', entity.path_from_id())
+    m1 = re.match(r'^yp\.layers\[(\d+)\]$', get_entity_path(entity))
+    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', get_entity_path(entity))
 
     if m1: return get_layer_source(entity)
     elif m2: return get_mask_source(entity)
@@ -1707,8 +1841,8 @@ def get_entity_source(entity):
 
 def get_entity_mapping(entity):
 
-    m1 = re.match(r'^yp\.layers\[(\d+)\]$', entity.path_from_id())
-    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', entity.path_from_id())
+    m1 = re.match(r'^yp\.layers\[(\d+)\]$', get_entity_path(entity))
+    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', get_entity_path(entity))
 
     if m1: return get_layer_mapping(entity)
     elif m2: return get_mask_mapping(entity)
@@ -1801,8 +1935,8 @@ def change_layer_name(yp, obj, src, layer, texes):
         layer.name = get_unique_name(name, texes) 
 
     # Update node group label
-    m1 = re.match(r'^yp\.layers\[(\d+)\]$', layer.path_from_id())
-    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', layer.path_from_id())
+    m1 = re.match(r'^yp\.layers\[(\d+)\]$', get_entity_path(layer))
+    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', get_entity_path(layer))
     if m1:
         group_tree = yp.id_data
         layer_group = group_tree.nodes.get(layer.group_node)
@@ -1918,46 +2052,262 @@ def fix_io_index(item, items, correct_index):
     if cur_index and cur_index[0] != correct_index:
         items.move(cur_index[0], correct_index)
 
-def get_layer_depth(layer):
+class LayerHierarchy():
+    ''' Parent and children relations of yp layers, built in a single pass over the layers
+        Only indices and names are stored since layer references can be invalid after the collection is changed
+    '''
+    def __init__(self, yp, generation):
+        self.generation = generation
+        self.num_layers = len(yp.layers)
 
-    yp = layer.id_data.yp
+        self.index_by_pointer = {}
+        self.index_by_name = {}
+        self.parent_ids = []
 
-    upmost_found = False
-    depth = 0
-    cur = layer
-    parent = layer
+        # Group parents of every layer, nearest parent first
+        self.group_parent_ids = []
 
-    while True:
-        if cur.parent_idx != -1:
+        self.depths = []
+        self.hidden = []
+        self.direct_child_ids = {}
+
+        # Childs of every group from all depths
+        self.all_child_ids = {}
+
+        # Last index of every group subtree
+        self.last_child_ids = {}
+
+        # Last member index of every parent index
+        self.last_member_ids = {}
+
+        types = []
+        enables = []
 
-            try: layer = yp.layers[cur.parent_idx]
-            except: break
+        for i, layer in enumerate(yp.layers):
+            self.index_by_pointer[layer.as_pointer()] = i
+            if layer.name not in self.index_by_name:
+                self.index_by_name[layer.name] = i
+
+            pid = layer.parent_idx
+            self.parent_ids.append(pid)
+            types.append(layer.type)
+            enables.append(layer.enable)
 
             if layer.type == 'GROUP':
-                parent = layer
-                depth += 1
+                self.direct_child_ids[i] = []
+                self.all_child_ids[i] = []
+                self.last_child_ids[i] = i
+
+            if pid != -1:
+                self.last_member_ids[pid] = i
+
+        all_parent_ids = []
+
+        for i, pid in enumerate(self.parent_ids):
+
+            # Follow parent chain while the parents are groups
+            group_parents = []
+            hidden = False
+            cur = i
+            while True:
+                p = self.parent_ids[cur]
+                if p < 0 or p >= self.num_layers or types[p] != 'GROUP' or p in group_parents: break
+                group_parents.append(p)
+                if not enables[p]: hidden = True
+                cur = p
+
+            self.group_parent_ids.append(group_parents)
+            self.depths.append(len(group_parents))
+            self.hidden.append(hidden)
+
+            for p in group_parents:
+                if i > p: self.last_child_ids[p] = i
+
+            if pid in self.direct_child_ids:
+                self.direct_child_ids[pid].append(i)
+
+            # Childs are collected from top to bottom, so only parents above the layer can chain further up
+            if 0 <= pid < i:
+                ancestors = [pid] + all_parent_ids[pid]
+            elif pid != -1:
+                ancestors = [pid]
+            else: ancestors = []
+            all_parent_ids.append(ancestors)
+
+            for p in ancestors:
+                if p in self.all_child_ids:
+                    self.all_child_ids[p].append(i)
+
+# Generation of every yp layers, increased when layers are added, moved, removed or reparented
+_layer_generations = {}
+
+# Cached layer hierarchy of every yp, {tree name : LayerHierarchy}
+_layer_hierarchies = {}
+
+def get_layer_generation(yp):
+    return _layer_generations.get(yp.id_data.name, 0)
+
+def bump_layer_generation(yp):
+    name = yp.id_data.name
+    _layer_generations[name] = _layer_generations.get(name, 0) + 1
+
+def get_layer_hierarchy(yp):
+    name = yp.id_data.name
+    generation = _layer_generations.get(name, 0)
+
+    hierarchy = _layer_hierarchies.get(name)
+    if not hierarchy or hierarchy.generation != generation or hierarchy.num_layers != len(yp.layers):
+        hierarchy = _layer_hierarchies[name] = LayerHierarchy(yp, generation)
+
+    return hierarchy
+
+@persistent
+def clear_layer_hierarchies(scene):
+    # Undo and file load can change layers without any update
+    _layer_hierarchies.clear()
+    _entity_addresses.clear()
+    invalidate_active_ypaint_node()
+
+    # Generations are increased instead of reset so other caches using them are also invalidated
+    names = set(_layer_generations)
+    names.update(ng.name for ng in bpy.data.node_groups)
+    for name in names:
+        _layer_generations[name] = _layer_generations.get(name, 0) + 1
+
+class EntityAddress():
+    ''' Location of layer, mask, channel or modifier inside its yp tree, unused indices are -1
+        kind can be CHANNEL, CHANNEL_MODIFIER, LAYER, LAYER_MODIFIER, LAYER_CHANNEL,
+        LAYER_CHANNEL_MODIFIER, LAYER_CHANNEL_MODIFIER_1, MASK, MASK_CHANNEL or MASK_MODIFIER
+    '''
+    def __init__(self, kind, path, layer_idx=-1, ch_idx=-1, mask_idx=-1, mod_idx=-1):
+        self.kind = kind
+
+        # Same as path_from_id() of the entity
+        self.path = path
+
+        self.layer_idx = layer_idx
+        self.ch_idx = ch_idx
+        self.mask_idx = mask_idx
+        self.mod_idx = mod_idx
+
+class EntityAddresses():
+    ''' Addresses of every entity of a yp tree, {entity pointer : EntityAddress} '''
+    def __init__(self, yp, generation):
+        self.generation = generation
+        self.addresses = {}
+
+        for i, ch in enumerate(yp.channels):
+            path = 'yp.channels[' + str(i) + ']'
+            self.add(ch, 'CHANNEL', path, ch_idx=i)
+            self.add_modifiers(ch.modifiers, 'CHANNEL_MODIFIER', path, ch_idx=i)
+
+        for i, layer in enumerate(yp.layers):
+            layer_path = 'yp.layers[' + str(i) + ']'
+            self.add(layer, 'LAYER', layer_path, layer_idx=i)
+            self.add_modifiers(layer.modifiers, 'LAYER_MODIFIER', layer_path, layer_idx=i)
+
+            for j, ch in enumerate(layer.channels):
+                path = layer_path + '.channels[' + str(j) + ']'
+                self.add(ch, 'LAYER_CHANNEL', path, layer_idx=i, ch_idx=j)
+                self.add_modifiers(ch.modifiers, 'LAYER_CHANNEL_MODIFIER', path, layer_idx=i, ch_idx=j)
+                self.add_modifiers(ch.modifiers_1, 'LAYER_CHANNEL_MODIFIER_1', path, layer_idx=i, ch_idx=j, attr='modifiers_1')
+
+            for j, mask in enumerate(layer.masks):
+                mask_path = layer_path + '.masks[' + str(j) + ']'
+                self.add(mask, 'MASK', mask_path, layer_idx=i, mask_idx=j)
+                self.add_modifiers(mask.modifiers, 'MASK_MODIFIER', mask_path, layer_idx=i, mask_idx=j)
+
+                for k, ch in enumerate(mask.channels):
+                    path = mask_path + '.channels[' + str(k) + ']'
+                    self.add(ch, 'MASK_CHANNEL', path, layer_idx=i, ch_idx=k, mask_idx=j)
+
+    def add(self, entity, kind, path, **indices):
+        self.addresses[entity.as_pointer()] = EntityAddress(kind, path, **indices)
+
+    def add_modifiers(self, modifiers, kind, parent_path, attr='modifiers', **indices):
+        for i, mod in enumerate(modifiers):
+            self.add(mod, kind, parent_path + '.' + attr + '[' + str(i) + ']', mod_idx=i, **indices)
+
+def get_entity_by_address(yp, addr):
+    ''' Returns entity at the address, or None if the address no longer exists '''
+    try:
+        if addr.kind.startswith('CHANNEL'):
+            entity = yp.channels[addr.ch_idx]
+            if addr.kind == 'CHANNEL_MODIFIER': entity = entity.modifiers[addr.mod_idx]
+            return entity
 
-        if parent == cur:
-            break
+        entity = yp.layers[addr.layer_idx]
+
+        if addr.kind.startswith('MASK'):
+            entity = entity.masks[addr.mask_idx]
+            if addr.kind == 'MASK_CHANNEL': entity = entity.channels[addr.ch_idx]
+            elif addr.kind == 'MASK_MODIFIER': entity = entity.modifiers[addr.mod_idx]
+            return entity
+
+        if addr.kind == 'LAYER_MODIFIER': return entity.modifiers[addr.mod_idx]
+
+        if addr.kind.startswith('LAYER_CHANNEL'):
+            entity = entity.channels[addr.ch_idx]
+            if addr.kind == 'LAYER_CHANNEL_MODIFIER': entity = entity.modifiers[addr.mod_idx]
+            elif addr.kind == 'LAYER_CHANNEL_MODIFIER_1': entity = entity.modifiers_1[addr.mod_idx]
+
+        return entity
+
+    except IndexError: return None
+
+# Cached entity addresses of every yp, {tree name : EntityAddresses}
+_entity_addresses = {}
+
+# Only these types are stored on the address table, so other types won't trigger rebuild
+entity_address_types = {
+        'YPaintChannel', 'YLayer', 'YLayerChannel', 'YLayerMask', 'YLayerMaskChannel',
+        'YPaintModifier', 'YNormalMapModifier', 'YMaskModifier',
+        }
+
+def get_entity_address(entity):
+    ''' Returns EntityAddress of layer, mask, channel or modifier of a yp tree without using path_from_id()
+        Returns None if the entity is not part of yp tree
+        Cached address is checked to still point to the same entity, so the table is rebuilt
+        when layers are changed or after new masks, channels or modifiers are added
+    '''
+    if entity.bl_rna.identifier not in entity_address_types: return None
+
+    tree = entity.id_data
+    if not isinstance(tree, bpy.types.NodeTree) or not tree.yp.is_ypaint_node: return None
+
+    yp = tree.yp
+    ptr = entity.as_pointer()
+    generation = get_layer_generation(yp)
 
-        cur = parent
+    table = _entity_addresses.get(tree.name)
+    if table and table.generation == generation:
+        addr = table.addresses.get(ptr)
+        if addr:
+            found = get_entity_by_address(yp, addr)
+            if found and found.as_pointer() == ptr:
+                return addr
 
-    return depth
+    table = _entity_addresses[tree.name] = EntityAddresses(yp, generation)
+
+    return table.addresses.get(ptr)
+
+def get_entity_path(entity):
+    ''' Faster path_from_id() for entities of yp tree '''
+    addr = get_entity_address(entity)
+    if addr: return addr.path
+    return entity.path_from_id()
+
+def get_layer_depth(layer):
+    yp = layer.id_data.yp
+    hierarchy = get_layer_hierarchy(yp)
+    return hierarchy.depths[get_layer_index(layer)]
 
 def is_top_member(layer):
     
     if layer.parent_idx == -1:
         return False
 
-    yp = layer.id_data.yp
-
-    for i, t in enumerate(yp.layers):
-        if t == layer:
-            if layer.parent_idx == i-1:
-                return True
-            else: return False
-
-    return False
+    return layer.parent_idx == get_layer_index(layer) - 1
 
 def is_bottom_member(layer):
 
@@ -1965,19 +2315,9 @@ def is_bottom_member(layer):
         return False
 
     yp = layer.id_data.yp
+    hierarchy = get_layer_hierarchy(yp)
 
-    layer_idx = -1
-    last_member_idx = -1
-    for i, t in enumerate(yp.layers):
-        if t == layer:
-            layer_idx = i
-        if t.parent_idx == layer.parent_idx:
-            last_member_idx = i
-
-    if layer_idx == last_member_idx:
-        return True
-
-    return False
+    return get_layer_index(layer) == hierarchy.last_member_ids.get(layer.parent_idx, -1)
 
 #def get_upmost_parent_idx(layer, idx_limit = -1):
 #
@@ -2006,18 +2346,12 @@ def is_bottom_member(layer):
 
 def get_layer_index(layer):
     yp = layer.id_data.yp
-
-    for i, t in enumerate(yp.layers):
-        if layer == t:
-            return i
+    hierarchy = get_layer_hierarchy(yp)
+    return hierarchy.index_by_pointer.get(layer.as_pointer())
 
 def get_layer_index_by_name(yp, name):
-
-    for i, t in enumerate(yp.layers):
-        if name == t.name:
-            return i
-
-    return -1
+    hierarchy = get_layer_hierarchy(yp)
+    return hierarchy.index_by_name.get(name, -1)
 
 def get_parent_dict(yp):
     parent_dict = {}
@@ -2039,32 +2373,22 @@ def get_parent(layer):
     return yp.layers[layer.parent_idx]
 
 def is_parent_hidden(layer):
-
     yp = layer.id_data.yp
-
-    hidden = False
-    
-    cur = layer
-    parent = layer
-
-    while True:
-        if cur.parent_idx != -1:
-
-            try: layer = yp.layers[cur.parent_idx]
-            except: break
-
-            if layer.type == 'GROUP':
-                parent = layer
-                if not parent.enable:
-                    hidden = True
-                    break
-
-        if parent == cur:
-            break
-
-        cur = parent
-
-    return hidden
+    hierarchy = get_layer_hierarchy(yp)
+    return hierarchy.hidden[get_layer_index(layer)]
+
+def remap_layer_parents(yp, parent_dict, skipped_names=None):
+    ''' Set parent index of every layer from {layer name : parent name}
+        Indices are looked up before any assignment, so layer hierarchy is not rebuilt on every layer
+    '''
+    index_by_name = {lay.name : i for i, lay in enumerate(yp.layers)}
+    for lay in yp.layers:
+        if lay.name not in parent_dict: continue
+        if skipped_names and lay.name in skipped_names: continue
+        parent_idx = index_by_name.get(parent_dict[lay.name], -1)
+        if lay.parent_idx != parent_idx:
+            lay.parent_idx = parent_idx
+    bump_layer_generation(yp)
 
 def set_parent_dict_val(yp, parent_dict, name, target_idx):
 
@@ -2080,29 +2404,13 @@ def get_list_of_direct_child_ids(layer):
     if layer.type != 'GROUP':
         return []
 
-    layer_idx = get_layer_index(layer)
-
-    childs = []
-    for i, t in enumerate(yp.layers):
-        if t.parent_idx == layer_idx:
-            childs.append(i)
+    hierarchy = get_layer_hierarchy(yp)
 
-    return childs
+    return list(hierarchy.direct_child_ids.get(get_layer_index(layer), []))
 
 def get_list_of_direct_childrens(layer):
     yp = layer.id_data.yp
-
-    if layer.type != 'GROUP':
-        return []
-
-    layer_idx = get_layer_index(layer)
-
-    childs = []
-    for t in yp.layers:
-        if t.parent_idx == layer_idx:
-            childs.append(t)
-
-    return childs
+    return [yp.layers[i] for i in get_list_of_direct_child_ids(layer)]
 
 def get_list_of_all_childs_and_child_ids(layer):
     yp = layer.id_data.yp
@@ -2110,65 +2418,27 @@ def get_list_of_all_childs_and_child_ids(layer):
     if layer.type != 'GROUP':
         return [], []
 
-    layer_idx = get_layer_index(layer)
-
-    childs = []
-    child_ids = []
-    for i, t in enumerate(yp.layers):
-        if t.parent_idx == layer_idx or t.parent_idx in child_ids:
-            childs.append(t)
-            child_ids.append(i)
+    hierarchy = get_layer_hierarchy(yp)
+    child_ids = list(hierarchy.all_child_ids.get(get_layer_index(layer), []))
 
-    return childs, child_ids
+    return [yp.layers[i] for i in child_ids], child_ids
 
 def get_list_of_parent_ids(layer):
-
     yp = layer.id_data.yp
-
-    cur = layer
-    parent = layer
-    parent_list = []
-
-    while True:
-        if cur.parent_idx != -1:
-
-            try: layer = yp.layers[cur.parent_idx]
-            except: break
-
-            if layer.type == 'GROUP':
-                parent = layer
-                parent_list.append(cur.parent_idx)
-
-        if parent == cur:
-            break
-
-        cur = parent
-
-    return parent_list
+    hierarchy = get_layer_hierarchy(yp)
+    return list(hierarchy.group_parent_ids[get_layer_index(layer)])
 
 def get_last_chained_up_layer_ids(layer, idx_limit):
 
     yp = layer.id_data.yp
+    hierarchy = get_layer_hierarchy(yp)
     layer_idx = get_layer_index(layer)
 
-    cur = layer
-    parent = layer
+    # Upmost group parent below the limit
     parent_idx = layer_idx
-
-    while True:
-        if cur.parent_idx != -1 and cur.parent_idx != idx_limit:
-
-            try: layer = yp.layers[cur.parent_idx]
-            except: break
-
-            if layer.type == 'GROUP':
-                parent = layer
-                parent_idx = cur.parent_idx
-
-        if parent == cur:
-            break
-
-        cur = parent
+    for pid in hierarchy.group_parent_ids[layer_idx]:
+        if pid == idx_limit: break
+        parent_idx = pid
 
     return parent_idx
 
@@ -2196,11 +2466,9 @@ def get_last_child_idx(layer): #, very_last=False):
     if layer.type != 'GROUP': 
         return layer_idx
 
-    for i, t in reversed(list(enumerate(yp.layers))):
-        if i > layer_idx and layer_idx in get_list_of_parent_ids(t):
-            return i
+    hierarchy = get_layer_hierarchy(yp)
 
-    return layer_idx
+    return hierarchy.last_child_ids.get(layer_idx, layer_idx)
 
 def get_upper_neighbor(layer):
 
@@ -2253,9 +2521,9 @@ def is_valid_to_remove_bump_nodes(layer, ch):
 def set_uv_neighbor_resolution(entity, uv_neighbor=None, source=None, mapping=None):
 
     yp = entity.id_data.yp
-    m1 = re.match(r'^yp\.layers\[(\d+)\]$', entity.path_from_id())
-    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', entity.path_from_id())
-    m3 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', entity.path_from_id())
+    m1 = re.match(r'^yp\.layers\[(\d+)\]$', get_entity_path(entity))
+    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', get_entity_path(entity))
+    m3 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', get_entity_path(entity))
 
     if m1: 
         tree = get_tree(entity)
@@ -2299,8 +2567,8 @@ def set_uv_neighbor_resolution(entity, uv_neighbor=None, source=None, mapping=No
 
 def clear_mapping(entity):
 
-    m1 = re.match(r'^yp\.layers\[(\d+)\]$', entity.path_from_id())
-    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', entity.path_from_id())
+    m1 = re.match(r'^yp\.layers\[(\d+)\]$', get_entity_path(entity))
+    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', get_entity_path(entity))
 
     if m1: mapping = get_layer_mapping(entity)
     else: mapping = get_mask_mapping(entity)
@@ -2316,8 +2584,8 @@ def clear_mapping(entity):
 
 def update_mapping(entity):
 
-    m1 = re.match(r'^yp\.layers\[(\d+)\]$', entity.path_from_id())
-    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', entity.path_from_id())
+    m1 = re.match(r'^yp\.layers\[(\d+)\]$', get_entity_path(entity))
+    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', get_entity_path(entity))
 
     # Get source
     if m1: 
@@ -2347,8 +2615,10 @@ def update_mapping(entity):
         scale_x = segment.width/image.size[0] * scale_x
         scale_y = segment.height/image.size[1] * scale_y
 
-        offset_x = scale_x * segment.tile_x + offset_x * scale_x
-        offset_y = scale_y * segment.tile_y + offset_y * scale_y
+        start_x, start_y = get_segment_start(segment)
+
+        offset_x = scale_x * start_x / segment.width + offset_x * scale_x
+        offset_y = scale_y * start_y / segment.height + offset_y * scale_y
 
     if is_greater_than_281():
         mapping.inputs[1].default_value = (offset_x, offset_y, offset_z)
@@ -2463,9 +2733,9 @@ def refresh_temp_uv(obj, entity):
 
     #print(entity.path_from_id())
 
-    m1 = re.match(r'^yp\.layers\[(\d+)\]$', entity.path_from_id())
-    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', entity.path_from_id())
-    m3 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', entity.path_from_id())
+    m1 = re.match(r'^yp\.layers\[(\d+)\]$', get_entity_path(entity))
+    m2 = re.match(r'^yp\.layers\[(\d+)\]\.masks\[(\d+)\]$', get_entity_path(entity))
+    m3 = re.match(r'^yp\.layers\[(\d+)\]\.channels\[(\d+)\]$', get_entity_path(entity))
 
     if m1 or m2 or m3: 
 
@@ -0,0 +1,133 @@
+import bpy, numpy
+
+# Reusable float32 pixel buffers, one per slot
+# Use different slots when two images need to be read at the same time
+_pixel_buffers = {}
+
+# Only buffers up to this number of floats (2048 x 2048 x 4 = 64 MB) are kept between calls
+# Atlas images can be really big (8192 x 8192 x 4 floats = 1 GB), so their buffers are freed once they're not used
+MAX_KEPT_BUFFER_SIZE = 2048 * 2048 * 4
+
+def get_pixel_buffer(size, slot=0):
+    buf = _pixel_buffers.get(slot)
+    if buf is None or buf.size != size:
+        buf = numpy.empty(size, dtype=numpy.float32)
+        if size <= MAX_KEPT_BUFFER_SIZE:
+            _pixel_buffers[slot] = buf
+        else: _pixel_buffers.pop(slot, None)
+    return buf
+
+def clear_pixel_buffers():
+    _pixel_buffers.clear()
+
+def read_pixels(image, buf=None, slot=0):
+    ''' Read image pixels into a float32 array with shape (height, width, 4)
+        If buf is not set, a reusable buffer is used for small images, so the result is only valid until the next read on the same slot
+    '''
+    width = image.size[0]
+    height = image.size[1]
+    size = width * height * 4
+
+    if buf is None:
+        buf = get_pixel_buffer(size, slot)
+
+    if hasattr(image.pixels, 'foreach_get'):
+        image.pixels.foreach_get(buf)
+    else:
+        # Blender 2.82 and lower has no foreach_get on pixels
+        buf[:] = image.pixels[:]
+
+    return buf.reshape(height, width, 4)
+
+def write_pixels(image, pxs):
+    ''' Write pixel array (any shape with matching number of floats) back to image '''
+    flat = pxs.reshape(-1)
+    if hasattr(image.pixels, 'foreach_set'):
+        image.pixels.foreach_set(flat)
+    else: image.pixels = flat.tolist()
+
+    image.update()
+
+def get_rect_view(pxs, x, y, width, height):
+    ''' Get strided view of rectangle inside pixel array with shape (height, width, 4) '''
+    return pxs[y : y + height, x : x + width]
+
+def fill_rect(image, x, y, width, height, color):
+    pxs = read_pixels(image)
+    get_rect_view(pxs, x, y, width, height)[:] = color
+    write_pixels(image, pxs)
+
+def fill_rects(image, rects, color):
+    ''' Fill multiple rectangles (x, y, width, height) using a single read and write of the image '''
+    if not rects: return
+    pxs = read_pixels(image)
+    for x, y, width, height in rects:
+        get_rect_view(pxs, x, y, width, height)[:] = color
+    write_pixels(image, pxs)
+
+# Compositing operations
+# Source images are read into a second slot, so both images are only views over reusable buffers
+
+def copy_channels(img_from, img_to, x=0, y=0, from_channels=(0, 1, 2, 3), to_channels=(0, 1, 2, 3), rect_from=None):
+    ''' Copy channels of source image (or rectangle of it) into target image at (x, y)
+        Channels are mapped by order, so it can also be used to splice channels between images
+    '''
+    src = read_pixels(img_from, slot=1)
+    if rect_from: src = get_rect_view(src, *rect_from)
+    height, width = src.shape[:2]
+
+    pxs = read_pixels(img_to)
+    dst = get_rect_view(pxs, x, y, width, height)
+
+    if tuple(from_channels) == tuple(to_channels) == (0, 1, 2, 3):
+        dst[:] = src
+    else:
+        for fc, tc in zip(from_channels, to_channels):
+            dst[:, :, tc] = src[:, :, fc]
+
+    write_pixels(img_to, pxs)
+
+def blit_image(img_from, img_to, x=0, y=0):
+    ''' Copy whole source image into target image at (x, y), usually an atlas segment '''
+    copy_channels(img_from, img_to, x, y)
+
+def blit_rgb(img_from, img_to, x=0, y=0):
+    ''' Copy only color of source image into target image at (x, y) '''
+    copy_channels(img_from, img_to, x, y, (0, 1, 2), (0, 1, 2))
+
+def inject_alpha(img_alpha, img_to, x=0, y=0, channel=0):
+    ''' Use one channel of grayscale baked image as alpha of target image '''
+    copy_channels(img_alpha, img_to, x, y, (channel,), (3,))
+
+def write_scalar_pixels(image, values, alpha=1.0):
+    ''' Write grayscale values with shape (height, width) into RGB channels of the image '''
+    pxs = read_pixels(image)
+    pxs[:, :, :3] = values[:, :, None]
+    if alpha != None:
+        pxs[:, :, 3] = alpha
+    write_pixels(image, pxs)
+
+def write_channel(image, values, channel=3):
+    ''' Write values with shape (height, width) into single channel of the image '''
+    pxs = read_pixels(image)
+    pxs[:, :, channel] = values
+    write_pixels(image, pxs)
+
+def write_rect(image, x, y, rect_pxs):
+    ''' Write pixel array with shape (height, width, 4) into rectangle of the image '''
+    height, width = rect_pxs.shape[:2]
+    pxs = read_pixels(image)
+    get_rect_view(pxs, x, y, width, height)[:] = rect_pxs
+    write_pixels(image, pxs)
+
+def copy_rect(img_from, from_x, from_y, img_to, to_x, to_y, width, height):
+
+    # Only the source rectangle is copied out, so the reusable buffer can be used for both images
+    # This also handles overlapping rectangles on the same image
+    pxs = read_pixels(img_from)
+    src = get_rect_view(pxs, from_x, from_y, width, height).copy()
+
+    if img_to != img_from:
+        pxs = read_pixels(img_to)
+    get_rect_view(pxs, to_x, to_y, width, height)[:] = src
+    write_pixels(img_to, pxs)
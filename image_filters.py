@@ -0,0 +1,122 @@
+import numpy
+
+# FXAA settings, based on the classic FXAA PC preset
+FXAA_SPAN_MAX = 8.0
+FXAA_REDUCE_MUL = 1.0 / 8.0
+FXAA_REDUCE_MIN = 1.0 / 128.0
+FXAA_EDGE_THRESHOLD = 1.0 / 8.0
+FXAA_EDGE_THRESHOLD_MIN = 1.0 / 16.0
+
+LUMA_WEIGHTS = numpy.array([0.299, 0.587, 0.114], dtype=numpy.float32)
+
+def get_luma(rgb, hdr=False):
+    luma = numpy.dot(rgb, LUMA_WEIGHTS)
+
+    # Tonemap float colors so edge threshold still makes sense
+    if hdr:
+        luma = numpy.maximum(luma, 0.0)
+        luma = luma / (1.0 + luma)
+
+    return luma
+
+def sample_bilinear(pxs, xs, ys):
+    ''' Sample pixel array with shape (height, width, channels) on float coordinates
+        Integer coordinates are pixel centers, coordinates outside image are clamped to the edges
+    '''
+    height, width = pxs.shape[:2]
+
+    xs = numpy.clip(xs, 0.0, width - 1)
+    ys = numpy.clip(ys, 0.0, height - 1)
+
+    x0 = numpy.floor(xs).astype(numpy.int32)
+    y0 = numpy.floor(ys).astype(numpy.int32)
+    x1 = numpy.minimum(x0 + 1, width - 1)
+    y1 = numpy.minimum(y0 + 1, height - 1)
+
+    fx = (xs - x0)[:, None]
+    fy = (ys - y0)[:, None]
+
+    bottom = pxs[y0, x0] * (1.0 - fx) + pxs[y0, x1] * fx
+    top = pxs[y1, x0] * (1.0 - fx) + pxs[y1, x1] * fx
+
+    return bottom * (1.0 - fy) + top * fy
+
+def fxaa_pixels(pxs, alpha_aware=True, hdr=False):
+    ''' FXAA pass on pixel array with shape (height, width, 4), returns new array
+        Alpha aware mode filters premultiplied color so transparent pixels won't bleed into the edges,
+        original alpha is always kept
+    '''
+    if alpha_aware:
+        src = pxs.copy()
+        src[:, :, :3] *= pxs[:, :, 3:]
+    else: src = pxs
+
+    luma = get_luma(src[:, :, :3], hdr)
+    padded = numpy.pad(luma, 1, mode='edge')
+
+    # Neighbor lumas, rows are going up like on Blender images
+    n = padded[2:, 1:-1]
+    s = padded[:-2, 1:-1]
+    e = padded[1:-1, 2:]
+    w = padded[1:-1, :-2]
+    nw = padded[:-2, :-2]
+    ne = padded[:-2, 2:]
+    sw = padded[2:, :-2]
+    se = padded[2:, 2:]
+
+    # Only process pixels with enough local contrast
+    range_max = numpy.maximum.reduce([luma, n, s, e, w])
+    range_min = numpy.minimum.reduce([luma, n, s, e, w])
+    edge = (range_max - range_min) >= numpy.maximum(FXAA_EDGE_THRESHOLD_MIN, range_max * FXAA_EDGE_THRESHOLD)
+    del range_max, range_min
+
+    out = src.copy()
+    ys, xs = numpy.nonzero(edge)
+
+    if len(ys) > 0:
+        l_m = luma[ys, xs]
+        l_nw = nw[ys, xs]
+        l_ne = ne[ys, xs]
+        l_sw = sw[ys, xs]
+        l_se = se[ys, xs]
+
+        # Blur direction is perpendicular to the edge
+        dir_x = -((l_nw + l_ne) - (l_sw + l_se))
+        dir_y = (l_nw + l_sw) - (l_ne + l_se)
+
+        dir_reduce = numpy.maximum((l_nw + l_ne + l_sw + l_se) * (0.25 * FXAA_REDUCE_MUL), FXAA_REDUCE_MIN)
+        rcp_dir_min = 1.0 / (numpy.minimum(numpy.abs(dir_x), numpy.abs(dir_y)) + dir_reduce)
+
+        dir_x = numpy.clip(dir_x * rcp_dir_min, -FXAA_SPAN_MAX, FXAA_SPAN_MAX)
+        dir_y = numpy.clip(dir_y * rcp_dir_min, -FXAA_SPAN_MAX, FXAA_SPAN_MAX)
+
+        fx = xs.astype(numpy.float32)
+        fy = ys.astype(numpy.float32)
+
+        def tap(t):
+            return sample_bilinear(src, fx + dir_x * t, fy + dir_y * t)
+
+        rgb_a = 0.5 * (tap(1.0 / 3.0 - 0.5) + tap(2.0 / 3.0 - 0.5))
+        rgb_b = rgb_a * 0.5 + 0.25 * (tap(-0.5) + tap(0.5))
+
+        # Wider blur is only used if it doesn't go outside of local luma range
+        luma_b = get_luma(rgb_b[:, :3], hdr)
+        luma_min = numpy.minimum.reduce([l_m, l_nw, l_ne, l_sw, l_se])
+        luma_max = numpy.maximum.reduce([l_m, l_nw, l_ne, l_sw, l_se])
+        use_a = (luma_b < luma_min) | (luma_b > luma_max)
+
+        out[ys, xs] = numpy.where(use_a[:, None], rgb_a, rgb_b)
+
+    if alpha_aware:
+        # Back to straight color using filtered alpha
+        alpha = out[:, :, 3:]
+        opaque = alpha > 0.0
+        out[:, :, :3] = numpy.where(opaque, out[:, :, :3] / numpy.where(opaque, alpha, 1.0), pxs[:, :, :3])
+
+    out[:, :, 3] = pxs[:, :, 3]
+
+    return out
+
+def linear_to_srgb(values):
+    values = numpy.maximum(values, 0.0)
+    return numpy.where(values > 0.0031308, 1.055 * numpy.power(values, 1.0 / 2.4) - 0.055, 12.92 * values)
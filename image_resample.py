@@ -0,0 +1,88 @@
+import numpy, math
+
+def box_kernel(x):
+    return numpy.where(numpy.abs(x) <= 0.5, 1.0, 0.0)
+
+def bilinear_kernel(x):
+    return numpy.maximum(1.0 - numpy.abs(x), 0.0)
+
+def lanczos_kernel(x):
+    return numpy.where(numpy.abs(x) < 3.0, numpy.sinc(x) * numpy.sinc(x / 3.0), 0.0)
+
+# Filter kernel and its support radius
+resample_filters = {
+        'BOX' : (box_kernel, 0.5),
+        'BILINEAR' : (bilinear_kernel, 1.0),
+        'LANCZOS' : (lanczos_kernel, 3.0),
+        }
+
+def get_resample_weights(in_size, out_size, filter_type='LANCZOS'):
+    ''' Returns source indices and weights with shape (out_size, taps) '''
+    kernel, support = resample_filters[filter_type]
+
+    scale = in_size / out_size
+
+    # Stretch the kernel when downsampling so every source pixel contributes
+    filter_scale = max(scale, 1.0)
+    support = support * filter_scale
+
+    centers = (numpy.arange(out_size) + 0.5) * scale
+    taps = int(math.ceil(support)) * 2 + 1
+
+    left = numpy.floor(centers - support).astype(numpy.int64)
+    ids = left[:, None] + numpy.arange(taps)[None, :]
+    weights = kernel((ids + 0.5 - centers[:, None]) / filter_scale).astype(numpy.float32)
+
+    # Outside pixels are clamped to the edges
+    ids = numpy.clip(ids, 0, in_size - 1)
+
+    total = weights.sum(axis=1, keepdims=True)
+    weights /= numpy.where(total != 0.0, total, 1.0)
+
+    return ids, weights
+
+def resample_axis(pxs, out_size, axis, filter_type='LANCZOS'):
+    ids, weights = get_resample_weights(pxs.shape[axis], out_size, filter_type)
+
+    shape = [1] * pxs.ndim
+    shape[axis] = out_size
+
+    result = None
+    for i in range(ids.shape[1]):
+        w = weights[:, i]
+        if not w.any(): continue
+        tap = numpy.take(pxs, ids[:, i], axis=axis) * w.reshape(shape)
+        if result is None: result = tap
+        else: result += tap
+
+    return result
+
+def resample_pixels(pxs, width, height, filter_type='LANCZOS', alpha_aware=True, clamp=True):
+    ''' Resample pixel array with shape (height, width, 4) into new array with shape (height, width, 4)
+        Alpha aware mode resamples premultiplied color so transparent pixels won't bleed into the edges
+    '''
+    src = pxs.astype(numpy.float32, copy=True)
+
+    if alpha_aware:
+        src[:, :, :3] *= src[:, :, 3:]
+
+    # Separable filtering, do the axis that shrinks the most first to process less pixels
+    if height / src.shape[0] < width / src.shape[1]:
+        result = resample_axis(src, height, 0, filter_type)
+        result = resample_axis(result, width, 1, filter_type)
+    else:
+        result = resample_axis(src, width, 1, filter_type)
+        result = resample_axis(result, height, 0, filter_type)
+
+    # Lanczos can overshoot
+    if clamp:
+        numpy.clip(result, 0.0, 1.0, out=result)
+    else: numpy.clip(result[:, :, 3], 0.0, 1.0, out=result[:, :, 3])
+
+    if alpha_aware:
+        alpha = result[:, :, 3:]
+        opaque = alpha > 0.0
+        result[:, :, :3] = numpy.where(opaque, result[:, :, :3] / numpy.where(opaque, alpha, 1.0), 0.0)
+        if clamp: numpy.clip(result[:, :, :3], 0.0, 1.0, out=result[:, :, :3])
+
+    return result
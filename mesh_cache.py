@@ -0,0 +1,96 @@
+import bpy, hashlib, numpy
+from bpy.app.handlers import persistent
+from .common import *
+
+# Mesh derived data, {(mesh name, kind) : (mesh hash, data)}
+_mesh_data = {}
+
+def get_mesh_hash(mesh, uv_name=''):
+    ''' Fast hash of mesh topology, and uv coordinates if uv name is set '''
+    h = hashlib.sha1()
+    h.update(repr((len(mesh.vertices), len(mesh.loops), len(mesh.polygons))).encode())
+
+    arr = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+    mesh.polygons.foreach_get('loop_total', arr)
+    h.update(memoryview(arr))
+
+    arr = numpy.empty(len(mesh.loops), dtype=numpy.int32)
+    mesh.loops.foreach_get('vertex_index', arr)
+    h.update(memoryview(arr))
+
+    if uv_name != '':
+        uvl = mesh.uv_layers.get(uv_name)
+        if uvl:
+            arr = numpy.empty(len(mesh.loops) * 2, dtype=numpy.float32)
+            uvl.data.foreach_get('uv', arr)
+            h.update(memoryview(arr))
+
+    return h.hexdigest()
+
+def get_cached_mesh_data(mesh, kind, mesh_hash):
+    ''' Returns cached data if the mesh is not changed since it's stored, otherwise None '''
+    entry = _mesh_data.get((mesh.name, kind))
+    if entry and entry[0] == mesh_hash:
+        return entry[1]
+    return None
+
+def set_cached_mesh_data(mesh, kind, mesh_hash, data):
+    _mesh_data[(mesh.name, kind)] = (mesh_hash, data)
+
+def get_loop_triangles(mesh):
+    ''' Returns loop indices of mesh triangles with shape (n, 3) and polygon index of every triangle '''
+    mesh_hash = get_mesh_hash(mesh)
+
+    # Ngons are triangulated based on vertex positions, so moved vertices can change their triangles
+    totals = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+    mesh.polygons.foreach_get('loop_total', totals)
+    if len(totals) > 0 and totals.max() > 4:
+        h = hashlib.sha1(mesh_hash.encode())
+        cos = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+        mesh.vertices.foreach_get('co', cos)
+        h.update(memoryview(cos))
+        mesh_hash = h.hexdigest()
+
+    data = get_cached_mesh_data(mesh, 'LOOP_TRIANGLES', mesh_hash)
+    if data: return data
+
+    if hasattr(mesh, 'loop_triangles'):
+        mesh.calc_loop_triangles()
+        num_tris = len(mesh.loop_triangles)
+        tris = numpy.empty(num_tris * 3, dtype=numpy.int32)
+        mesh.loop_triangles.foreach_get('loops', tris)
+        tris = tris.reshape(num_tris, 3)
+        poly_ids = numpy.empty(num_tris, dtype=numpy.int32)
+        mesh.loop_triangles.foreach_get('polygon_index', poly_ids)
+    else:
+        # Blender 2.79 has no loop triangles, use triangle fan of each polygon
+        num_polys = len(mesh.polygons)
+        starts = numpy.empty(num_polys, dtype=numpy.int32)
+        totals = numpy.empty(num_polys, dtype=numpy.int32)
+        mesh.polygons.foreach_get('loop_start', starts)
+        mesh.polygons.foreach_get('loop_total', totals)
+
+        poly_tris = numpy.maximum(totals - 2, 0)
+        poly_ids = numpy.repeat(numpy.arange(num_polys), poly_tris)
+        offsets = numpy.arange(len(poly_ids)) - numpy.repeat(numpy.cumsum(poly_tris) - poly_tris, poly_tris)
+        s = starts[poly_ids]
+        tris = numpy.stack((s, s + offsets + 1, s + offsets + 2), axis=1)
+
+    data = (tris, poly_ids)
+    set_cached_mesh_data(mesh, 'LOOP_TRIANGLES', mesh_hash, data)
+
+    return data
+
+def clear_mesh_cache():
+    _mesh_data.clear()
+
+@persistent
+def clear_mesh_cache_on_load(scene):
+    # Mesh names can point to different meshes after loading other file
+    clear_mesh_cache()
+
+def register():
+    bpy.app.handlers.load_post.append(clear_mesh_cache_on_load)
+
+def unregister():
+    bpy.app.handlers.load_post.remove(clear_mesh_cache_on_load)
@@ -1,5 +1,6 @@
 import bpy, time
 from mathutils import *
+from bpy.app.handlers import persistent
 from .common import *
 
 NO_MODIFIER_Y_OFFSET = 200
@@ -30,6 +31,115 @@ value_mod_y_offsets = {
         'MATH' : 270
         }
 
+class DirtyLayout():
+    ''' Parts of a yp tree that need to be rearranged '''
+    def __init__(self):
+        self.yp = False
+        self.layers = set()
+
+class DirtyLayouts():
+    ''' Node layouts are only cosmetic, so they are deferred until a node editor is showing the tree '''
+
+    # {yp tree name : DirtyLayout}
+    trees = {}
+
+    # Rearrange functions run directly while deferred layouts are flushed
+    flushing = False
+
+def is_lazy_layout_enabled():
+    # Blender 2.79 has no timers to run deferred layouts
+    if not is_greater_than_280() or DirtyLayouts.flushing: return False
+    return get_user_preferences().lazy_node_layout
+
+def defer_layout(tree, layer_name=None):
+    ''' Returns True if layout of the main yp tree, or the layer if layer name is set, is deferred '''
+    if not is_lazy_layout_enabled(): return False
+
+    dirty = DirtyLayouts.trees.get(tree.name)
+    if not dirty:
+        dirty = DirtyLayouts.trees[tree.name] = DirtyLayout()
+
+    if layer_name == None:
+        dirty.yp = True
+    else: dirty.layers.add(layer_name)
+
+    if not bpy.app.timers.is_registered(layout_shown_trees):
+        bpy.app.timers.register(layout_shown_trees, first_interval=0.1)
+
+    return True
+
+def flush_tree_layout(name):
+    dirty = DirtyLayouts.trees.pop(name, None)
+    group_tree = bpy.data.node_groups.get(name)
+    if not dirty or not group_tree: return
+
+    DirtyLayouts.flushing = True
+    try:
+        for layer in group_tree.yp.layers:
+            if layer.name in dirty.layers:
+                rearrange_layer_nodes(layer)
+
+        if dirty.yp:
+            rearrange_yp_nodes(group_tree)
+    finally:
+        DirtyLayouts.flushing = False
+
+def flush_node_layouts(tree=None):
+    ''' Run deferred layouts of the yp tree, or of every yp tree if tree is not set '''
+    names = [tree.name] if tree else list(DirtyLayouts.trees)
+    for name in names:
+        flush_tree_layout(name)
+
+def get_shown_tree_names():
+    names = set()
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type != 'NODE_EDITOR': continue
+            space = area.spaces.active
+
+            # Path contains every group tree entered from the material
+            for p in space.path:
+                if p.node_tree: names.add(p.node_tree.name)
+
+            if space.edit_tree: names.add(space.edit_tree.name)
+
+    return names
+
+def is_layout_shown(name, shown):
+    if name in shown: return True
+
+    group_tree = bpy.data.node_groups.get(name)
+    if not group_tree: return False
+
+    # Layer tree can be shown without its yp tree, for example by browsing node groups
+    for layer_name in DirtyLayouts.trees[name].layers:
+        layer = group_tree.yp.layers.get(layer_name)
+        layer_tree = get_tree(layer) if layer else None
+        if layer_tree and layer_tree.name in shown:
+            return True
+
+    return False
+
+def layout_shown_trees():
+    ''' Timer to run deferred layouts of trees shown on node editors '''
+    shown = get_shown_tree_names()
+    for name in list(DirtyLayouts.trees):
+        if is_layout_shown(name, shown):
+            flush_tree_layout(name)
+
+    # Keep checking until every dirty tree is shown
+    if DirtyLayouts.trees: return 1.0
+    return None
+
+@persistent
+def flush_node_layouts_on_save(scene):
+    # Saved file should have proper layout
+    flush_node_layouts()
+
+@persistent
+def clear_node_layouts_on_load(scene):
+    DirtyLayouts.trees.clear()
+
 def get_mod_y_offsets(mod, is_value=False):
     if is_value and mod.type in value_mod_y_offsets:
         return value_mod_y_offsets[mod.type]
@@ -580,6 +690,8 @@ def rearrange_layer_nodes(layer, tree=None):
 
     if yp.halt_reconnect: return
 
+    if defer_layout(layer.id_data, layer.name): return
+
     if not tree: tree = get_tree(layer)
     nodes = tree.nodes
 
@@ -1649,6 +1761,8 @@ def rearrange_depth_layer_nodes(group_tree):
 
 def rearrange_yp_nodes(group_tree):
 
+    if defer_layout(group_tree): return
+
     yp = group_tree.yp
     nodes = group_tree.nodes
 
@@ -1847,3 +1961,13 @@ def rearrange_yp_nodes(group_tree):
     # Rearrange frames
     rearrange_yp_frame_nodes(yp)
 
+def register():
+    bpy.app.handlers.save_pre.append(flush_node_layouts_on_save)
+    bpy.app.handlers.load_post.append(clear_node_layouts_on_load)
+
+def unregister():
+    bpy.app.handlers.save_pre.remove(flush_node_layouts_on_save)
+    bpy.app.handlers.load_post.remove(clear_node_layouts_on_load)
+
+    if is_greater_than_280() and bpy.app.timers.is_registered(layout_shown_trees):
+        bpy.app.timers.unregister(layout_shown_trees)
@@ -1,14 +1,144 @@
-import bpy
+import bpy, functools
 from .common import *
 
+class LinkDiff():
+    ''' Desired links of a tree, only the differences with the current links are applied '''
+    def __init__(self, tree):
+        self.tree = tree
+
+        # {(from socket pointer, to socket pointer) : (from socket, to socket)}
+        self.links = {}
+
+        # Indices for unlinking sockets without scanning all links
+        # Input socket can only have single link, so it only need single key
+        # {to socket pointer : key}
+        self.input_keys = {}
+        # {from socket pointer : set of keys}
+        self.output_keys = {}
+
+        for link in tree.links:
+            self.add_link(link.from_socket, link.to_socket)
+
+        self.original = set(self.links)
+
+    def add_link(self, out, inp):
+        key = (out.as_pointer(), inp.as_pointer())
+        self.links[key] = (out, inp)
+        self.input_keys[key[1]] = key
+        self.output_keys.setdefault(key[0], set()).add(key)
+
+    def remove_link(self, key):
+        if self.links.pop(key, None) == None: return False
+
+        if self.input_keys.get(key[1]) == key:
+            del self.input_keys[key[1]]
+
+        keys = self.output_keys.get(key[0])
+        if keys:
+            keys.discard(key)
+            if not keys: del self.output_keys[key[0]]
+
+        return True
+
+    def link(self, out, inp):
+        # Input socket can only have single link
+        self.unlink_input(inp)
+        self.add_link(out, inp)
+
+    def unlink(self, out, inp):
+        return self.remove_link((out.as_pointer(), inp.as_pointer()))
+
+    def unlink_input(self, inp):
+        key = self.input_keys.get(inp.as_pointer())
+        if key: self.remove_link(key)
+
+    def unlink_output(self, outp):
+        for key in list(self.output_keys.get(outp.as_pointer(), ())):
+            self.remove_link(key)
+
+    def apply(self):
+        ''' Returns number of added and removed links '''
+        removed = self.original.difference(self.links)
+        added = [k for k in self.links if k not in self.original]
+
+        if removed:
+            for link in list(self.tree.links):
+                if (link.from_socket.as_pointer(), link.to_socket.as_pointer()) in removed:
+                    self.tree.links.remove(link)
+
+        for key in added:
+            self.tree.links.new(*self.links[key])
+
+        return len(added), len(removed)
+
+class LinkDiffs():
+    ''' Link changes of every tree inside are collected and only applied when the outermost one is exited,
+        so reconnect that ends with the same links won't touch the trees and trigger shader recompile
+    '''
+    depth = 0
+
+    # {tree pointer : LinkDiff}
+    diffs = {}
+
+    # Link changes of the last applied reconnect
+    num_added = 0
+    num_removed = 0
+
+    def __enter__(self):
+        LinkDiffs.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        LinkDiffs.depth -= 1
+        if LinkDiffs.depth > 0: return False
+
+        diffs = LinkDiffs.diffs
+        LinkDiffs.diffs = {}
+
+        # Keep trees on their previous links if reconnect is failed midway
+        if exc_type: return False
+
+        num_added = num_removed = 0
+        for diff in diffs.values():
+            added, removed = diff.apply()
+            num_added += added
+            num_removed += removed
+
+        LinkDiffs.num_added = num_added
+        LinkDiffs.num_removed = num_removed
+
+        if num_added or num_removed:
+            print('INFO: Reconnect added', num_added, 'and removed', num_removed, 'link(s)')
+
+        return False
+
+def get_link_diff(tree):
+    if LinkDiffs.depth == 0: return None
+    diff = LinkDiffs.diffs.get(tree.as_pointer())
+    if not diff:
+        diff = LinkDiffs.diffs[tree.as_pointer()] = LinkDiff(tree)
+    return diff
+
+def apply_link_diffs(func):
+    ''' Decorator for reconnect functions, links are diffed and applied after the outermost reconnect is done '''
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with LinkDiffs():
+            return func(*args, **kwargs)
+    return wrapper
+
 def create_link(tree, out, inp):
-    if not any(l for l in out.links if l.to_socket == inp):
+    diff = get_link_diff(tree)
+    if diff: diff.link(out, inp)
+    elif not any(l for l in out.links if l.to_socket == inp):
         tree.links.new(out, inp)
         #print(out, 'is connected to', inp)
     if inp.node: return inp.node.outputs
     return None
 
 def break_link(tree, out, inp):
+    diff = get_link_diff(tree)
+    if diff: return diff.unlink(out, inp)
     for link in out.links:
         if link.to_socket == inp:
             tree.links.remove(link)
@@ -16,10 +146,14 @@ def break_link(tree, out, inp):
     return False
 
 def break_input_link(tree, inp):
+    diff = get_link_diff(tree)
+    if diff: return diff.unlink_input(inp)
     for link in inp.links:
         tree.links.remove(link)
 
 def break_output_link(tree, outp):
+    diff = get_link_diff(tree)
+    if diff: return diff.unlink_output(outp)
     for link in outp.links:
         tree.links.remove(link)
 
@@ -905,7 +1039,9 @@ def reconnect_depth_layer_nodes(group_tree, parallax_ch, parallax):
                 break
 
 #def reconnect_yp_nodes(tree, ch_idx=-1):
-def reconnect_yp_nodes(tree, merged_layer_ids = []):
+@apply_link_diffs
+def reconnect_yp_nodes(tree, merged_layer_ids = [], ch_ids=None):
+    ''' Reconnect main yp tree, ch_ids can be used to only reconnect layer chains of some root channels '''
     yp = tree.yp
     nodes = tree.nodes
 
@@ -1027,7 +1163,7 @@ def reconnect_yp_nodes(tree, merged_layer_ids = []):
     #print()
 
     for i, ch in enumerate(yp.channels):
-        #if ch_idx != -1 and i != ch_idx: continue
+        if ch_ids != None and i not in ch_ids: continue
 
         start_linear = nodes.get(ch.start_linear)
         end_linear = nodes.get(ch.end_linear)
@@ -1422,6 +1558,7 @@ def reconnect_yp_nodes(tree, merged_layer_ids = []):
 
                 break
 
+@apply_link_diffs
 def reconnect_channel_source_internal_nodes(ch, ch_source_tree):
 
     tree = ch_source_tree
@@ -1462,6 +1599,7 @@ def reconnect_channel_source_internal_nodes(ch, ch_source_tree):
     create_link(tree, rgb, end.inputs[0])
     create_link(tree, alpha, end.inputs[1])
 
+@apply_link_diffs
 def reconnect_source_internal_nodes(layer):
     tree = get_source_tree(layer)
 
@@ -1521,6 +1659,7 @@ def reconnect_source_internal_nodes(layer):
     create_link(tree, rgb, end.inputs[0])
     create_link(tree, alpha, end.inputs[1])
 
+@apply_link_diffs
 def reconnect_mask_internal_nodes(mask):
 
     tree = get_mask_tree(mask)
@@ -1548,6 +1687,7 @@ def reconnect_mask_internal_nodes(mask):
 
     create_link(tree, val, end.inputs[0])
 
+@apply_link_diffs
 def reconnect_layer_nodes(layer, ch_idx=-1, merge_mask=False):
     yp = layer.id_data.yp
 
@@ -0,0 +1,144 @@
+import bpy, time
+from .common import *
+from .node_arrangements import *
+from .node_connections import *
+
+class DirtyNodes():
+    ''' Node segments of a yp tree that need to be rearranged or reconnected '''
+    def __init__(self):
+        # Layer names whose tree nodes need to be rearranged
+        self.rearrange_layers = set()
+
+        # {layer name : set of channel indices}, -1 means all channels
+        self.reconnect_layers = {}
+
+        # Main yp tree nodes
+        self.rearrange_yp = False
+
+        # Root channel indices whose layer chains need to be reconnected, -1 means all channels
+        self.reconnect_yp = set()
+
+        # Checks deferred by update transaction, {function : None} so every check only run once
+        self.yp_checks = {}
+
+        # {layer name : {function : None}}
+        self.layer_checks = {}
+
+# Dirty segments of every yp tree, {tree name : DirtyNodes}
+_dirty_trees = {}
+
+# Depth of nested update transactions, {tree name : depth}
+_transaction_depths = {}
+
+def get_dirty_nodes(tree):
+    dirty = _dirty_trees.get(tree.name)
+    if not dirty:
+        dirty = _dirty_trees[tree.name] = DirtyNodes()
+    return dirty
+
+def mark_layer_dirty(layer, ch_idx=-1, rearrange=True, reconnect=True):
+    ''' Mark nodes inside the layer tree, ch_idx is the only layer channel need to be reconnected '''
+    dirty = get_dirty_nodes(layer.id_data)
+    if rearrange:
+        dirty.rearrange_layers.add(layer.name)
+    if reconnect:
+        dirty.reconnect_layers.setdefault(layer.name, set()).add(ch_idx)
+
+def mark_yp_dirty(tree, ch_idx=-1, rearrange=True, reconnect=True):
+    ''' Mark nodes of the main yp tree, ch_idx is the only root channel chain need to be reconnected '''
+    dirty = get_dirty_nodes(tree)
+    if rearrange:
+        dirty.rearrange_yp = True
+    if reconnect:
+        dirty.reconnect_yp.add(ch_idx)
+
+def get_single_channel_index(ch_ids):
+    # Single channel can only be reconnected if it's the only dirty channel
+    if len(ch_ids) == 1:
+        return next(iter(ch_ids))
+    return -1
+
+def is_in_transaction(tree):
+    return _transaction_depths.get(tree.name, 0) > 0
+
+def defer_yp_check(tree, check_func):
+    ''' Returns True if check_func(yp) is deferred to the end of update transaction '''
+    if not is_in_transaction(tree): return False
+    get_dirty_nodes(tree).yp_checks[check_func] = None
+    return True
+
+def defer_layer_check(layer, check_func):
+    ''' Returns True if check_func(layer) is deferred to the end of update transaction '''
+    tree = layer.id_data
+    if not is_in_transaction(tree): return False
+    get_dirty_nodes(tree).layer_checks.setdefault(layer.name, {})[check_func] = None
+    return True
+
+def flush_dirty_nodes(tree):
+    ''' Rearrange and reconnect only the dirty segments of the tree '''
+
+    # Update transaction will flush everything at once when it's exited
+    if is_in_transaction(tree): return
+
+    dirty = _dirty_trees.pop(tree.name, None)
+    if not dirty: return
+
+    yp = tree.yp
+
+    # Deferred checks can change any node, so affected trees are fully rearranged and reconnected
+    if dirty.yp_checks:
+        for check_func in dirty.yp_checks:
+            check_func(yp)
+        dirty.rearrange_yp = True
+        dirty.reconnect_yp.add(-1)
+
+    for layer in yp.layers:
+        check_funcs = dirty.layer_checks.get(layer.name)
+        if check_funcs:
+            for check_func in check_funcs:
+                check_func(layer)
+            dirty.rearrange_layers.add(layer.name)
+            dirty.reconnect_layers.setdefault(layer.name, set()).add(-1)
+
+        if layer.name in dirty.rearrange_layers:
+            rearrange_layer_nodes(layer)
+
+        ch_ids = dirty.reconnect_layers.get(layer.name)
+        if ch_ids:
+            reconnect_layer_nodes(layer, get_single_channel_index(ch_ids))
+
+    if dirty.rearrange_yp:
+        rearrange_yp_nodes(tree)
+
+    if dirty.reconnect_yp:
+        ch_ids = None if -1 in dirty.reconnect_yp else dirty.reconnect_yp
+        reconnect_yp_nodes(tree, ch_ids=ch_ids)
+
+class UpdateTransaction():
+    ''' Defer node checks, rearrange and reconnect of a yp tree until the outermost transaction is exited,
+        so bulk property changes only rebuild every dirty part of the tree once:
+
+        with tree.yp.transaction():
+            for layer in tree.yp.layers:
+                layer.channels[0].blend_type = 'MULTIPLY'
+    '''
+    def __init__(self, tree):
+        self.tree = tree
+        self.tree_name = tree.name
+
+    def __enter__(self):
+        _transaction_depths[self.tree_name] = _transaction_depths.get(self.tree_name, 0) + 1
+        return self.tree.yp
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        depth = _transaction_depths.pop(self.tree_name, 1) - 1
+        if depth > 0:
+            _transaction_depths[self.tree_name] = depth
+            return False
+
+        # Always flush, even if the edits are failed midway, so the tree won't be left inconsistent
+        T = time.time()
+        flush_dirty_nodes(self.tree)
+        print('INFO: Update transaction of', self.tree.name, 'is flushed at', '{:0.2f}'.format((time.time() - T) * 1000), 'ms!')
+
+        return False
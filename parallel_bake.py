@@ -0,0 +1,186 @@
+import bpy, os, sys, time, json, shutil, tempfile, subprocess
+from .common import *
+from .bake_common import *
+from . import image_buffer
+
+def get_worker_script():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'batch_bake_cli.py')
+
+def save_dirty_images(folder):
+    ''' Images with unsaved changes won't be available on the saved blend copy, so save them to the folder '''
+    remaps = {}
+    for image in bpy.data.images:
+        if not image.is_dirty or image.source not in {'FILE', 'GENERATED'}: continue
+        if image.size[0] == 0 or image.size[1] == 0: continue
+
+        ext = '.exr' if image.is_float else '.png'
+        path = os.path.join(folder, 'image_' + str(len(remaps)) + ext)
+
+        # Use temporary image so original image filepath and format stay the same
+        temp = bpy.data.images.new(name='__TEMP_PARALLEL__', width=image.size[0], height=image.size[1],
+                alpha=True, float_buffer=image.is_float)
+        temp.colorspace_settings.name = image.colorspace_settings.name
+        image_buffer.blit_image(image, temp)
+        temp.filepath_raw = path
+        temp.file_format = 'OPEN_EXR' if image.is_float else 'PNG'
+        temp.save()
+        bpy.data.images.remove(temp)
+
+        remaps[image.name] = path
+
+    image_buffer.clear_pixel_buffers()
+
+    return remaps
+
+def split_channels(channel_names, num_workers):
+    ''' Distribute channels to workers, returns list of channel name lists '''
+    num_workers = max(1, min(num_workers, len(channel_names)))
+    groups = [[] for i in range(num_workers)]
+    for i, name in enumerate(channel_names):
+        groups[i % num_workers].append(name)
+    return groups
+
+def run_workers(jobs, folder, num_threads=0):
+    ''' Run every job spec on its own background Blender process, returns list of worker reports '''
+    procs = []
+    for i, job in enumerate(jobs):
+        job_path = os.path.join(folder, 'job_' + str(i) + '.json')
+        report_path = os.path.join(folder, 'report_' + str(i) + '.json')
+        log_path = os.path.join(folder, 'worker_' + str(i) + '.log')
+
+        with open(job_path, 'w') as f:
+            json.dump({'jobs' : [job]}, f)
+
+        args = [bpy.app.binary_path, '--background', '--factory-startup']
+        if num_threads > 0:
+            args.extend(['--threads', str(num_threads)])
+        args.extend(['--python', get_worker_script(), '--', job_path, report_path])
+
+        log = open(log_path, 'w')
+        proc = subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT)
+        procs.append((proc, log, report_path, log_path))
+
+    reports = []
+    for proc, log, report_path, log_path in procs:
+        proc.wait()
+        log.close()
+
+        report = None
+        if os.path.isfile(report_path):
+            with open(report_path) as f:
+                report = json.load(f)
+
+        if not report or report['status'] == 'ERROR':
+            print('PARALLEL BAKE: Worker failed, see the log below')
+            with open(log_path) as f:
+                print(''.join(f.readlines()[-20:]))
+
+        reports.append(report)
+
+    return reports
+
+def load_baked_image(path, name, colorspace, is_float):
+    ''' Load worker result as image that doesn't depend on the temporary file '''
+    loaded = bpy.data.images.load(path, check_existing=False)
+    loaded.colorspace_settings.name = colorspace
+
+    image = bpy.data.images.new(name=name, width=loaded.size[0], height=loaded.size[1],
+            alpha=True, float_buffer=is_float)
+    image.colorspace_settings.name = colorspace
+    image_buffer.blit_image(loaded, image)
+
+    bpy.data.images.remove(loaded)
+
+    return image
+
+def assign_worker_output(tree, root_ch, prop, path, uv_map):
+    baked = get_baked_node(tree, root_ch, prop)
+
+    if prop == 'baked':
+        if root_ch.type == 'NORMAL':
+            check_baked_normal_nodes(tree, root_ch, uv_map)
+        is_float = root_ch.type != 'NORMAL' and not root_ch.use_clamp
+        linear = is_float or root_ch.colorspace == 'LINEAR' or root_ch.type == 'NORMAL'
+    else:
+        is_float = False
+        linear = True
+
+    # Keep name and filepath of previously baked image
+    name = tree.name + ' ' + root_ch.name + baked_image_suffixes[prop]
+    filepath = ''
+    if baked.image:
+        name = baked.image.name
+        filepath = baked.image.filepath
+        baked.image.name = '____TEMP'
+
+    image = load_baked_image(path, name, 'Linear' if linear else 'sRGB', is_float)
+    if filepath != '':
+        image.filepath = filepath
+
+    set_baked_image(baked, image)
+
+def bake_channels_parallel(node, obj, channel_names, settings, num_workers=4):
+    ''' Bake channels using multiple background Blender processes
+        Blend file copy is baked by the workers, then the results are assigned back to the baked nodes
+        Returns list of channel names that are failed to bake
+    '''
+    T = time.time()
+    tree = node.node_tree
+    yp = tree.yp
+    mat = obj.active_material
+
+    folder = tempfile.mkdtemp(prefix='ypaint_parallel_bake_')
+
+    try:
+        # Save copy of current state
+        blend_path = os.path.join(folder, 'bake.blend')
+        image_remaps = save_dirty_images(folder)
+        bpy.ops.wm.save_as_mainfile(filepath=blend_path, copy=True)
+
+        print('PARALLEL BAKE: Blend copy is saved at', '{:0.2f}'.format(time.time() - T), 'seconds!')
+
+        groups = split_channels(channel_names, num_workers)
+
+        jobs = []
+        for i, names in enumerate(groups):
+            job = dict(settings)
+            job['file'] = blend_path
+            job['image_remaps'] = image_remaps
+            job['output_dir'] = os.path.join(folder, 'output_' + str(i))
+            job['filename'] = '{channel}'
+            job['format'] = 'AUTO'
+            job['materials'] = [{'material' : mat.name, 'node' : node.name, 'object' : obj.name, 'channels' : names}]
+            jobs.append(job)
+
+        # Split cpu threads between workers
+        num_threads = max(1, (os.cpu_count() or 1) // len(jobs))
+
+        reports = run_workers(jobs, folder, num_threads)
+
+        # Assign results back
+        baked_names = []
+        for report in reports:
+            if not report: continue
+            for job_report in report['jobs']:
+                for mat_report in job_report.get('materials', []):
+                    for output in mat_report.get('outputs', []):
+                        root_ch = yp.channels.get(output['channel'])
+                        if not root_ch: continue
+                        assign_worker_output(tree, root_ch, output['output'], output['path'], settings['uv_map'])
+                        if output['channel'] not in baked_names:
+                            baked_names.append(output['channel'])
+
+        # Normal overlay is not baked if there's no overlay layer
+        for name in baked_names:
+            root_ch = yp.channels.get(name)
+            if root_ch.type == 'NORMAL' and is_overlay_normal_empty(yp):
+                remove_node(tree, root_ch, 'baked_normal_overlay')
+
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+        image_buffer.clear_pixel_buffers()
+
+    print('PARALLEL BAKE:', len(baked_names), 'channel(s) are baked using', len(jobs), 'worker(s) at',
+            '{:0.2f}'.format(time.time() - T), 'seconds!')
+
+    return [n for n in channel_names if n not in baked_names]
@@ -57,6 +57,26 @@ class YPaintPreferences(AddonPreferences):
             description = 'Use image preview or thumbnail on the layers list',
             default = False)
 
+    lazy_node_layout : BoolProperty(
+            name = 'Lazy Node Layout',
+            description = 'Only rearrange nodes when the tree is shown on a node editor, makes editing layers faster',
+            default = True)
+
+    use_bake_cache : BoolProperty(
+            name = 'Use Bake Cache',
+            description = 'Store bake results on disk so the same bake can be loaded instead of baked again',
+            default = False)
+
+    bake_cache_dir : StringProperty(
+            name = 'Bake Cache Folder',
+            description = 'Folder to store bake cache, system temporary folder will be used if empty',
+            default = '', subtype='DIR_PATH')
+
+    bake_cache_size : IntProperty(
+            name = 'Bake Cache Size (MB)',
+            description = 'Maximum size of bake cache, least recently used bake results will be removed first',
+            default = 2048, min=64, max=1048576)
+
     def draw(self, context):
         self.layout.prop(self, 'auto_save')
         self.layout.prop(self, 'default_new_image_size')
@@ -64,6 +84,17 @@ class YPaintPreferences(AddonPreferences):
         self.layout.prop(self, 'hdr_image_atlas_size')
         self.layout.prop(self, 'unique_image_atlas_per_yp')
         self.layout.prop(self, 'use_image_preview')
+        if is_greater_than_280():
+            self.layout.prop(self, 'lazy_node_layout')
+
+        self.layout.prop(self, 'use_bake_cache')
+        col = self.layout.column()
+        col.active = self.use_bake_cache
+        col.prop(self, 'bake_cache_dir')
+        row = col.row()
+        row.prop(self, 'bake_cache_size')
+        row.operator('node.y_clear_bake_cache')
+
         self.layout.prop(self, 'show_experimental')
         self.layout.prop(self, 'developer_mode')
 
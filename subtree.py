@@ -1,5 +1,5 @@
-import bpy, re
-from . import lib, Modifier, MaskModifier
+import bpy, re, numpy
+from . import lib, Modifier, MaskModifier, mesh_cache
 from .common import *
 from .node_arrangements import *
 from .node_connections import *
@@ -668,8 +668,8 @@ def set_mask_uv_neighbor(tree, layer, mask, mask_idx=-1):
 
     # Get mask index
     if mask_idx == -1:
-        match = re.match(r'yp\.layers\[(\d+)\]\.masks\[(\d+)\]', mask.path_from_id())
-        mask_idx = int(match.group(2))
+        addr = get_entity_address(mask)
+        mask_idx = addr.mask_idx
 
     # Get chain
     chain = get_bump_chain(layer)
@@ -1016,231 +1016,100 @@ def remove_tangent_sign_vcol(obj, uv_name):
         vcol = vcols.get(TANGENT_SIGN_PREFIX + uv_name)
         if vcol: vcol = vcols.remove(vcol)
 
-def recover_tangent_sign_process(ori_obj, ori_mode, ori_selects):
+def get_polygon_bitangent_signs(mesh, uv_layer):
+    ''' Bitangent sign of every loop based on uv winding of its polygon
+        Tangent space only flips its sign if the uv is mirrored, so this works the same for ngons
+    '''
+    num_polys = len(mesh.polygons)
 
-    # Recover selected and active objects
-    bpy.ops.object.select_all(action='DESELECT')
-    for o in ori_selects:
-        if is_greater_than_280(): o.select_set(True)
-        else: o.select = True
+    uvs = numpy.empty(len(mesh.loops) * 2, dtype=numpy.float32)
+    uv_layer.data.foreach_get('uv', uvs)
+    uvs = uvs.reshape(-1, 2)
 
-    if is_greater_than_280(): bpy.context.view_layer.objects.active = ori_obj
-    else: bpy.context.scene.objects.active = ori_obj
+    starts = numpy.empty(num_polys, dtype=numpy.int32)
+    totals = numpy.empty(num_polys, dtype=numpy.int32)
+    mesh.polygons.foreach_get('loop_start', starts)
+    mesh.polygons.foreach_get('loop_total', totals)
 
-    # Back to original mode
-    if ori_mode != ori_obj.mode:
-        bpy.ops.object.mode_set(mode=ori_mode)
+    # Loop indices of every polygon and their next loops
+    poly_ids = numpy.repeat(numpy.arange(num_polys), totals)
+    offsets = numpy.arange(len(poly_ids)) - numpy.repeat(numpy.cumsum(totals) - totals, totals)
+    loop_ids = starts[poly_ids] + offsets
+    next_ids = starts[poly_ids] + (offsets + 1) % totals[poly_ids]
 
-def actual_refresh_tangent_sign_vcol(obj, uv_name):
+    # Signed uv area of polygons
+    cross = uvs[loop_ids, 0] * uvs[next_ids, 1] - uvs[next_ids, 0] * uvs[loop_ids, 1]
+    areas = numpy.bincount(poly_ids, cross, minlength=num_polys)
 
-    if obj.type != 'MESH': return None
+    signs = numpy.ones(len(mesh.loops), dtype=numpy.float32)
+    signs[loop_ids] = numpy.where(areas[poly_ids] < 0.0, -1.0, 1.0)
 
-    # Cannot do this on edit mode
-    ori_obj = bpy.context.object
-    ori_mode = ori_obj.mode
-    if ori_mode != 'OBJECT':
-        bpy.ops.object.mode_set(mode='OBJECT')
+    return signs
 
-    # Select only relevant object
-    ori_selects = [o for o in bpy.context.selected_objects]
-    bpy.ops.object.select_all(action='DESELECT')
+def get_bitangent_signs(mesh, uv_name):
+    try: 
+        mesh.calc_tangents(uvmap=uv_name)
+        signs = numpy.empty(len(mesh.loops), dtype=numpy.float32)
+        mesh.loops.foreach_get('bitangent_sign', signs)
+        mesh.free_tangents()
 
-    if is_greater_than_280(): 
-        obj.select_set(True)
-        bpy.context.view_layer.objects.active = obj
-    else: 
-        obj.select = True
-        bpy.context.scene.objects.active = obj
+    # Tangents cannot be calculated on ngons
+    except: signs = get_polygon_bitangent_signs(mesh, mesh.uv_layers.get(uv_name))
 
-    # Set vertex color of bitangent sign
-    uv_layers = get_uv_layers(obj)
+    return signs
 
-    uv_layer = uv_layers.get(uv_name)
-    if uv_layer:
+def set_tangent_sign_vcol_data(vcol, signs):
+    if len(vcol.data) != len(signs): return
 
-        # Set uv as active
-        ori_layer_name = uv_layers.active.name
-        uv_layers.active = uv_layer
+    # Invert bitangent sign so the default value is 0.0 rather than 1.0
+    bs = 1.0 - numpy.maximum(signs, 0.0)
 
-        # Get vertex color
-        vcols = get_vertex_colors(obj)
-        vcol = vcols.get(TANGENT_SIGN_PREFIX + uv_name)
-        if not vcol:
-            try: 
-                vcol = new_vertex_color(obj, TANGENT_SIGN_PREFIX + uv_name)
-            except: 
-                recover_tangent_sign_process(ori_obj, ori_mode, ori_selects)
-                return None
+    cols = numpy.ones((len(bs), 4 if is_greater_than_280() else 3), dtype=numpy.float32)
+    cols[:, :3] = bs[:, None]
+    vcol.data.foreach_set('color', cols.ravel())
 
-            # Set default color to be white
-            if is_greater_than_280():
-                for d in vcol.data: 
-                    d.color = (1.0, 1.0, 1.0, 1.0)
-            else: 
-                for d in vcol.data: 
-                    d.color = (1.0, 1.0, 1.0)
+def actual_refresh_tangent_sign_vcol(obj, uv_name):
 
-        # Use try except because ngon can cause error 
-        try:
-            # Calc tangents
-            obj.data.calc_tangents()
+    if obj.type != 'MESH': return None
 
-            # Get vcol again after calculate tangent to prevent error
-            vcol = vcols.get(TANGENT_SIGN_PREFIX + uv_name)
-
-            # Set tangent sign to vertex color
-            i = 0
-            for poly in obj.data.polygons:
-                for idx in poly.loop_indices:
-                    vert = obj.data.loops[idx]
-                    bs = max(vert.bitangent_sign, 0.0)
-                    # Invert bitangent sign so the default value is 0.0 rather than 1.0
-                    bs = 1.0 - bs
-                    if is_greater_than_280():
-                        vcol.data[i].color = (bs, bs, bs, 1.0)
-                    else: vcol.data[i].color = (bs, bs, bs)
-                    i += 1
-
-        # If using ngon, need a temporary mesh
-        except:
-
-            # Remember selection
-            if is_greater_than_280():
-                ori_select = [o for o in bpy.context.view_layer.objects if o.select_get()]
-            else: ori_select = [o for o in bpy.context.scene.objects if o.select]
+    mesh = obj.data
+    uv_layer = mesh.uv_layers.get(uv_name)
+    if not uv_layer: return None
 
-            # If object has multi users, get all related objects
-            related_objs = []
-            if obj.data.users > 1:
-                for o in get_scene_objects():
-                    if o.data == obj.data and o != obj:
-                        related_objs.append(o)
+    # Cannot do this on edit mode
+    ori_obj = bpy.context.object
+    ori_mode = ori_obj.mode if ori_obj else 'OBJECT'
+    if ori_mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
 
-                # Make object data single user
-                obj.data = obj.data.copy()
+    # Get vertex color
+    vcol_name = TANGENT_SIGN_PREFIX + uv_name
+    vcols = get_vertex_colors(obj)
+    vcol = vcols.get(vcol_name)
 
-            temp_ob = obj.copy()
-            temp_ob.data = obj.data.copy()
-            temp_ob.name = '___TEMP__'
+    # Skip if uv and topology are not changed since the last refresh
+    cache_kind = 'TANGENT_SIGN ' + uv_name
+    mesh_hash = mesh_cache.get_mesh_hash(mesh, uv_name)
 
-            if is_greater_than_280():
-                bpy.context.scene.collection.objects.link(temp_ob)
-                bpy.context.view_layer.objects.active = temp_ob
-            else: 
-                bpy.context.scene.objects.link(temp_ob)
-                bpy.context.scene.objects.active = temp_ob
-
-            # Triangulate ngon faces on temp object
-            bpy.ops.object.select_all(action='DESELECT')
-            bpy.ops.object.mode_set(mode='EDIT')
-            bpy.ops.mesh.reveal()
-            bpy.ops.mesh.select_all(action='DESELECT')
-            bpy.ops.mesh.select_mode(type="FACE")
-            bpy.ops.mesh.select_face_by_sides(number=4, type='GREATER')
-            bpy.ops.mesh.quads_convert_to_tris()
-            bpy.ops.mesh.tris_convert_to_quads()
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-            # Remove all modifiers on temp object
-            for mod in temp_ob.modifiers:
-                bpy.ops.object.modifier_remove(modifier=mod.name)
-
-            # Calc tangents
-            temp_ob.data.calc_tangents()
-
-            # Set tangent sign to vertex color
-            tvcols = get_vertex_colors(temp_ob)
-            temp_vcol = tvcols.get(TANGENT_SIGN_PREFIX + uv_name)
-            i = 0
-            for poly in temp_ob.data.polygons:
-                for idx in poly.loop_indices:
-                    vert = temp_ob.data.loops[idx]
-                    bs = max(vert.bitangent_sign, 0.0)
-                    # Invert bitangent sign so the default value is 0.0 rather than 1.0
-                    bs = 1.0 - bs
-                    if is_greater_than_280():
-                        temp_vcol.data[i].color = (bs, bs, bs, 1.0)
-                    else: temp_vcol.data[i].color = (bs, bs, bs)
-                    i += 1
-
-            # Set active object back to the original mesh
-            if is_greater_than_280():
-                bpy.context.view_layer.objects.active = obj
-            else: bpy.context.scene.objects.active = obj
-
-            # Number of original modifiers
-            num_mods = len(obj.modifiers)
-
-            # Remember original enabled modifiers
-            ori_show_render_mods = []
-            ori_show_viewport_mods = []
-            for m in obj.modifiers:
-                ori_show_viewport_mods.append(m.show_viewport)
-                ori_show_render_mods.append(m.show_render)
-                m.show_viewport = False
-                m.show_render = False
-            
-            # Add data transfer to original object
-            mod_name = 'Transferz'
-            mod = obj.modifiers.new(mod_name, 'DATA_TRANSFER')
-
-            # Move data transfer modifier to the top
-            #for i in range(len(obj.modifiers)-1):
-            for i in range(num_mods):
-                bpy.ops.object.modifier_move_up(modifier=mod_name)
-                
-            # Set transfer object
-            mod.object = temp_ob
-            mod.use_loop_data = True
-            mod.data_types_loops = {'VCOL'}
-            
-            # Apply modifier
-            bpy.ops.object.modifier_apply(modifier=mod_name)
-
-            # Recover original enabled modifiers
-            for i, m in enumerate(obj.modifiers):
-                if ori_show_viewport_mods[i]:
-                    m.show_viewport = ori_show_viewport_mods[i]
-                if ori_show_render_mods[i]:
-                    m.show_render = ori_show_render_mods[i]
-
-            # Delete temp object
-            temp_me = temp_ob.data
-            bpy.data.objects.remove(temp_ob)
-            bpy.data.meshes.remove(temp_me)
-
-            # Set back original select
-            for o in ori_select:
-                if is_greater_than_280():
-                    o.select_set(True)
-                else: o.select = True
-
-            # Bring object data to related objects
-            if related_objs:
-                ori_mesh = related_objs[0].data
-                ori_name = ori_mesh.name
-                for o in related_objs:
-                    o.data = obj.data
-
-                bpy.data.meshes.remove(ori_mesh)
-                o.data.name = ori_name
-
-        # Recover active uv
-        set_active_uv_layer(obj, ori_layer_name)
-
-        # Recovers
-        recover_tangent_sign_process(ori_obj, ori_mode, ori_selects)
-
-        # Get vcol again to make sure the data is consistent
-        vcols = get_vertex_colors(obj)
-        vcol = vcols.get(TANGENT_SIGN_PREFIX + uv_name)
+    if not vcol or not mesh_cache.get_cached_mesh_data(mesh, cache_kind, mesh_hash):
 
-        return vcol
+        if not vcol:
+            try: vcol = new_vertex_color(obj, vcol_name)
+            except: vcol = None
+
+        if vcol:
+            signs = get_bitangent_signs(mesh, uv_name)
+
+            # Get vcol again after calculate tangent to prevent error
+            vcol = vcols.get(vcol_name)
+            set_tangent_sign_vcol_data(vcol, signs)
+            mesh_cache.set_cached_mesh_data(mesh, cache_kind, mesh_hash, True)
 
-    # Recovers
-    recover_tangent_sign_process(ori_obj, ori_mode, ori_selects)
+    # Back to original mode
+    if ori_mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode=ori_mode)
 
-    return None
+    return vcol
 
 def refresh_tangent_sign_vcol(obj, uv_name):
 
@@ -2564,9 +2433,9 @@ def check_layer_channel_linear_node(ch, layer=None, root_ch=None, reconnect=Fals
     yp = ch.id_data.yp
 
     if not layer or not root_ch:
-        match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', ch.path_from_id())
-        layer = yp.layers[int(match.group(1))]
-        root_ch = yp.channels[int(match.group(2))]
+        addr = get_entity_address(ch)
+        layer = yp.layers[addr.layer_idx]
+        root_ch = yp.channels[addr.ch_idx]
 
     source_tree = get_channel_source_tree(ch, layer)
 
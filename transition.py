@@ -86,8 +86,8 @@ def check_transition_ao_nodes(tree, layer, ch, bump_ch=None):
     elif bump_ch != ch and ch.enable_transition_ao:
 
         yp = ch.id_data.yp
-        match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', ch.path_from_id())
-        root_ch = yp.channels[int(match.group(2))]
+        addr = get_entity_address(ch)
+        root_ch = yp.channels[addr.ch_idx]
 
         #if layer.type == 'BACKGROUND' and ch.transition_ao_blend_type == 'MIX':
         if layer.type == 'BACKGROUND' and bump_ch.transition_bump_flip and ch.transition_ao_blend_type == 'MIX':
@@ -172,8 +172,8 @@ def set_ramp_intensity_value(tree, layer, ch):
 def set_transition_ramp_nodes(tree, layer, ch):
 
     yp = ch.id_data.yp
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', ch.path_from_id())
-    root_ch = yp.channels[int(match.group(2))]
+    addr = get_entity_address(ch)
+    root_ch = yp.channels[addr.ch_idx]
 
     bump_ch = get_transition_bump_channel(layer)
 
@@ -510,8 +510,8 @@ def remove_transition_bump_nodes(layer, tree, ch, ch_index):
 def update_transition_ramp_intensity_value(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
 
     set_ramp_intensity_value(tree, layer, self)
@@ -519,9 +519,9 @@ def update_transition_ramp_intensity_value(self, context):
 def update_transition_bump_crease_factor(self, context):
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    root_ch = yp.channels[int(match.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    root_ch = yp.channels[addr.ch_idx]
     tree = get_tree(layer)
     ch = self
 
@@ -552,9 +552,9 @@ def update_transition_bump_crease_power(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    #root_ch = yp.channels[int(match.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    #root_ch = yp.channels[addr.ch_idx]
     tree = get_tree(layer)
     ch = self
 
@@ -573,9 +573,9 @@ def update_transition_bump_falloff_emulated_curve_fac(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    #root_ch = yp.channels[int(match.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    #root_ch = yp.channels[addr.ch_idx]
     tree = get_tree(layer)
     ch = self
 
@@ -596,8 +596,8 @@ def update_transition_bump_value(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
     ch = self
 
@@ -655,9 +655,9 @@ def update_transition_bump_distance(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    ch_index = int(match.group(2))
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    ch_index = addr.ch_idx
     root_ch = yp.channels[ch_index]
     ch = self
     tree = get_tree(layer)
@@ -695,10 +695,10 @@ def update_transition_bump_chain(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
-    root_ch = yp.channels[int(m.group(2))]
+    root_ch = yp.channels[addr.ch_idx]
     ch = self
 
     #if ch.enable_transition_bump and ch.enable:
@@ -719,8 +719,8 @@ def update_transition_bump_curved_offset(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
     ch = self
 
@@ -732,8 +732,8 @@ def update_transition_bump_fac(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    m = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(m.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     tree = get_tree(layer)
     ch = self
 
@@ -769,8 +769,8 @@ def update_transition_ao_intensity(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     ch = self
     tree = get_tree(layer)
 
@@ -784,8 +784,8 @@ def update_transition_ao_edge(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     ch = self
     tree = get_tree(layer)
 
@@ -799,8 +799,8 @@ def update_transition_ao_color(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     ch = self
     tree = get_tree(layer)
 
@@ -813,8 +813,8 @@ def update_transition_ao_exclude_inside(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     ch = self
     tree = get_tree(layer)
 
@@ -828,12 +828,12 @@ def show_transition(self, context, ttype):
         return {'CANCELLED'}
 
     yp = context.parent.id_data.yp
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', context.parent.path_from_id())
-    if not match: 
+    addr = get_entity_address(context.parent)
+    if not addr or not addr.kind.startswith('LAYER_CHANNEL'): 
         self.report({'ERROR'}, "Context is incorrect!")
         return {'CANCELLED'}
-    layer = yp.layers[int(match.group(1))]
-    root_ch = yp.channels[int(match.group(2))]
+    layer = yp.layers[addr.layer_idx]
+    root_ch = yp.channels[addr.ch_idx]
     ch = context.parent
 
     bump_ch = get_transition_bump_channel(layer)
@@ -964,12 +964,12 @@ class YHideTransitionEffect(bpy.types.Operator):
             return {'CANCELLED'}
 
         yp = context.parent.id_data.yp
-        match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', context.parent.path_from_id())
-        if not match: 
+        addr = get_entity_address(context.parent)
+        if not addr or not addr.kind.startswith('LAYER_CHANNEL'): 
             self.report({'ERROR'}, "Context is incorrect!")
             return {'CANCELLED'}
-        layer = yp.layers[int(match.group(1))]
-        root_ch = yp.channels[int(match.group(2))]
+        layer = yp.layers[addr.layer_idx]
+        root_ch = yp.channels[addr.ch_idx]
         ch = context.parent
 
         if self.type == 'BUMP' and root_ch.type != 'NORMAL':
@@ -997,8 +997,8 @@ def update_enable_transition_ao(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
     ch = self
 
     tree = get_tree(layer)
@@ -1023,9 +1023,9 @@ def update_enable_transition_ramp(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    root_ch = yp.channels[int(match.group(2))]
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    root_ch = yp.channels[addr.ch_idx]
     ch = self
 
     tree = get_tree(layer)
@@ -1049,9 +1049,9 @@ def update_enable_transition_bump(self, context):
 
     yp = self.id_data.yp
     if yp.halt_update or not self.enable: return
-    match = re.match(r'yp\.layers\[(\d+)\]\.channels\[(\d+)\]', self.path_from_id())
-    layer = yp.layers[int(match.group(1))]
-    ch_index = int(match.group(2))
+    addr = get_entity_address(self)
+    layer = yp.layers[addr.layer_idx]
+    ch_index = addr.ch_idx
     root_ch = yp.channels[ch_index]
     ch = self
     tree = get_tree(layer)
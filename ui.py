@@ -5,6 +5,36 @@ from . import lib, Modifier, MaskModifier, NormalMapModifier, Root
 from .common import *
 #from .subtree import *
 
+# Expand props copied from entities to their UI objects
+channel_ui_props = ['expand_content', 'expand_base_vector', 'expand_subdiv_settings', 'expand_parallax_settings',
+        'expand_alpha_settings', 'expand_smooth_bump_settings']
+layer_ui_props = ['expand_content', 'expand_vector', 'expand_source', 'expand_masks', 'expand_channels']
+layer_channel_ui_props = ['expand_bump_settings', 'expand_intensity_settings', 'expand_transition_bump_settings',
+        'expand_transition_ramp_settings', 'expand_transition_ao_settings', 'expand_input_settings',
+        'expand_source', 'expand_source_1', 'expand_content']
+mask_ui_props = ['expand_content', 'expand_channels', 'expand_source', 'expand_vector']
+modifier_ui_props = ['expand_content']
+
+# Layer generation of the last synced UI, {tree name : generation}
+_ui_layer_generations = {}
+
+def copy_changed_ui_props(ui_obj, entity, props):
+    # Only set props that are different, so unchanged UI objects are not touched
+    for prop in props:
+        val = getattr(entity, prop)
+        if getattr(ui_obj, prop) != val:
+            setattr(ui_obj, prop, val)
+
+def sync_ui_collection(ui_objs, entities, props):
+    ''' Resize UI collection to match the entities by adding or removing the tail items, then copy the changed props '''
+    while len(ui_objs) > len(entities):
+        ui_objs.remove(len(ui_objs) - 1)
+    while len(ui_objs) < len(entities):
+        ui_objs.add()
+
+    for ui_obj, entity in zip(ui_objs, entities):
+        copy_changed_ui_props(ui_obj, entity, props)
+
 def update_yp_ui():
 
     # Get active yp node
@@ -19,11 +49,15 @@ def update_yp_ui():
         if len(ypui.layer_ui.channels) != len(yp.channels):
             ypui.need_update = True
 
+    # Layer structure changes bump the layer generation
+    generation = get_layer_generation(yp)
+
     # Update UI
     if (ypui.tree_name != tree.name or 
         ypui.layer_idx != yp.active_layer_index or 
         ypui.channel_idx != yp.active_channel_index or 
-        ypui.need_update
+        ypui.need_update or
+        _ui_layer_generations.get(tree.name) != generation
         ):
 
         ypui.tree_name = tree.name
@@ -31,78 +65,35 @@ def update_yp_ui():
         ypui.channel_idx = yp.active_channel_index
         ypui.need_update = False
         ypui.halt_prop_update = True
+        _ui_layer_generations[tree.name] = generation
 
         if len(yp.channels) > 0:
 
-            # Get channel
+            # Sync channel UI objects
             channel = yp.channels[yp.active_channel_index]
-            ypui.channel_ui.expand_content = channel.expand_content
-            ypui.channel_ui.expand_base_vector = channel.expand_base_vector
-            ypui.channel_ui.expand_subdiv_settings = channel.expand_subdiv_settings
-            ypui.channel_ui.expand_parallax_settings = channel.expand_parallax_settings
-            ypui.channel_ui.expand_alpha_settings = channel.expand_alpha_settings
-            ypui.channel_ui.expand_smooth_bump_settings = channel.expand_smooth_bump_settings
-            ypui.channel_ui.modifiers.clear()
-
-            # Construct channel UI objects
-            for i, mod in enumerate(channel.modifiers):
-                m = ypui.channel_ui.modifiers.add()
-                m.expand_content = mod.expand_content
+            copy_changed_ui_props(ypui.channel_ui, channel, channel_ui_props)
+            sync_ui_collection(ypui.channel_ui.modifiers, channel.modifiers, modifier_ui_props)
 
         if len(yp.layers) > 0:
 
             # Get layer
             layer = yp.layers[yp.active_layer_index]
-            ypui.layer_ui.expand_content = layer.expand_content
-            ypui.layer_ui.expand_vector = layer.expand_vector
-            ypui.layer_ui.expand_source = layer.expand_source
-            ypui.layer_ui.expand_masks = layer.expand_masks
-            ypui.layer_ui.expand_channels = layer.expand_channels
-            ypui.layer_ui.channels.clear()
-            ypui.layer_ui.masks.clear()
-            ypui.layer_ui.modifiers.clear()
-
-            # Construct layer modifier UI objects
-            for mod in layer.modifiers:
-                m = ypui.layer_ui.modifiers.add()
-                m.expand_content = mod.expand_content
-            
-            # Construct layer channel UI objects
-            for i, ch in enumerate(layer.channels):
-                c = ypui.layer_ui.channels.add()
-                c.expand_bump_settings = ch.expand_bump_settings
-                c.expand_intensity_settings = ch.expand_intensity_settings
-                c.expand_transition_bump_settings = ch.expand_transition_bump_settings
-                c.expand_transition_ramp_settings = ch.expand_transition_ramp_settings
-                c.expand_transition_ao_settings = ch.expand_transition_ao_settings
-                c.expand_input_settings = ch.expand_input_settings
-                c.expand_source = ch.expand_source
-                c.expand_source_1 = ch.expand_source_1
-                c.expand_content = ch.expand_content
-
-                for mod in ch.modifiers:
-                    m = c.modifiers.add()
-                    m.expand_content = mod.expand_content
+            copy_changed_ui_props(ypui.layer_ui, layer, layer_ui_props)
 
-                for mod in ch.modifiers_1:
-                    m = c.modifiers_1.add()
-                    m.expand_content = mod.expand_content
-
-            # Construct layer masks UI objects
-            for i, mask in enumerate(layer.masks):
-                m = ypui.layer_ui.masks.add()
-                m.expand_content = mask.expand_content
-                m.expand_channels = mask.expand_channels
-                m.expand_source = mask.expand_source
-                m.expand_vector = mask.expand_vector
-
-                for mch in mask.channels:
-                    mc = m.channels.add()
-                    mc.expand_content = mch.expand_content
-
-                for mod in mask.modifiers:
-                    mm = m.modifiers.add()
-                    mm.expand_content = mod.expand_content
+            # Sync layer modifier UI objects
+            sync_ui_collection(ypui.layer_ui.modifiers, layer.modifiers, modifier_ui_props)
+            
+            # Sync layer channel UI objects
+            sync_ui_collection(ypui.layer_ui.channels, layer.channels, layer_channel_ui_props)
+            for c, ch in zip(ypui.layer_ui.channels, layer.channels):
+                sync_ui_collection(c.modifiers, ch.modifiers, modifier_ui_props)
+                sync_ui_collection(c.modifiers_1, ch.modifiers_1, modifier_ui_props)
+
+            # Sync layer masks UI objects
+            sync_ui_collection(ypui.layer_ui.masks, layer.masks, mask_ui_props)
+            for m, mask in zip(ypui.layer_ui.masks, layer.masks):
+                sync_ui_collection(m.channels, mask.channels, modifier_ui_props)
+                sync_ui_collection(m.modifiers, mask.modifiers, modifier_ui_props)
 
         ypui.halt_prop_update = False
 
@@ -156,8 +147,9 @@ def draw_image_props(context, source, layout, entity=None, show_flip_y=False):
         else: col.label(text=image.name, icon_value=lib.get_icon('image'))
         if segment:
             row = col.row()
-            row.label(text='Tile X: ' + str(segment.tile_x))
-            row.label(text='Tile Y: ' + str(segment.tile_y))
+            start_x, start_y = get_segment_start(segment)
+            row.label(text='Start X: ' + str(start_x))
+            row.label(text='Start Y: ' + str(start_y))
             row = col.row()
             row.label(text='Width: ' + str(segment.width))
             row.label(text='Height: ' + str(segment.height))
@@ -2629,6 +2621,10 @@ def main_draw(self, context):
         print('INFO: Scene is updated at', '{:0.2f}'.format((time.time() - float(wm.yptimer.time)) * 1000), 'ms!')
         wm.yptimer.time = ''
 
+    # Report active node lookups of previous redraw
+    if get_user_preferences().developer_mode:
+        report_active_node_lookups()
+
     # Update ui props first
     update_yp_ui()
 
@@ -2951,64 +2947,118 @@ class NODE_UL_YPaint_channels(bpy.types.UIList):
                     row.prop(inputs[item.io_index+1], 'default_value', text='')
                 else: row.label(text='', icon='LINKED')
 
+class LayerRow():
+    ''' Precomputed data to draw a layer row, channels and masks are stored as indices '''
+    def __init__(self, layer, layer_idx):
+        yp = layer.id_data.yp
+        hierarchy = get_layer_hierarchy(yp)
+        layer_tree = get_tree(layer)
+
+        self.pointer = layer.as_pointer()
+        self.depth = hierarchy.depths[layer_idx] if layer.parent_idx != -1 else 0
+        self.is_hidden = not hierarchy.hidden[layer_idx]
+
+        # Try to get image
+        self.image = None
+        if layer.type == 'IMAGE':
+            source = get_layer_source(layer, layer_tree)
+            self.image = source.image
+
+        self.all_override_ids = []
+        self.selectable_override_ids = []
+        self.active_override_idx = -1
+        self.override_idx = 0
+
+        # Override images, {(channel index, override index) : image}
+        self.override_images = {}
+
+        for i, c in enumerate(layer.channels):
+            if (c.override and c.override_type != 'DEFAULT') or (c.override_1 and c.override_1_type != 'DEFAULT'):
+                if c.enable: self.selectable_override_ids.append(i)
+                self.all_override_ids.append(i)
+                if c.active_edit or c.active_edit_1:
+                    self.active_override_idx = i
+                if c.active_edit_1:
+                    self.override_idx = 1
+
+                if c.override and c.override_type == 'IMAGE':
+                    src = get_channel_source(c, layer, layer_tree)
+                    if src: self.override_images[(i, 0)] = src.image
+                if c.override_1 and c.override_1_type == 'IMAGE':
+                    src = get_channel_source_1(c, layer, layer_tree)
+                    if src: self.override_images[(i, 1)] = src.image
+
+        self.all_mask_ids = []
+        self.selectable_mask_ids = []
+        self.active_mask_idx = -1
+
+        # Mask images, {mask index : image}
+        self.mask_images = {}
+
+        for i, m in enumerate(layer.masks):
+            if m.enable: self.selectable_mask_ids.append(i)
+            self.all_mask_ids.append(i)
+            if m.active_edit:
+                self.active_mask_idx = i
+
+            if m.type == 'IMAGE':
+                src = get_mask_source(m)
+                if src: self.mask_images[i] = src.image
+
+    def is_valid(self):
+        # Removed images will raise reference error
+        try:
+            for image in [self.image] + list(self.override_images.values()) + list(self.mask_images.values()):
+                if image: image.name
+        except ReferenceError: return False
+        return True
+
+def get_layer_row(layer, layer_idx):
+    tree = layer.id_data
+    yp = tree.yp
+    layer_generation = get_layer_generation(yp)
+
+    rows = LayerRows.trees.get(tree.name)
+    if not rows or rows.layer_generation != layer_generation or rows.row_generation != LayerRows.generation:
+        rows = LayerRows.trees[tree.name] = LayerRows(layer_generation)
+
+    row = rows.rows.get(layer_idx)
+    if not row or row.pointer != layer.as_pointer() or not row.is_valid():
+        row = rows.rows[layer_idx] = LayerRow(layer, layer_idx)
+
+    return row
+
 class NODE_UL_YPaint_layers(bpy.types.UIList):
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
 
         group_tree = item.id_data
         yp = group_tree.yp
-        nodes = group_tree.nodes
         layer = item
-        layer_tree = get_tree(layer)
         obj = context.object
         ypup = get_user_preferences()
 
-        is_hidden = not is_parent_hidden(layer)
+        layer_row = get_layer_row(layer, index)
+        is_hidden = layer_row.is_hidden
 
         master = layout.row(align=True)
         row = master.row(align=True)
 
-        # Try to get image
-        image = None
-        if layer.type == 'IMAGE':
-            source = get_layer_source(layer, layer_tree)
-            image = source.image
-
-        # Try to get vertex color
-        #vcol = None
-        #if layer.type == 'VCOL':
-        #    source = get_layer_source(layer, layer_tree)
-        #    vcol = get_vcol_from_source(obj, source)
-
-        all_overrides = []
-        selectable_overrides = []
-        active_override = None
-        override_idx = 0
-        for c in layer.channels:
-            #if not c.enable: continue
-            if (c.override and c.override_type != 'DEFAULT') or (c.override_1 and c.override_1_type != 'DEFAULT'):
-                if c.enable: selectable_overrides.append(c)
-                all_overrides.append(c)
-                if c.active_edit or c.active_edit_1:
-                    active_override = c
-                if c.active_edit_1:
-                    override_idx = 1
+        image = layer_row.image
 
-        # Try to get image masks
-        all_masks = []
-        selectable_masks = []
+        all_overrides = [layer.channels[i] for i in layer_row.all_override_ids]
+        selectable_overrides = [layer.channels[i] for i in layer_row.selectable_override_ids]
+        override_idx = layer_row.override_idx
+        active_override = layer.channels[layer_row.active_override_idx] if layer_row.active_override_idx != -1 else None
+
+        all_masks = [layer.masks[i] for i in layer_row.all_mask_ids]
+        selectable_masks = [layer.masks[i] for i in layer_row.selectable_mask_ids]
         active_mask = None
-        for m in layer.masks:
-            #if m.type in {'IMAGE', 'VCOL'}:
-            if m.enable: selectable_masks.append(m)
-            all_masks.append(m)
-            if m.active_edit:
-                active_mask = m
-                active_override = m
+        if layer_row.active_mask_idx != -1:
+            active_mask = layer.masks[layer_row.active_mask_idx]
+            active_override = active_mask
 
-        if layer.parent_idx != -1:
-            depth = get_layer_depth(layer)
-            for i in range(depth):
-                row.label(text='', icon='BLANK1')
+        for i in range(layer_row.depth):
+            row.label(text='', icon='BLANK1')
 
         # Image icon
         if len(all_masks) == 0 and len(all_overrides) == 0:
@@ -3083,17 +3133,16 @@ class NODE_UL_YPaint_layers(bpy.types.UIList):
         active_override_image = None
         #active_override_vcol = None
         override_ch = None
-        for c in selectable_overrides:
+        for ch_idx, c in zip(layer_row.selectable_override_ids, selectable_overrides):
             if c.override and c.override_type != 'DEFAULT' and c.normal_map_type in {'BUMP_MAP', 'BUMP_NORMAL_MAP'}:
                 row = master.row(align=True)
                 row.active = c.active_edit
                 if c.active_edit:
-                    #src = layer_tree.nodes.get(c.source)
-                    src = get_channel_source(c, layer)
+                    src_image = layer_row.override_images.get((ch_idx, 0))
                     override_ch = c
-                    if src and c.override_type == 'IMAGE':
-                        active_override_image = src.image
-                        if src.image.preview and ypup.use_image_preview: row.label(text='', icon_value=src.image.preview.icon_id)
+                    if src_image and c.override_type == 'IMAGE':
+                        active_override_image = src_image
+                        if src_image.preview and ypup.use_image_preview: row.label(text='', icon_value=src_image.preview.icon_id)
                         else: row.label(text='', icon_value=lib.get_icon('image'))
                     elif c.override_type == 'VCOL':
                         #active_override_vcol = c
@@ -3103,10 +3152,9 @@ class NODE_UL_YPaint_layers(bpy.types.UIList):
                         row.label(text='', icon_value=lib.get_icon('texture'))
                 else:
                     if c.override_type == 'IMAGE':
-                        #src = layer_tree.nodes.get(c.source)
-                        src = get_channel_source(c, layer)
-                        if src: 
-                            if src.image.preview and ypup.use_image_preview: row.prop(c, 'active_edit', text='', emboss=False, icon_value=src.image.preview.icon_id)
+                        src_image = layer_row.override_images.get((ch_idx, 0))
+                        if src_image: 
+                            if src_image.preview and ypup.use_image_preview: row.prop(c, 'active_edit', text='', emboss=False, icon_value=src_image.preview.icon_id)
                             else: row.prop(c, 'active_edit', text='', emboss=False, icon_value=lib.get_icon('image'))
                     elif c.override_type == 'VCOL':
                         row.prop(c, 'active_edit', text='', emboss=False, icon_value=lib.get_icon('vertex_color'))
@@ -3117,33 +3165,32 @@ class NODE_UL_YPaint_layers(bpy.types.UIList):
                 row = master.row(align=True)
                 row.active = c.active_edit_1
                 if c.active_edit_1:
-                    src = get_channel_source_1(c, layer)
+                    src_image = layer_row.override_images.get((ch_idx, 1))
                     override_ch = c
-                    if src and c.override_1_type == 'IMAGE':
-                        active_override_image = src.image
-                        if src.image.preview and ypup.use_image_preview: row.label(text='', icon_value=src.image.preview.icon_id)
+                    if src_image and c.override_1_type == 'IMAGE':
+                        active_override_image = src_image
+                        if src_image.preview and ypup.use_image_preview: row.label(text='', icon_value=src_image.preview.icon_id)
                         else: row.label(text='', icon_value=lib.get_icon('image'))
                 else:
                     if c.override_1_type == 'IMAGE':
-                        src = get_channel_source_1(c, layer)
-                        if src: 
-                            if src.image.preview and ypup.use_image_preview: row.prop(c, 'active_edit_1', text='', emboss=False, icon_value=src.image.preview.icon_id)
+                        src_image = layer_row.override_images.get((ch_idx, 1))
+                        if src_image: 
+                            if src_image.preview and ypup.use_image_preview: row.prop(c, 'active_edit_1', text='', emboss=False, icon_value=src_image.preview.icon_id)
                             else: row.prop(c, 'active_edit_1', text='', emboss=False, icon_value=lib.get_icon('image'))
 
         # Mask icons
         active_mask_image = None
         active_vcol_mask = None
         mask = None
-        for m in selectable_masks:
-            mask_tree = get_mask_tree(m)
+        for mask_idx, m in zip(layer_row.selectable_mask_ids, selectable_masks):
+            src_image = layer_row.mask_images.get(mask_idx)
             row = master.row(align=True)
             row.active = m.active_edit
             if m.active_edit:
                 mask = m
-                src = mask_tree.nodes.get(m.source)
                 if m.type == 'IMAGE':
-                    active_mask_image = src.image
-                    if src.image.preview and ypup.use_image_preview: row.label(text='', icon_value=src.image.preview.icon_id)
+                    active_mask_image = src_image
+                    if src_image and src_image.preview and ypup.use_image_preview: row.label(text='', icon_value=src_image.preview.icon_id)
                     else: row.label(text='', icon_value=lib.get_icon('image'))
                 elif m.type == 'VCOL':
                     active_vcol_mask = m
@@ -3158,8 +3205,7 @@ class NODE_UL_YPaint_layers(bpy.types.UIList):
                     row.label(text='', icon_value=lib.get_icon('texture'))
             else:
                 if m.type == 'IMAGE':
-                    src = mask_tree.nodes.get(m.source)
-                    if src.image.preview and ypup.use_image_preview: row.prop(m, 'active_edit', text='', emboss=False, icon_value=src.image.preview.icon_id)
+                    if src_image and src_image.preview and ypup.use_image_preview: row.prop(m, 'active_edit', text='', emboss=False, icon_value=src_image.preview.icon_id)
                     else: row.prop(m, 'active_edit', text='', emboss=False, icon_value=lib.get_icon('image'))
                 elif m.type == 'VCOL':
                     #row.prop(m, 'active_edit', text='', emboss=False, icon='GROUP_VCOL')
@@ -3227,7 +3273,7 @@ class NODE_UL_YPaint_layers(bpy.types.UIList):
         shortcut_found = False
 
         if layer.type == 'COLOR' and layer.color_shortcut:
-            src = get_layer_source(layer, layer_tree)
+            src = get_layer_source(layer)
             rrow = row.row()
             rrow.prop(src.outputs[0], 'default_value', text='', icon='COLOR')
             shortcut_found = True
@@ -0,0 +1,287 @@
+import bpy, time, math, numpy
+from .common import *
+from . import image_buffer, mesh_cache
+
+# Bake types that only need vertex or loop data, so they can be rasterized without Cycles
+vertex_bake_types = {'SELECTED_VERTICES', 'POINTINESS'}
+
+# Modifiers that are already disabled by bake to layer
+ignored_bake_modifiers = {'SOLIDIFY', 'MIRROR', 'ARRAY'}
+
+# Max number of pixel samples processed at once
+CHUNK_SIZE = 1 << 20
+
+# Barycentric tolerance so pixels exactly on shared edges are not missed
+EDGE_EPSILON = 1e-6
+
+def is_rasterizable(obj):
+    ''' Rasterizer uses original mesh data, so there should be no modifier that changes the shape on render '''
+    for mod in obj.modifiers:
+        if mod.show_render and mod.type not in ignored_bake_modifiers:
+            return False
+    return True
+
+def linear_to_srgb_array(arr):
+    return numpy.where(arr <= 0.0031308, arr * 12.92, 1.055 * numpy.power(numpy.maximum(arr, 0.0), 1.0 / 2.4) - 0.055)
+
+def next_power_of_two(arr):
+    return numpy.left_shift(1, numpy.ceil(numpy.log2(numpy.maximum(arr, 1))).astype(numpy.int64))
+
+def get_loop_vertex_indices(mesh):
+    arr = numpy.empty(len(mesh.loops), dtype=numpy.int32)
+    mesh.loops.foreach_get('vertex_index', arr)
+    return arr
+
+def get_loop_uvs(mesh, uv_name):
+    uvl = mesh.uv_layers.get(uv_name)
+    if not uvl: return None
+
+    arr = numpy.empty(len(mesh.loops) * 2, dtype=numpy.float32)
+    uvl.data.foreach_get('uv', arr)
+    return arr.reshape(-1, 2)
+
+def get_triangles(mesh, material_indices=None):
+    ''' Triangulate mesh, returns loop indices of the triangles with shape (n, 3) '''
+    tris, poly_ids = mesh_cache.get_loop_triangles(mesh)
+
+    if material_indices != None:
+        mat_ids = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+        mesh.polygons.foreach_get('material_index', mat_ids)
+        tris = tris[numpy.isin(mat_ids[poly_ids], material_indices)]
+
+    return tris
+
+def get_bake_material_indices(obj, mat=None, force_bake_all_polygons=False):
+    ''' Material indices of polygons that should be baked, None means all polygons '''
+    materials = obj.data.materials
+    if not mat or force_bake_all_polygons or len(materials) <= 1:
+        return None
+    return [i for i, m in enumerate(materials) if m == mat]
+
+def rasterize_triangles(values, mask, tri_uvs, tri_values):
+    ''' Rasterize triangles to values array with shape (height, width, channels) using barycentric interpolation
+        tri_uvs has shape (n, 3, 2) and tri_values has shape (n, 3, channels), covered pixels are marked on mask
+    '''
+    height, width = mask.shape
+    pts = tri_uvs.astype(numpy.float64) * (width, height)
+    xs = pts[:, :, 0]
+    ys = pts[:, :, 1]
+
+    # Pixel is covered if its center is inside the triangle
+    x0 = numpy.maximum(numpy.ceil(xs.min(axis=1) - 0.5), 0).astype(numpy.int64)
+    x1 = numpy.minimum(numpy.floor(xs.max(axis=1) - 0.5), width - 1).astype(numpy.int64)
+    y0 = numpy.maximum(numpy.ceil(ys.min(axis=1) - 0.5), 0).astype(numpy.int64)
+    y1 = numpy.minimum(numpy.floor(ys.max(axis=1) - 0.5), height - 1).astype(numpy.int64)
+
+    # Area of the triangles, degenerate ones are skipped
+    area = (ys[:, 1] - ys[:, 2]) * (xs[:, 0] - xs[:, 2]) + (xs[:, 2] - xs[:, 1]) * (ys[:, 0] - ys[:, 2])
+
+    ids = numpy.nonzero((x1 >= x0) & (y1 >= y0) & (numpy.abs(area) > 1e-12))[0]
+    if len(ids) == 0: return
+
+    # Bounding box width is rounded to power of two, so similar triangles can be processed together
+    box_width = next_power_of_two(x1[ids] - x0[ids] + 1)
+    box_height = y1[ids] - y0[ids] + 1
+
+    # Tall bounding boxes are split into strips so a single triangle always fits the chunk
+    max_rows = numpy.left_shift(1, numpy.floor(numpy.log2(numpy.maximum(CHUNK_SIZE // box_width, 1))).astype(numpy.int64))
+    strip_height = numpy.minimum(next_power_of_two(box_height), max_rows)
+    num_strips = (box_height + strip_height - 1) // strip_height
+
+    strip_ids = numpy.repeat(ids, num_strips)
+    strip_index = numpy.arange(len(strip_ids)) - numpy.repeat(numpy.cumsum(num_strips) - num_strips, num_strips)
+    strip_width = numpy.repeat(box_width, num_strips)
+    strip_height = numpy.repeat(strip_height, num_strips)
+    strip_y0 = y0[strip_ids] + strip_index * strip_height
+    strip_y1 = numpy.minimum(strip_y0 + strip_height - 1, y1[strip_ids])
+
+    keys = strip_width * (CHUNK_SIZE + 1) + strip_height
+    for key in numpy.unique(keys):
+        sel = numpy.nonzero(keys == key)[0]
+        bw = int(strip_width[sel[0]])
+        bh = int(strip_height[sel[0]])
+        oy, ox = numpy.divmod(numpy.arange(bw * bh), bw)
+        batch_size = max(1, CHUNK_SIZE // (bw * bh))
+
+        for start in range(0, len(sel), batch_size):
+            batch = sel[start : start + batch_size]
+            tri = strip_ids[batch]
+
+            px = x0[tri][:, None] + ox
+            py = strip_y0[batch][:, None] + oy
+            inside = (px <= x1[tri][:, None]) & (py <= strip_y1[batch][:, None])
+
+            ax, ay = xs[tri, 0][:, None], ys[tri, 0][:, None]
+            bx, by = xs[tri, 1][:, None], ys[tri, 1][:, None]
+            cx, cy = xs[tri, 2][:, None], ys[tri, 2][:, None]
+            d = area[tri][:, None]
+
+            dx = px + 0.5 - cx
+            dy = py + 0.5 - cy
+            w0 = ((by - cy) * dx + (cx - bx) * dy) / d
+            w1 = ((cy - ay) * dx + (ax - cx) * dy) / d
+            w2 = 1.0 - w0 - w1
+
+            inside &= (w0 >= -EDGE_EPSILON) & (w1 >= -EDGE_EPSILON) & (w2 >= -EDGE_EPSILON)
+            r, k = numpy.nonzero(inside)
+            if len(r) == 0: continue
+
+            vals = tri_values[tri[r]]
+            interp = (w0[r, k, None] * vals[:, 0] + w1[r, k, None] * vals[:, 1] + w2[r, k, None] * vals[:, 2])
+
+            values[py[r, k], px[r, k]] = interp
+            mask[py[r, k], px[r, k]] = True
+
+def get_shift_slices(d, n):
+    ''' Slices so that dst[i] = src[i + d] '''
+    return slice(max(d, 0), n + min(d, 0)), slice(max(-d, 0), n - max(d, 0))
+
+def dilate(values, mask, margin):
+    ''' Extend covered pixels to their empty neighbors by margin pixels, like bake margin does '''
+    height, width = mask.shape
+    total = numpy.empty_like(values)
+    count = numpy.empty(mask.shape, dtype=numpy.float32)
+
+    for i in range(margin):
+        total.fill(0.0)
+        count.fill(0.0)
+
+        for dy in (-1, 0, 1):
+            src_y, dst_y = get_shift_slices(dy, height)
+            for dx in (-1, 0, 1):
+                if dx == 0 and dy == 0: continue
+                src_x, dst_x = get_shift_slices(dx, width)
+
+                # Values outside the mask are always zero, so they can be added directly
+                total[dst_y, dst_x] += values[src_y, src_x]
+                count[dst_y, dst_x] += mask[src_y, src_x]
+
+        grow = ~mask & (count > 0)
+        if not grow.any(): break
+
+        values[grow] = total[grow] / count[grow][:, None]
+        mask |= grow
+
+def write_values(image, values, mask, rect=None):
+    ''' Write rasterized values to image (or rectangle of it), uncovered pixels are kept '''
+    pxs = image_buffer.read_pixels(image)
+    view = image_buffer.get_rect_view(pxs, *rect) if rect else pxs
+
+    # Byte sRGB image stores encoded values
+    if not image.is_float and image.colorspace_settings.name == 'sRGB':
+        values = linear_to_srgb_array(values)
+
+    view[..., :3][mask] = values[mask]
+    view[..., 3][mask] = 1.0
+
+    image_buffer.write_pixels(image, pxs)
+
+def bake_loop_values(image, objs, uv_name, get_values, margin=5, segment=None, mat=None, force_bake_all_polygons=False):
+    ''' Rasterize per loop values of objects to image (or its atlas segment) using uv map
+        get_values(obj) should return linear values with shape (num of loops, channels)
+    '''
+    T = time.time()
+
+    if segment:
+        rect = get_segment_rect(segment)
+        width, height = rect[2], rect[3]
+    else:
+        rect = None
+        width, height = image.size
+
+    values = None
+    mask = numpy.zeros((height, width), dtype=bool)
+
+    for obj in objs:
+        mesh = obj.data
+        uvs = get_loop_uvs(mesh, uv_name)
+        if uvs is None: continue
+
+        loop_values = get_values(obj)
+        if values is None:
+            values = numpy.zeros((height, width, loop_values.shape[1]), dtype=numpy.float32)
+
+        tris = get_triangles(mesh, get_bake_material_indices(obj, mat, force_bake_all_polygons))
+        rasterize_triangles(values, mask, uvs[tris], loop_values[tris])
+
+    if values is None: return
+
+    dilate(values, mask, margin)
+    write_values(image, values, mask, rect)
+
+    print('INFO:', image.name, 'is rasterized at', '{:0.2f}'.format(time.time() - T), 'seconds!')
+
+def get_selected_loop_values(obj, indices, face_mode=False):
+    ''' White for loops of selected faces (or vertices), black for the rest '''
+    mesh = obj.data
+    values = numpy.zeros((len(mesh.loops), 1), dtype=numpy.float32)
+    if not indices: return values
+
+    if face_mode:
+        starts = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+        totals = numpy.empty(len(mesh.polygons), dtype=numpy.int32)
+        mesh.polygons.foreach_get('loop_start', starts)
+        mesh.polygons.foreach_get('loop_total', totals)
+
+        sel_starts = starts[indices]
+        sel_totals = totals[indices]
+        offsets = numpy.arange(sel_totals.sum()) - numpy.repeat(numpy.cumsum(sel_totals) - sel_totals, sel_totals)
+        values[numpy.repeat(sel_starts, sel_totals) + offsets, 0] = 1.0
+    else:
+        selected = numpy.zeros(len(mesh.vertices), dtype=bool)
+        selected[indices] = True
+        values[selected[get_loop_vertex_indices(mesh)], 0] = 1.0
+
+    return values
+
+def get_pointiness_values(mesh):
+    ''' Per vertex pointiness using the same approximation as Cycles
+        Average direction of connected edges is compared to vertex normal, then blurred with the neighbors
+    '''
+    num_verts = len(mesh.vertices)
+
+    co = numpy.empty(num_verts * 3, dtype=numpy.float64)
+    mesh.vertices.foreach_get('co', co)
+    co = co.reshape(-1, 3)
+
+    normals = numpy.empty(num_verts * 3, dtype=numpy.float64)
+    mesh.vertices.foreach_get('normal', normals)
+    normals = normals.reshape(-1, 3)
+
+    edges = numpy.empty(len(mesh.edges) * 2, dtype=numpy.int32)
+    mesh.edges.foreach_get('vertices', edges)
+    v0, v1 = edges.reshape(-1, 2).T
+
+    edge_dirs = co[v1] - co[v0]
+    lengths = numpy.linalg.norm(edge_dirs, axis=1)
+    valid = lengths > 0.0
+    v0, v1 = v0[valid], v1[valid]
+    edge_dirs = edge_dirs[valid] / lengths[valid][:, None]
+
+    counter = numpy.bincount(v0, minlength=num_verts) + numpy.bincount(v1, minlength=num_verts)
+    accum = numpy.empty((num_verts, 3), dtype=numpy.float64)
+    for i in range(3):
+        accum[:, i] = (numpy.bincount(v0, edge_dirs[:, i], minlength=num_verts) -
+                numpy.bincount(v1, edge_dirs[:, i], minlength=num_verts))
+
+    raw = numpy.zeros(num_verts, dtype=numpy.float64)
+    used = counter > 0
+    dots = numpy.einsum('ij,ij->i', normals[used], accum[used] / counter[used][:, None])
+    raw[used] = numpy.arccos(numpy.clip(dots, -1.0, 1.0)) / math.pi
+
+    # Blur to approximate 2-ring neighborhood
+    data = raw + numpy.bincount(v0, raw[v1], minlength=num_verts) + numpy.bincount(v1, raw[v0], minlength=num_verts)
+    data /= counter + 1
+
+    return data.astype(numpy.float32)
+
+def get_pointiness_loop_values(obj):
+    mesh = obj.data
+    return get_pointiness_values(mesh)[get_loop_vertex_indices(mesh)][:, None]
+
+def bake_selected_vertices(image, objs, obj_vertex_indices, face_mode, uv_name, margin=5, segment=None, mat=None, force_bake_all_polygons=False):
+    get_values = lambda obj: get_selected_loop_values(obj, obj_vertex_indices.get(obj.name, []), face_mode)
+    bake_loop_values(image, objs, uv_name, get_values, margin, segment, mat, force_bake_all_polygons)
+
+def bake_pointiness(image, objs, uv_name, margin=5, segment=None, mat=None, force_bake_all_polygons=False):
+    bake_loop_values(image, objs, uv_name, get_pointiness_loop_values, margin, segment, mat, force_bake_all_polygons)